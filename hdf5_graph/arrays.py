@@ -0,0 +1,221 @@
+"""Policies storing array datasets as list, summary or chunk references."""
+
+from fnmatch import fnmatchcase
+
+import h5py
+import numpy as np
+
+from hdf5_graph.metrics import logger
+
+# How array datasets can be stored in the database:
+#   none      - no value
+#   list      - one-dimensional arrays as Cypher list in ``value``, merged by
+#               (name, value) like scalars. Arrays of more dimensions are not merged,
+#               their flattened list is stored in ``data`` and the shape in ``shape``
+#   summary   - min, max and mean, shape and dtype as properties
+#   reference - only shape, dtype and the chunk layout as properties
+ARRAY_POLICIES = ("none", "list", "summary", "reference")
+
+# Maximum number of bytes read at once, when computing summaries of large arrays
+SUMMARY_BLOCK_BYTES = 64 * 1024**2
+# Maximum size of a list in bytes. Merged lists are part of the key of the
+# (name, value) constraint, whose index entries are limited to about 8 kB,
+# larger arrays get the fallback policy instead
+LIST_MAX_BYTES = 4096
+# Size of a number in a Cypher list, integers and floats are stored with 64 bits
+LIST_ITEM_BYTES = 8
+# Maximum size of a scalar string or bytes value in bytes, for the same limit of the
+# constraint index. Larger values are not merged, they are stored in ``data``
+VALUE_MAX_BYTES = 4096
+
+
+def _layout(dataset: h5py.Dataset) -> dict:
+    return {
+        "shape": list(dataset.shape),
+        "dtype": dataset.dtype.str,
+    }
+
+
+def _reference(dataset: h5py.Dataset) -> dict:
+    props = _layout(dataset)
+    if dataset.chunks is not None:
+        props["chunks"] = list(dataset.chunks)
+    if dataset.compression is not None:
+        props["compression"] = dataset.compression
+    return props
+
+
+def _read_list(dataset: h5py.Dataset):
+    if dataset.dtype.kind == "O" or dataset.dtype.kind == "S":
+        return [str(i) for i in dataset.asstr()[()].ravel()]
+    if dataset.dtype.kind not in "biuf":
+        return None  # complex, compound and other types have no Cypher representation
+    data = np.empty(dataset.shape, dtype=dataset.dtype)
+    dataset.read_direct(data)
+    return data.ravel().tolist()
+
+
+def _list_bytes(value: list) -> int:
+    if value and isinstance(value[0], str):
+        return sum(len(i.encode("utf-8")) for i in value)
+    return len(value) * LIST_ITEM_BYTES
+
+
+def encode_scalar(value, max_bytes: int = VALUE_MAX_BYTES) -> tuple:
+    """Encode the value of a scalar dataset, so it fits into the constraint index.
+
+    Args:
+        value: Value of the dataset, as ``convert_value_to_cypher`` gives it.
+        max_bytes (int, optional): Maximum size of a string or bytes value, which is
+            merged by (name, value). Defaults to VALUE_MAX_BYTES.
+
+    Returns:
+        tuple: The value of the Dataset node (None if too large) and further
+            properties.
+    """
+    if isinstance(value, str):
+        size = len(value.encode("utf-8", errors="surrogateescape"))
+    elif isinstance(value, bytes):
+        size = len(value)
+    else:
+        return value, {}
+    if size > max_bytes:
+        return None, {"data": value}
+    return value, {}
+
+
+def _summary(dataset: h5py.Dataset) -> dict:
+    props = _layout(dataset)
+    if dataset.dtype.kind not in "biuf" or dataset.size == 0:
+        return props
+
+    # read the array in blocks along the first axis, to keep the memory bounded for
+    # large arrays
+    row_bytes = max(1, dataset.size // dataset.shape[0]) * dataset.dtype.itemsize
+    rows = max(1, SUMMARY_BLOCK_BYTES // row_bytes)
+    minimum, maximum, total, count = np.inf, -np.inf, 0.0, 0
+    for start in range(0, dataset.shape[0], rows):
+        stop = min(start + rows, dataset.shape[0])
+        block = np.empty((stop - start,) + dataset.shape[1:], dtype=dataset.dtype)
+        dataset.read_direct(block, source_sel=np.s_[start:stop])
+        if block.dtype.kind == "f":
+            block = block[~np.isnan(block)]
+        if block.size:
+            minimum = min(minimum, block.min())
+            maximum = max(maximum, block.max())
+            total += block.sum(dtype=np.float64)
+            count += block.size
+    if count:
+        props.update(min=float(minimum), max=float(maximum), mean=total / count)
+    return props
+
+
+class ArrayPolicy:
+    """Decide how array datasets are stored in the database.
+
+    The policy of a dataset is taken from the first pattern matching its hdf5_path.
+    Otherwise arrays with at most ``list_size`` elements are stored as list and all
+    larger arrays get the ``default`` policy.
+    Lists are never larger than ``list_max_bytes``, larger arrays get the ``default``
+    policy if it is "summary" or "reference", otherwise "reference".
+
+    Args:
+        default (str, optional): Policy of arrays, which match no pattern and are larger
+            than list_size. Defaults to "none".
+        list_size (int, optional): Maximum number of elements of arrays, which are
+            stored as list. Defaults to 0.
+        patterns (dict[str, str], optional): Glob patterns of hdf5_paths and the policy
+            of the matching arrays. Defaults to None.
+        list_max_bytes (int, optional): Maximum size of a list in bytes. Defaults to
+            LIST_MAX_BYTES.
+    """
+
+    def __init__(
+        self,
+        default: str = "none",
+        list_size: int = 0,
+        patterns: dict[str, str] = None,
+        list_max_bytes: int = LIST_MAX_BYTES,
+    ):
+        """Check the policies and compile the patterns."""
+        for policy in [default, *(patterns or {}).values()]:
+            if policy not in ARRAY_POLICIES:
+                raise ValueError(
+                    f"Unknown array policy {policy!r}, choose one of {ARRAY_POLICIES}."
+                )
+        self.default = default
+        self.list_size = list_size
+        self.patterns = dict(patterns or {})
+        self.list_max_bytes = list_max_bytes
+        self.fallback = default if default in ("summary", "reference") else "reference"
+
+    def select(self, hdf5_path: str, size: int) -> str:
+        """Get the policy of an array dataset.
+
+        Args:
+            hdf5_path (str): Path of the dataset in its file.
+            size (int): Number of elements of the dataset.
+
+        Returns:
+            str: One of ``ARRAY_POLICIES``.
+        """
+        policy = next(
+            (
+                policy
+                for pattern, policy in self.patterns.items()
+                if fnmatchcase(hdf5_path, pattern)
+            ),
+            None,
+        )
+        if policy is None:
+            policy = "list" if 0 < size <= self.list_size else self.default
+        if policy == "list" and size * LIST_ITEM_BYTES > self.list_max_bytes:
+            return self.fallback
+        return policy
+
+    def encode(self, dataset: h5py.Dataset) -> tuple:
+        """Encode an array dataset according to its policy.
+
+        Args:
+            dataset (h5py.Dataset): Non-scalar dataset.
+
+        Returns:
+            tuple: The value of the Dataset node (None if not stored as one-dimensional
+                list) and further properties.
+        """
+        policy = self.select(dataset.name, dataset.size)
+        try:
+            if policy == "list":
+                value = _read_list(dataset)
+                if value is None:
+                    return None, {}
+                if _list_bytes(value) <= self.list_max_bytes:
+                    if dataset.ndim > 1:
+                        return None, {**_layout(dataset), "data": value}
+                    return value, _layout(dataset)
+                policy = self.fallback  # strings are only measured after reading
+            if policy == "summary":
+                return None, _summary(dataset)
+            if policy == "reference":
+                return None, _reference(dataset)
+        except Exception as e:
+            logger.warning("Array dataset %s could not be encoded: %s", dataset.name, e)
+        return None, {}
+
+
+def parse_array_patterns(patterns: list[str]) -> dict[str, str]:
+    """Parse array policy patterns given as ``PATTERN=POLICY`` strings.
+
+    Args:
+        patterns (list[str]): Strings of the form ``PATTERN=POLICY``.
+
+    Returns:
+        dict[str, str]: Glob patterns and their policy.
+    """
+    parsed = {}
+    for i in patterns:
+        pattern, sep, policy = i.rpartition("=")
+        if not sep:
+            raise ValueError(f"Array pattern {i!r} is not of the form PATTERN=POLICY.")
+        parsed[pattern] = policy
+    return parsed
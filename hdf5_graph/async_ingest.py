@@ -0,0 +1,339 @@
+"""Ingestion of hdf5 files on the asynchronous neo4j driver."""
+
+import asyncio
+import itertools
+import time
+from pathlib import Path
+
+import neo4j
+
+from hdf5_graph.arrays import ArrayPolicy
+from hdf5_graph.attrs import AttrPolicy
+from hdf5_graph.handle_structure import DEFAULT_SUFFIXES, iter_h5_files
+from hdf5_graph.helpers import record_batches
+from hdf5_graph.metrics import emit_event, log_write_summary, timed_phase
+from hdf5_graph.schema import (
+    CONSTRAINT_QUERY,
+    DROP_LEGACY_INDEX_QUERY,
+    DUPLICATES_QUERY,
+    LEGACY_INDEX_QUERY,
+    SCHEMA_QUERIES,
+    _check_duplicates,
+)
+from hdf5_graph.single_hdf5 import (
+    _STREAM_END,
+    CONNECT_QUERY,
+    DATASET_UNWIND_QUERY,
+    FILE_QUERY,
+    GROUP_LINK_UNWIND_QUERY,
+    GROUP_NODE_UNWIND_QUERY,
+    LINK_QUERY,
+    _file_params,
+    dependency_rows,
+    iter_hdf5_records,
+)
+from hdf5_graph.writers import count_batch, new_summary
+
+
+async def _run(driver: neo4j.AsyncDriver, query: str, **params) -> None:
+    async with driver.session() as session:
+        result = await session.run(query, **params)
+        await result.consume()
+
+
+async def _records(driver: neo4j.AsyncDriver, query: str) -> list[dict]:
+    async with driver.session() as session:
+        result = await session.run(query)
+        return await result.data()
+
+
+async def create_schema_async(driver: neo4j.AsyncDriver, wait: bool = True) -> None:
+    """Create the indexes and constraints of the ingestion queries, if they are missing.
+
+    Like ``create_schema``, the plain ``dataset_name_value`` index of earlier versions
+    is replaced by the unique constraint, and a ValueError is raised if stored datasets
+    share a name and value.
+
+    Args:
+        driver (neo4j.AsyncDriver): Async driver connected to the DBMS.
+        wait (bool, optional): Whether to wait until all indexes are online. Defaults to
+            True.
+
+    Returns:
+        None
+    """
+    if not await _records(driver, CONSTRAINT_QUERY):
+        _check_duplicates(await _records(driver, DUPLICATES_QUERY))
+        if await _records(driver, LEGACY_INDEX_QUERY):
+            await _run(driver, DROP_LEGACY_INDEX_QUERY)
+    for query in SCHEMA_QUERIES:
+        await _run(driver, query)
+    if wait:
+        await _run(driver, "CALL db.awaitIndexes()")
+
+
+async def _write_batch(
+    driver: neo4j.AsyncDriver,
+    query: str,
+    rows: list,
+    batch_size,
+    summary: dict,
+    **params,
+) -> None:
+    # Every batch is a managed transaction in its own session, so batches in flight use
+    # separate pooled connections
+    attempts = []
+
+    async def work(tx):
+        attempts.append(None)
+        result = await tx.run(query, rows=rows, **params)
+        return (await result.consume()).counters
+
+    start = time.perf_counter()
+    try:
+        async with driver.session() as session:
+            counters = await session.execute_write(work)
+    except neo4j.exceptions.Neo4jError as e:
+        count_batch(summary, len(rows), len(attempts), error=e)
+        record_batches(batch_size, len(rows), 1, 0, failed=True)
+        return
+    count_batch(summary, len(rows), len(attempts), counters)
+    record_batches(
+        batch_size, len(rows), 1, time.perf_counter() - start, failed=len(attempts) > 1
+    )
+
+
+def _take(records, size: int) -> list:
+    return list(itertools.islice(records, size))
+
+
+async def _read_records(
+    pending: asyncio.Queue, hdf5_filepath: Path, chunk_size: int, **read_kwargs
+) -> None:
+    # The traversal runs in an executor and hands over chunks of records, blocking when
+    # the queue is full
+    loop = asyncio.get_running_loop()
+    records = iter_hdf5_records(hdf5_filepath, max_pending=chunk_size, **read_kwargs)
+    future = None
+    try:
+        while True:
+            future = loop.run_in_executor(None, _take, records, chunk_size)
+            chunk = await asyncio.shield(future)
+            if not chunk:
+                break
+            await pending.put(chunk)
+        await pending.put(_STREAM_END)
+    except Exception as e:
+        await pending.put(e)
+    finally:
+        # the generator can only be closed, when no chunk is taken from it anymore
+        if future is not None and not future.done():
+            await asyncio.wait([future])
+        records.close()
+
+
+async def put_hdf5_in_neo4j_async(
+    hdf5_filepath: Path,
+    driver: neo4j.AsyncDriver,
+    exclude_datasets: list[str] = None,
+    exclude_groups: list[str] = None,
+    exclude_paths: list = None,
+    connect_to_filepath: list[Path] = None,
+    batch_size: int = 1000,
+    transfer_attrs: bool = True,
+    concurrency: int = 4,
+    bootstrap_schema: bool = True,
+    array_policy: ArrayPolicy = None,
+    max_pending: int = 4,
+    attr_policy: AttrPolicy = None,
+) -> None:
+    """Put all of the contents of the hdf5 file into neo4j, using the async driver.
+
+    The file is traversed in an executor and handed over in chunks of batch_size through
+    a queue holding at most ``max_pending`` chunks.
+    Meanwhile, up to ``concurrency`` dataset batches are written at the same time, each
+    in a managed transaction on its own pooled connection.
+    Group batches are awaited before the datasets following them, so parents always
+    exist before their children.
+    The created nodes and relationships are the same as those of ``put_hdf5_in_neo4j``.
+    The file is always streamed with client-side UNWIND batches, so there are no options
+    for the engine, the parallel apoc batches or a dataset cache.
+
+    Args:
+        hdf5_filepath (Path): Path to hdf5 which should be put into the database.
+        driver (neo4j.AsyncDriver): Async driver connected to the DBMS.
+        exclude_datasets (list[str], optional): List of strings with names of datasets
+            which should not be read in. Defaults to None.
+        exclude_groups (list[str], optional): List of strings with names of groups which
+            should not be read in. Defaults to None.
+        exclude_paths (list[str], optional): List of strings with pathparts of datasets
+            which should not be read in. Defaults to None.
+        connect_to_filepath (list[Path], optional): List of strings with filepaths, to
+            which the File node should be connected. Defaults to None.
+        batch_size (int | AdaptiveBatchSize, optional): Number of records per
+            transaction, or a controller adapting it to the commit latency. Defaults to
+            1000.
+        transfer_attrs (bool, optional): Whether the attrs of the HDF5-objects should be
+            transferred to the database. Defaults to True.
+        concurrency (int, optional): Maximum number of dataset batches in flight.
+            Defaults to 4.
+        bootstrap_schema (bool, optional): Whether the indexes and constraints used by
+            the queries should be created before the first batch. Defaults to True.
+        array_policy (ArrayPolicy, optional): How array datasets are stored, e.g. as
+            list or summary statistics. If None they are stored without value. Defaults
+            to None.
+        max_pending (int, optional): Maximum number of chunks read ahead of the writers.
+            Defaults to 4.
+        attr_policy (AttrPolicy, optional): Which attrs are put into the database and
+            how they are converted. If None all attrs are put as they are. Defaults to
+            None.
+
+    Returns:
+        None
+    """
+    if bootstrap_schema:
+        await create_schema_async(driver)
+    await _run(driver, FILE_QUERY, **_file_params(hdf5_filepath))
+
+    params = {"filepath": str(hdf5_filepath), "transfer_attrs": transfer_attrs}
+    group_summary = new_summary()
+    dataset_summary = new_summary()
+    group_chunk = []
+    dataset_chunk = []
+    slots = asyncio.Semaphore(concurrency)
+    writes = set()
+
+    async def flush_groups():
+        # All nodes of the chunk are created first and then linked to their parents,
+        # independent of their depth
+        if not group_chunk:
+            return
+        rows = group_chunk.copy()
+        group_chunk.clear()
+        group_summary["total"] += len(rows)
+        await _write_batch(
+            driver, GROUP_NODE_UNWIND_QUERY, rows, batch_size, group_summary, **params
+        )
+        await _write_batch(
+            driver, GROUP_LINK_UNWIND_QUERY, rows, batch_size, group_summary, **params
+        )
+
+    async def write_datasets(rows):
+        try:
+            await _write_batch(
+                driver,
+                DATASET_UNWIND_QUERY,
+                rows,
+                batch_size,
+                dataset_summary,
+                **params,
+            )
+        finally:
+            slots.release()
+
+    async def submit_datasets():
+        # the parents of the datasets may still wait in the group chunk
+        await flush_groups()
+        await slots.acquire()
+        dataset_summary["total"] += len(dataset_chunk)
+        task = asyncio.create_task(write_datasets(dataset_chunk.copy()))
+        writes.add(task)
+        task.add_done_callback(writes.discard)
+        dataset_chunk.clear()
+
+    pending = asyncio.Queue(maxsize=max(1, max_pending))
+    reader = asyncio.create_task(
+        _read_records(
+            pending,
+            hdf5_filepath,
+            int(batch_size),
+            exclude_datasets=exclude_datasets or [],
+            exclude_groups=exclude_groups or [],
+            exclude_paths=exclude_paths or [],
+            transfer_attrs=transfer_attrs,
+            array_policy=array_policy,
+            attr_policy=attr_policy,
+        )
+    )
+    start = time.perf_counter()
+    try:
+        while (chunk := await pending.get()) is not _STREAM_END:
+            if isinstance(chunk, Exception):
+                raise chunk
+            for kind, record in chunk:
+                if kind == "group":
+                    group_chunk.append(record)
+                    if len(group_chunk) >= int(batch_size):
+                        await flush_groups()
+                else:
+                    dataset_chunk.append(record)
+                    if len(dataset_chunk) >= int(batch_size):
+                        await submit_datasets()
+        await flush_groups()
+        if dataset_chunk:
+            await submit_datasets()
+        await asyncio.gather(*writes)
+    finally:
+        reader.cancel()
+        await asyncio.gather(reader, *writes, return_exceptions=True)
+
+    group_summary["timeTaken"] = dataset_summary["timeTaken"] = round(
+        time.perf_counter() - start, 3
+    )
+    log_write_summary(hdf5_filepath, "Group Query", group_summary)
+    log_write_summary(hdf5_filepath, "Dataset Query", dataset_summary)
+
+    if connect_to_filepath:
+        await _run(
+            driver,
+            CONNECT_QUERY,
+            filepath=str(hdf5_filepath),
+            connect_path=[str(i) for i in connect_to_filepath],
+        )
+    emit_event("file", hdf5_filepath, seconds=round(time.perf_counter() - start, 6))
+
+
+async def put_dir_in_neo4j_async(
+    dir_path: Path,
+    driver: neo4j.AsyncDriver,
+    files: int = 2,
+    suffixes: tuple[str] = DEFAULT_SUFFIXES,
+    **kwargs,
+) -> None:
+    """Put all h5-files of a directory into neo4j with the async driver.
+
+    The files are made dependent on each other, based on the nesting.
+
+    Keyword arguments are supplied to the ``put_hdf5_in_neo4j_async`` function.
+    Up to ``files`` files are ingested at the same time, the depends_on relationships
+    are created after all files are written.
+
+    Args:
+        dir_path (Path): Path to directory, which should be traversed.
+        driver (neo4j.AsyncDriver): Async driver connected to the DBMS.
+        files (int, optional): Number of files which are ingested at the same time.
+            Defaults to 2.
+        suffixes (tuple[str], optional): Suffixes of the h5-files, e.g.
+            ``HDF5_SUFFIXES``. Defaults to DEFAULT_SUFFIXES.
+    """
+    # handle kwargs, as connected_to_filepath is set by function itself:
+    kwargs = {k: v for k, v in kwargs.items() if k != "connect_to_filepath"}
+    # the schema is created once for the whole directory, not once per file:
+    if kwargs.pop("bootstrap_schema", True):
+        await create_schema_async(driver)
+    kwargs["bootstrap_schema"] = False
+
+    dependencies = list(iter_h5_files(dir_path, suffixes=suffixes))
+    slots = asyncio.Semaphore(files)
+
+    async def ingest(hdf5_filepath):
+        async with slots:
+            await put_hdf5_in_neo4j_async(hdf5_filepath, driver, **kwargs)
+
+    await asyncio.gather(*(ingest(hdf5_filepath) for hdf5_filepath, _ in dependencies))
+
+    rows = dependency_rows(dependencies)
+    batch_size = int(kwargs.get("batch_size", 1000))
+    with timed_phase(None, "linking"):
+        for start in range(0, len(rows), batch_size):
+            await _run(driver, LINK_QUERY, rows=rows[start : start + batch_size])
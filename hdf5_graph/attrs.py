@@ -0,0 +1,143 @@
+"""Policy deciding which attributes are stored, and how."""
+
+from fnmatch import fnmatchcase
+
+import h5py
+import numpy as np
+
+# What happens to attributes larger than max_bytes:
+#   reference - only their shape and dtype are stored, as ``<name>_shape`` and
+#               ``<name>_dtype``
+#   drop      - they are not stored at all
+OVERSIZED_POLICIES = ("reference", "drop")
+
+
+def _decode(value):
+    return (
+        value.decode("utf-8", errors="replace") if isinstance(value, bytes) else value
+    )
+
+
+def convert_attr(value):
+    """Convert an attribute value into a valid property value of the database.
+
+    NumPy scalars become python scalars and bytes are decoded. One-dimensional arrays of
+    numbers, booleans or strings are converted as a whole into lists.
+    Values without a property representation (multi-dimensional, complex or compound
+    arrays, references, empty values) give None.
+
+    Args:
+        value: Attribute value, as read by h5py.
+
+    Returns:
+        Property value, or None if the value can not be stored.
+    """
+    if isinstance(value, np.ndarray):
+        if value.ndim == 0:
+            value = value[()]
+        elif value.ndim > 1 or value.size == 0:
+            return None
+        elif value.dtype.kind in "biuf":
+            return value.tolist()
+        elif value.dtype.kind in "SOU":
+            items = [_decode(i) for i in value.tolist()]
+            return items if all(isinstance(i, str) for i in items) else None
+        else:
+            return None
+    if isinstance(value, np.generic):
+        if value.dtype.kind not in "biufSU":
+            return None
+        value = value.item()
+    if isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, bytes):
+        return _decode(value)
+    return None
+
+
+class AttrPolicy:
+    """Decide which attributes of groups and datasets are stored, and how.
+
+    An attribute is stored if its name matches one of the ``include`` patterns (all
+    names if there are none) and none of the ``exclude`` patterns.
+    Only the names of all attributes are read, values are only read for the stored
+    attributes, and only if their size is at most ``max_bytes``.
+    Larger attributes are handled by the ``oversized`` policy, without reading them.
+
+    Args:
+        include (list[str], optional): Glob patterns of attribute names which are
+            stored, all if empty. Defaults to [].
+        exclude (list[str], optional): Glob patterns of attribute names which are not
+            stored. Defaults to [].
+        max_bytes (int, optional): Maximum size of a stored attribute value in bytes, if
+            None the size is not limited. Defaults to None.
+        oversized (str, optional): One of ``OVERSIZED_POLICIES``, for attributes larger
+            than max_bytes. Defaults to "reference".
+    """
+
+    def __init__(
+        self,
+        include: list[str] = [],
+        exclude: list[str] = [],
+        max_bytes: int = None,
+        oversized: str = "reference",
+    ):
+        """Check the oversized policy and keep the patterns."""
+        if oversized not in OVERSIZED_POLICIES:
+            raise ValueError(
+                f"Unknown oversized attribute policy {oversized!r}, choose "
+                f"one of {OVERSIZED_POLICIES}."
+            )
+        self.include = list(include)
+        self.exclude = list(exclude)
+        self.max_bytes = max_bytes
+        self.oversized = oversized
+        # name -> whether it is stored, names repeat across the objects of a file
+        self._selected = {}
+
+    def select(self, name: str) -> bool:
+        """Check whether an attribute is stored, based on its name.
+
+        Args:
+            name (str): Name of the attribute.
+
+        Returns:
+            bool: Whether the attribute is stored.
+        """
+        selected = self._selected.get(name)
+        if selected is None:
+            selected = (
+                not self.include or any(fnmatchcase(name, i) for i in self.include)
+            ) and not any(fnmatchcase(name, i) for i in self.exclude)
+            self._selected[name] = selected
+        return selected
+
+    def read(self, obj: h5py.HLObject) -> dict:
+        """Read the stored attributes of a group or dataset as properties.
+
+        Args:
+            obj (h5py.HLObject): Group or dataset.
+
+        Returns:
+            dict: Property names and values.
+        """
+        props = {}
+        attrs = obj.attrs
+        for name in attrs:
+            if not self.select(name):
+                continue
+            try:
+                if self.max_bytes is not None:
+                    attr = attrs.get_id(name)
+                    size = attr.get_storage_size()
+                    if size > self.max_bytes:
+                        if self.oversized == "reference":
+                            props[f"{name}_shape"] = list(attr.shape or ())
+                            props[f"{name}_dtype"] = attr.dtype.str
+                        continue
+                value = convert_attr(attrs[name])
+            except Exception:
+                continue  # e.g. unsupported datatypes, which h5py can not read
+            if value is not None:
+                props[name] = value
+        return props
@@ -0,0 +1,377 @@
+"""Benchmark of the ingestion engines on synthetic hdf5 files."""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import tempfile
+import time
+import tracemalloc
+from datetime import UTC, datetime
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+
+import neo4j
+from neo4j import GraphDatabase
+
+from hdf5_graph.handle_structure import put_dir_in_neo4j
+from hdf5_graph.single_hdf5 import put_hdf5_in_neo4j
+from hdf5_graph.synthetic import generate_dir, generate_hdf5
+
+# Ways of parallelizing the batches, as arguments of put_hdf5_in_neo4j
+PARALLEL_MODES = {
+    "none": {"parallel_group": False, "parallel_dataset": False},
+    "group": {"parallel_group": True, "parallel_dataset": False},
+    "dataset": {"parallel_group": False, "parallel_dataset": True},
+    "both": {"parallel_group": True, "parallel_dataset": True},
+}
+
+
+class CountingSession:
+    """Wrap a neo4j.Session, counting the queries and transactions it sends."""
+
+    def __init__(self, session: neo4j.Session, counter: dict):
+        """Wrap the session, adding its round trips to counter."""
+        self._session = session
+        self._counter = counter
+
+    def __getattr__(self, name):
+        """Pass all other attributes on to the session."""
+        return getattr(self._session, name)
+
+    def __enter__(self):
+        """Enter the context of the session."""
+        return self
+
+    def __exit__(self, *exc):
+        """Close the session."""
+        self._session.close()
+        return False
+
+    def run(self, *args, **kwargs):
+        """Run a query, counting it as one round trip."""
+        self._counter["round_trips"] += 1
+        return self._session.run(*args, **kwargs)
+
+    def execute_write(self, work, *args, **kwargs):
+        """Run a managed write transaction, counting every attempt as one round trip."""
+
+        def counted(tx, *args, **kwargs):
+            self._counter["round_trips"] += 1  # every attempt, including retries
+            return work(tx, *args, **kwargs)
+
+        return self._session.execute_write(counted, *args, **kwargs)
+
+
+class CountingDriver:
+    """Wrap a neo4j.Driver, so all its sessions count into the same counter."""
+
+    def __init__(self, driver: neo4j.Driver, counter: dict):
+        """Wrap the driver, adding the round trips of its sessions to counter."""
+        self._driver = driver
+        self._counter = counter
+
+    def __getattr__(self, name):
+        """Pass all other attributes on to the driver."""
+        return getattr(self._driver, name)
+
+    def session(self, **kwargs):
+        """Open a session, which counts its round trips."""
+        return CountingSession(self._driver.session(**kwargs), self._counter)
+
+
+def _clear_database(session: neo4j.Session) -> None:
+    session.run(
+        "MATCH (n) CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS"
+    ).consume()
+
+
+def run_case(
+    driver: neo4j.Driver, target: str, path: Path, objects: int, **kwargs
+) -> dict:
+    """Ingest a file or directory into an emptied database and measure the ingestion.
+
+    Keyword arguments are supplied to ``put_hdf5_in_neo4j`` or ``put_dir_in_neo4j``.
+
+    Args:
+        driver (neo4j.Driver): Driver connected to the benchmark database, which is
+            emptied.
+        target (str): "file" or "dir".
+        path (Path): Path to the file or directory.
+        objects (int): Number of groups and datasets of the file or directory.
+
+    Returns:
+        dict: Wall-clock time, objects per second, peak memory of the client and round
+            trips to the server.
+    """
+    with driver.session() as session:
+        _clear_database(session)
+    counter = {"round_trips": 0}
+    counting_driver = CountingDriver(driver, counter)
+    ingest = put_hdf5_in_neo4j if target == "file" else put_dir_in_neo4j
+    with (
+        counting_driver.session() as session,
+        contextlib.redirect_stdout(io.StringIO()),
+    ):
+        tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            ingest(path, session, driver=counting_driver, **kwargs)
+            seconds = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return {
+        "seconds": round(seconds, 3),
+        "objects_per_s": round(objects / seconds, 1) if seconds else None,
+        "peak_memory_bytes": peak,
+        "round_trips": counter["round_trips"],
+    }
+
+
+def run_benchmarks(
+    driver: neo4j.Driver,
+    work_dir: Path,
+    shape: dict,
+    files: int = 10,
+    levels: int = 2,
+    batch_sizes: list[int] = [1000],
+    parallel_modes: list[str] = ["none"],
+    engines: list[str] = ["apoc"],
+    targets: list[str] = ["file", "dir"],
+    repeat: int = 1,
+) -> dict:
+    """Generate synthetic hdf5 data and measure its ingestion.
+
+    Every combination of batch size, parallel mode and engine is measured.
+
+    Args:
+        driver (neo4j.Driver): Driver connected to the benchmark database, which is
+            emptied before every run.
+        work_dir (Path): Directory the synthetic data is generated in.
+        shape (dict): Keyword arguments of ``generate_hdf5``, describing the shape of
+            every file.
+        files (int, optional): Number of files of the directory benchmark. Defaults to
+            10.
+        levels (int, optional): Number of nested directory levels of the directory
+            benchmark. Defaults to 2.
+        batch_sizes (list[int], optional): Batch sizes to measure. Defaults to [1000].
+        parallel_modes (list[str], optional): Keys of ``PARALLEL_MODES`` to measure.
+            Defaults to ["none"].
+        engines (list[str], optional): Engines to measure. Defaults to ["apoc"].
+        targets (list[str], optional): "file" for ``put_hdf5_in_neo4j``, "dir" for
+            ``put_dir_in_neo4j``. Defaults to ["file", "dir"].
+        repeat (int, optional): Number of runs of every combination. Defaults to 1.
+
+    Returns:
+        dict: Description of the benchmark and one result per run.
+    """
+    file_counts = generate_hdf5(work_dir / "benchmark.h5", **shape)
+    dir_counts = generate_dir(work_dir / "benchmark_dir", files, levels, **shape)
+    inputs = {
+        "file": (work_dir / "benchmark.h5", file_counts),
+        "dir": (work_dir / "benchmark_dir", dir_counts),
+    }
+
+    results = []
+    for target, engine, batch_size, mode, run in itertools.product(
+        targets, engines, batch_sizes, parallel_modes, range(repeat)
+    ):
+        path, counts = inputs[target]
+        objects = counts["groups"] + counts["scalars"] + counts["arrays"]
+        measured = run_case(
+            driver,
+            target,
+            path,
+            objects,
+            batch_size=batch_size,
+            engine=engine,
+            **PARALLEL_MODES[mode],
+        )
+        results.append(
+            {
+                "target": target,
+                "engine": engine,
+                "batch_size": batch_size,
+                "parallel": mode,
+                "run": run,
+                "objects": objects,
+                **measured,
+            }
+        )
+
+    try:
+        package_version = version("hdf5-graph")
+    except PackageNotFoundError:
+        package_version = None
+    return {
+        "version": package_version,
+        "timestamp": datetime.now(UTC).isoformat(),
+        "server": driver.get_server_info().agent,
+        "shape": shape,
+        "files": files,
+        "levels": levels,
+        "results": results,
+    }
+
+
+def gen_parser():
+    """Create the parser of the benchmark command line."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the ingestion of synthetic HDF5 data into a Neo4j "
+        "database. The database is emptied before every run!"
+    )
+    parser.add_argument(
+        "--uri",
+        type=str,
+        default="neo4j://localhost",
+        help="URI for the Neo4j database (default: neo4j://localhost).",
+    )
+    parser.add_argument(
+        "--username",
+        type=str,
+        default="neo4j",
+        help="Username for the Neo4j database (default: neo4j).",
+    )
+    parser.add_argument(
+        "--password",
+        type=str,
+        default="neo4jadmin",
+        help="Password for the Neo4j database (default: neo4jadmin).",
+    )
+    parser.add_argument(
+        "--database",
+        type=str,
+        default="benchmark",
+        help="Database name for the Neo4j database, "
+        "it is emptied (default: benchmark).",
+    )
+    parser.add_argument(
+        "--groups",
+        type=int,
+        default=100,
+        help="Number of groups per file (default: 100).",
+    )
+    parser.add_argument(
+        "--depth",
+        type=int,
+        default=3,
+        help="Maximum nesting depth of the groups (default: 3).",
+    )
+    parser.add_argument(
+        "--datasets-per-group",
+        type=int,
+        default=10,
+        help="Number of datasets per group (default: 10).",
+    )
+    parser.add_argument(
+        "--array-ratio",
+        type=float,
+        default=0.2,
+        help="Share of array datasets (default: 0.2).",
+    )
+    parser.add_argument(
+        "--attrs",
+        type=int,
+        default=2,
+        help="Number of attrs per group and dataset (default: 2).",
+    )
+    parser.add_argument(
+        "--cardinality",
+        type=int,
+        default=10,
+        help="Number of distinct values per scalar dataset name (default: 10).",
+    )
+    parser.add_argument(
+        "--files",
+        type=int,
+        default=10,
+        help="Number of files of the directory benchmark (default: 10).",
+    )
+    parser.add_argument(
+        "--levels",
+        type=int,
+        default=2,
+        help="Number of nested directory levels (default: 2).",
+    )
+    parser.add_argument(
+        "--batch-sizes",
+        type=int,
+        nargs="+",
+        default=[100, 1000, 10000],
+        help="Batch sizes to measure.",
+    )
+    parser.add_argument(
+        "--parallel",
+        nargs="+",
+        choices=PARALLEL_MODES,
+        default=["none", "both"],
+        help="Parallel modes to measure.",
+    )
+    parser.add_argument(
+        "--engines", nargs="+", default=["apoc"], help="Engines to measure."
+    )
+    parser.add_argument(
+        "--targets",
+        nargs="+",
+        choices=["file", "dir"],
+        default=["file", "dir"],
+        help="Ingest a single file, a directory or both.",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=1,
+        help="Number of runs of every combination (default: 1).",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path("benchmark.json"),
+        help="Path of the JSON results (default: benchmark.json).",
+    )
+    return parser
+
+
+def main():
+    """Run the benchmark of the command line and write its results."""
+    args = gen_parser().parse_args()
+    shape = {
+        "groups": args.groups,
+        "depth": args.depth,
+        "datasets_per_group": args.datasets_per_group,
+        "array_ratio": args.array_ratio,
+        "attrs": args.attrs,
+        "cardinality": args.cardinality,
+    }
+    with (
+        GraphDatabase.driver(
+            args.uri, auth=(args.username, args.password), database=args.database
+        ) as driver,
+        tempfile.TemporaryDirectory() as work_dir,
+    ):
+        report = run_benchmarks(
+            driver,
+            Path(work_dir),
+            shape,
+            args.files,
+            args.levels,
+            args.batch_sizes,
+            args.parallel,
+            args.engines,
+            args.targets,
+            args.repeat,
+        )
+    args.output.write_text(json.dumps(report, indent=2))
+    for result in report["results"]:
+        print(
+            f"{result['target']:4} {result['engine']:6} batch "
+            f"{result['batch_size']:6} parallel {result['parallel']:7}: "
+            f"{result['objects_per_s']} objects/s, {result['round_trips']} "
+            f"round trips, {result['peak_memory_bytes'] / 1024**2:.1f} MiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Journal of the written files, to resume an ingestion after a failure."""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+import neo4j
+
+from hdf5_graph.metrics import emit_event
+from hdf5_graph.remove import remove_file
+
+
+class Checkpoint:
+    """Journal of the files written by an ingestion, to resume it after a failure.
+
+    The journal is a JSON-lines file, with a "start" entry written before a file is
+    ingested and a "done" entry after it was completed.
+    Every entry is flushed to disk before the ingestion continues, so a crash leaves at
+    most the files being written unfinished.
+    When resuming, completed files are skipped and unfinished files are removed from the
+    database and written again, so each file ends up complete exactly once.
+    The journal is thread-safe, so it can be shared by all workers of a directory
+    ingestion.
+
+    Args:
+        path (Path): Path of the journal.
+        resume (bool, optional): Whether to continue the journal of a previous run,
+            otherwise it is started anew. Defaults to False.
+    """
+
+    def __init__(self, path: Path, resume: bool = False):
+        """Open the journal, reading the entries of the previous run if resuming."""
+        self.path = Path(path)
+        self.done = set()
+        self.started = set()
+        self._lock = threading.Lock()
+        if resume and self.path.exists():
+            with open(self.path, encoding="utf-8") as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # the last line may have been cut off by the failure
+                    if entry["event"] == "start":
+                        self.started.add(entry["filepath"])
+                    elif entry["event"] == "done":
+                        self.done.add(entry["filepath"])
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text("")
+
+    def _append(self, event: str, filepath: str) -> None:
+        with self._lock, open(self.path, "a", encoding="utf-8") as journal:
+            journal.write(
+                json.dumps({"event": event, "filepath": filepath, "time": time.time()})
+                + "\n"
+            )
+            journal.flush()
+            os.fsync(journal.fileno())
+
+    def unfinished(self) -> set[str]:
+        """Get the files which were started but not completed.
+
+        Returns:
+            set[str]: Filepaths of the unfinished files.
+        """
+        with self._lock:
+            return self.started - self.done
+
+    def begin(
+        self, session: neo4j.Session, hdf5_filepath: Path, batch_size: int = 10000
+    ) -> bool:
+        """Check if a file still needs to be written and journal its start.
+
+        If a previous run started but did not complete the file, its partial subgraph is
+        removed first.
+
+        Args:
+            session (neo4j.Session): Neo4j session instance with connected DBMS.
+            hdf5_filepath (Path): Path to hdf5 which should be written.
+            batch_size (int, optional): Number of nodes deleted per transaction, when
+                removing a partial file. Defaults to 10000.
+
+        Returns:
+            bool: Whether the file should be written, False if it was completed before.
+        """
+        filepath = str(hdf5_filepath)
+        with self._lock:
+            if filepath in self.done:
+                return False
+            partial = filepath in self.started
+        if partial:
+            removed = remove_file(session, hdf5_filepath, batch_size)
+            emit_event("rollback", hdf5_filepath, **removed)
+        self._append("start", filepath)
+        with self._lock:
+            self.started.add(filepath)
+        return True
+
+    def finish(self, hdf5_filepath: Path) -> None:
+        """Journal the completion of a file.
+
+        Args:
+            hdf5_filepath (Path): Path to hdf5 which was written.
+        """
+        filepath = str(hdf5_filepath)
+        self._append("done", filepath)
+        with self._lock:
+            self.done.add(filepath)
@@ -0,0 +1,191 @@
+"""Client-side cache of the Dataset nodes with a value."""
+
+import threading
+from collections import OrderedDict
+
+import neo4j
+import numpy as np
+
+# Ids of the Dataset nodes merged for a list of registry entries, looked up with the
+# (name, value) constraint
+LOOKUP_QUERY = """
+    UNWIND range(0, size($rows) - 1) AS i
+    WITH i, $rows[i] AS entry
+    MATCH (d:Dataset {name: entry.obj_name, value: entry.value})
+    RETURN i, elementId(d) AS node_id
+"""
+# Datasets with value already in the database, to warm the cache
+WARM_QUERY = """
+    MATCH (d:Dataset)
+    WHERE d.value IS NOT NULL
+    RETURN d.name AS name, d.value AS value, elementId(d) AS node_id
+    LIMIT $limit
+"""
+
+
+def dataset_key(name: str, value) -> tuple:
+    """Get the hashable (name, value) key of a dataset.
+
+    The keys are equal for values which are equal in the database, e.g. numpy and python
+    scalars.
+
+    Args:
+        name (str): Name of the dataset.
+        value: Value of the dataset.
+
+    Returns:
+        tuple: Name and value, with lists converted to tuples.
+    """
+    if isinstance(value, np.ndarray):
+        value = value.tolist()
+    elif isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, list):
+        value = tuple(dataset_key("", i)[1] for i in value)
+    return name, value
+
+
+class DatasetCache:
+    """LRU cache of the ids of Dataset nodes with a value, keyed by their (name, value).
+
+    Datasets found in the cache are linked to their holder by id, instead of a MERGE
+    looking them up by name and value.
+    The cache is thread-safe, so it can be shared by all files and workers of a
+    directory ingestion.
+
+    Args:
+        max_size (int, optional): Maximum number of cached datasets. Defaults to 100000.
+    """
+
+    def __init__(self, max_size: int = 100000):
+        """Create an empty cache."""
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Get the number of cached datasets."""
+        return len(self._ids)
+
+    def get(self, name: str, value):
+        """Get the id of a cached dataset, counting hits and misses.
+
+        Args:
+            name (str): Name of the dataset.
+            value: Value of the dataset.
+
+        Returns:
+            str | None: Element id of the Dataset node, None if it is not cached.
+        """
+        try:
+            key = dataset_key(name, value)
+            hash(key)
+        except TypeError:
+            key = None
+        with self._lock:
+            node_id = self._ids.get(key) if key is not None else None
+            if node_id is None:
+                self.misses += 1
+                return None
+            self._ids.move_to_end(key)
+            self.hits += 1
+            return node_id
+
+    def put(self, name: str, value, node_id: str) -> None:
+        """Cache the id of a dataset, evicting the least recently used one if full.
+
+        Args:
+            name (str): Name of the dataset.
+            value: Value of the dataset.
+            node_id (str): Element id of the Dataset node.
+        """
+        try:
+            key = dataset_key(name, value)
+            hash(key)
+        except TypeError:
+            return
+        with self._lock:
+            self._ids[key] = node_id
+            self._ids.move_to_end(key)
+            while len(self._ids) > self.max_size:
+                self._ids.popitem(last=False)
+
+    def split(self, datasets: list[dict]) -> tuple[list[dict], list[dict]]:
+        """Split registry entries into those with a cached dataset and all others.
+
+        Args:
+            datasets (list[dict]): Entries of the dataset registry.
+
+        Returns:
+            tuple[list[dict], list[dict]]: Cached entries, extended by the ``node_id``
+                of their dataset, and the other entries.
+        """
+        cached, other = [], []
+        for entry in datasets:
+            node_id = (
+                self.get(entry["obj_name"], entry["value"])
+                if entry["value"] is not None
+                else None
+            )
+            if node_id is None:
+                other.append(entry)
+            else:
+                cached.append({**entry, "node_id": node_id})
+        return cached, other
+
+    def fill(
+        self, session: neo4j.Session, datasets: list[dict], batch_size: int = 1000
+    ) -> None:
+        """Cache the ids of the written datasets with value of registry entries.
+
+        Args:
+            session (neo4j.Session): Neo4j session instance with connected DBMS.
+            datasets (list[dict]): Written entries of the dataset registry.
+            batch_size (int, optional): Number of datasets looked up per query. Defaults
+                to 1000.
+        """
+        unique = {}
+        for entry in datasets:
+            if entry["value"] is None:
+                continue
+            try:
+                unique.setdefault(dataset_key(entry["obj_name"], entry["value"]), entry)
+            except TypeError:
+                continue
+        rows = [
+            {"obj_name": i["obj_name"], "value": i["value"]} for i in unique.values()
+        ]
+        batch_size = int(batch_size)
+        for start in range(0, len(rows), batch_size):
+            chunk = rows[start : start + batch_size]
+            for record in session.run(LOOKUP_QUERY, rows=chunk):
+                self.put(
+                    chunk[record["i"]]["obj_name"],
+                    chunk[record["i"]]["value"],
+                    record["node_id"],
+                )
+
+    def warm(self, session: neo4j.Session) -> None:
+        """Fill the cache with datasets already in the database.
+
+        Args:
+            session (neo4j.Session): Neo4j session instance with connected DBMS.
+        """
+        for record in session.run(WARM_QUERY, limit=self.max_size):
+            self.put(record["name"], record["value"], record["node_id"])
+
+    def report(self) -> dict:
+        """Get the size and the hit and miss counters of the cache.
+
+        Returns:
+            dict: Number of cached datasets, hits, misses and the hit rate.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+        }
@@ -0,0 +1,154 @@
+"""Compiled exclusion rules of groups, datasets and paths."""
+
+import re
+from fnmatch import translate
+
+# Prefix of exclusion rules which are regular expressions instead of names, substrings
+# or glob patterns
+REGEX_PREFIX = "re:"
+
+
+def _is_glob(rule: str) -> bool:
+    return any(c in rule for c in "*?[")
+
+
+def _translate_path(rule: str) -> str:
+    # Like fnmatch.translate, but * and ? do not match across groups, ** does
+    parts, i = [], 0
+    while i < len(rule):
+        if rule.startswith("**", i):
+            parts.append(".*")
+            i += 2
+            continue
+        c = rule[i]
+        end = rule.find("]", i + 2) if c == "[" else -1
+        if c == "*":
+            parts.append("[^/]*")
+        elif c == "?":
+            parts.append("[^/]")
+        elif end != -1:
+            chars = rule[i + 1 : end]
+            if chars.startswith("!"):
+                chars = "^" + chars[1:]
+            parts.append("[" + chars.replace("\\", "\\\\") + "]")
+            i = end
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return "".join(parts) + r"\Z"
+
+
+def _compile(patterns: list[str]):
+    return re.compile("|".join(f"(?:{i})" for i in patterns)) if patterns else None
+
+
+class PathFilter:
+    """Compiled exclusion rules, deciding in constant time if an object is excluded.
+
+    Names of excluded groups and datasets are either exact names, looked up in a set,
+    glob patterns (e.g. ``Curve_*``) or regular expressions prefixed by ``re:``, which
+    have to match the whole name.
+    Path rules are either substrings of the path, as before, glob patterns which have to
+    match the whole path (e.g. ``/*/Spline``, where ``*`` stays within a group and
+    ``**`` spans groups) or regular expressions prefixed by ``re:``, which are searched
+    in the path.
+    All patterns of a kind are compiled into a single regular expression, and the result
+    is cached per name.
+
+    Args:
+        exclude_datasets (list[str], optional): Names or patterns of datasets which are
+            excluded. Defaults to [].
+        exclude_groups (list[str], optional): Names or patterns of groups which are
+            excluded, together with everything below them. Defaults to [].
+        exclude_paths (list[str], optional): Substrings or patterns of the paths of
+            groups and datasets which are excluded. Defaults to [].
+    """
+
+    def __init__(
+        self,
+        exclude_datasets: list[str] = [],
+        exclude_groups: list[str] = [],
+        exclude_paths: list[str] = [],
+    ):
+        """Split and compile the exclusion rules."""
+        self.dataset_names, self.dataset_patterns = self._split_names(exclude_datasets)
+        self.group_names, self.group_patterns = self._split_names(exclude_groups)
+        patterns = []
+        for rule in exclude_paths:
+            if rule.startswith(REGEX_PREFIX):
+                patterns.append(rule[len(REGEX_PREFIX) :])
+            elif _is_glob(rule):
+                patterns.append("^" + _translate_path(rule))
+            else:
+                patterns.append(re.escape(rule))
+        self.path_pattern = _compile(patterns)
+        # name -> whether it is excluded, names repeat across the groups of a file
+        self._datasets = {}
+        self._groups = {}
+
+    @staticmethod
+    def _split_names(rules: list[str]) -> tuple[frozenset, re.Pattern]:
+        names, patterns = set(), []
+        for rule in rules:
+            if rule.startswith(REGEX_PREFIX):
+                patterns.append(rule[len(REGEX_PREFIX) :])
+            elif _is_glob(rule):
+                patterns.append(translate(rule))
+            else:
+                names.add(rule)
+        return frozenset(names), _compile(patterns)
+
+    def _excluded_name(self, name: str, cache: dict, names: frozenset, pattern) -> bool:
+        excluded = cache.get(name)
+        if excluded is None:
+            excluded = name in names or (
+                pattern is not None and pattern.fullmatch(name) is not None
+            )
+            cache[name] = excluded
+        return excluded
+
+    def excludes_path(self, path: str) -> bool:
+        """Check whether a path is excluded by the path rules.
+
+        Args:
+            path (str): Path of the object in the hdf5 file.
+
+        Returns:
+            bool: Whether the object is excluded.
+        """
+        return (
+            self.path_pattern is not None and self.path_pattern.search(path) is not None
+        )
+
+    def excludes_group(self, path: str) -> bool:
+        """Check whether a group, and with it everything below it, is excluded.
+
+        Groups directly below the root are never excluded, as their nodes are attached
+        to the File node.
+
+        Args:
+            path (str): Path of the group in the hdf5 file.
+
+        Returns:
+            bool: Whether the group is excluded.
+        """
+        parent, _, name = path.rpartition("/")
+        if not parent:
+            return False
+        return self._excluded_name(
+            name, self._groups, self.group_names, self.group_patterns
+        ) or self.excludes_path(path)
+
+    def excludes_dataset(self, path: str) -> bool:
+        """Check whether a dataset is excluded.
+
+        Args:
+            path (str): Path of the dataset in the hdf5 file.
+
+        Returns:
+            bool: Whether the dataset is excluded.
+        """
+        name = path.rpartition("/")[2]
+        return self._excluded_name(
+            name, self._datasets, self.dataset_names, self.dataset_patterns
+        ) or self.excludes_path(path)
@@ -0,0 +1,346 @@
+"""Export of hdf5 files to CSV files for ``neo4j-admin database import``."""
+
+import csv
+import hashlib
+import math
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from hdf5_graph.arrays import ArrayPolicy
+from hdf5_graph.attrs import AttrPolicy
+from hdf5_graph.handle_structure import DEFAULT_SUFFIXES, iter_h5_files
+from hdf5_graph.walker import walk_hdf5
+
+# Delimiter between the elements of array properties, passed to neo4j-admin as
+# --array-delimiter
+ARRAY_DELIMITER = "\x1f"
+# Maximum number of CSV files kept open at once, the least recently used ones are
+# reopened for appending
+MAX_OPEN_FILES = 64
+
+# neo4j-admin types of the python types of property values
+_TYPES = {bool: "boolean", int: "long", float: "double", str: "string"}
+
+
+def _node_id(*parts: str) -> str:
+    # Stable ids, the same object gets the same id in every export
+    return hashlib.blake2b("\0".join(parts).encode(), digest_size=16).hexdigest()
+
+
+def _plain(value):
+    # numpy scalars and one-dimensional arrays to python objects, multi-dimensional
+    # arrays are no valid properties
+    if isinstance(value, np.ndarray):
+        value = value.tolist() if value.ndim <= 1 else None
+    elif isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    if isinstance(value, (list, tuple)):
+        return [
+            i.decode("utf-8", errors="replace") if isinstance(i, bytes) else i
+            for i in value
+        ]
+    return value
+
+
+def _format(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "Infinity" if value > 0 else "-Infinity"
+        return repr(value)
+    return str(value)
+
+
+def csv_property(value) -> tuple[str, str] | None:
+    """Convert a property value into its neo4j-admin type and CSV field.
+
+    Args:
+        value: Value of the property, e.g. a dataset value or an attribute.
+
+    Returns:
+        tuple[str, str] | None: Type of the column and text of the field, None if the
+            value can not be stored as property.
+    """
+    value = _plain(value)
+    if isinstance(value, list):
+        kinds = {_TYPES.get(type(i)) for i in value}
+        if kinds == {"long", "double"}:
+            kinds = {"double"}
+        if len(kinds) != 1 or None in kinds:
+            return None  # empty, mixed or nested lists
+        return f"{kinds.pop()}[]", ARRAY_DELIMITER.join(_format(i) for i in value)
+    kind = _TYPES.get(type(value))
+    if kind is None:
+        return None
+    return kind, _format(value)
+
+
+class CsvExport:
+    """Write hdf5 files as CSV files for ``neo4j-admin database import``.
+
+    The files are traversed with the same exclusion rules as ``put_hdf5_in_neo4j`` and
+    the same File, Group and Dataset nodes and holds and depends_on relationships are
+    written.
+    Datasets with a value are written once per (name, value), all holders get a holds
+    relationship to the same node.
+    Node ids are derived from the filepath and hdf5_path, or from name and value for
+    datasets with a value, so they are stable between exports.
+
+    Rows are written while the files are traversed, only the ids of the written datasets
+    with value are kept in memory.
+    As the import needs the same columns in all rows of a file, nodes with differing
+    properties (e.g. attrs) are written to separate files, each with its own header.
+
+    Args:
+        out_dir (Path): Directory the CSV files are written to.
+        exclude_datasets (list[str], optional): List of strings with names of datasets
+            which should not be exported. Defaults to [].
+        exclude_groups (list[str], optional): List of strings with names of groups which
+            should not be exported. Defaults to [].
+        exclude_paths (list[str], optional): List of strings with pathparts of datasets
+            which should not be exported. Defaults to [].
+        transfer_attrs (bool, optional): Whether the attrs of the HDF5-objects should be
+            exported as properties. Defaults to True.
+        array_policy (ArrayPolicy, optional): How array datasets are stored, e.g. as
+            list or summary statistics. If None they are stored without value. Defaults
+            to None.
+        attr_policy (AttrPolicy, optional): Which attrs are exported and how they are
+            converted. If None all attrs are exported as they are. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        out_dir: Path,
+        exclude_datasets: list[str] = [],
+        exclude_groups: list[str] = [],
+        exclude_paths: list = [],
+        transfer_attrs: bool = True,
+        array_policy: ArrayPolicy = None,
+        attr_policy: AttrPolicy = None,
+    ):
+        """Create the output directory."""
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.exclude_datasets = exclude_datasets
+        self.exclude_groups = exclude_groups
+        self.exclude_paths = exclude_paths
+        self.transfer_attrs = transfer_attrs
+        self.array_policy = array_policy
+        self.attr_policy = attr_policy
+        self.node_files = {}  # (label, header) -> path
+        self.relationship_files = {}  # type -> path
+        self.counts = {"File": 0, "Group": 0, "Dataset": 0, "holds": 0, "depends_on": 0}
+        self._open = OrderedDict()  # path -> (file, csv writer)
+        self._datasets = set()  # ids of the written datasets with value
+
+    def __enter__(self):
+        """Enter the export, the files are closed on exit."""
+        return self
+
+    def __exit__(self, *exc):
+        """Close all open CSV files."""
+        self.close()
+        return False
+
+    def close(self) -> None:
+        """Close all CSV files."""
+        while self._open:
+            _, (file, _) = self._open.popitem()
+            file.close()
+
+    def _writer(self, path: Path, header: list[str], new: bool):
+        if path in self._open:
+            self._open.move_to_end(path)
+            return self._open[path][1]
+        if len(self._open) >= MAX_OPEN_FILES:
+            _, (file, _) = self._open.popitem(last=False)
+            file.close()
+        # kept open across calls and closed on eviction or by ``close``,
+        # so no context manager
+        file = open(path, "w" if new else "a", newline="", encoding="utf-8")  # noqa: SIM115
+        writer = csv.writer(file, lineterminator="\n")
+        if new:
+            writer.writerow(header)
+        self._open[path] = (file, writer)
+        return writer
+
+    def _node(self, label: str, node_id: str, props: dict) -> None:
+        columns = []
+        for key, value in props.items():
+            prop = csv_property(value)
+            # colons separate name and type in the header
+            if prop is not None and ":" not in key:
+                columns.append((key, *prop))
+        columns.sort()
+        # an unnamed id column, so the import does not store the id as property, unlike
+        # the nodes written with Cypher
+        header = [":ID", *(f"{key}:{kind}" for key, kind, _ in columns), ":LABEL"]
+        new = (label, tuple(header)) not in self.node_files
+        if new:
+            index = sum(1 for i, _ in self.node_files if i == label)
+            self.node_files[label, tuple(header)] = (
+                self.out_dir / f"{label.lower()}_nodes_{index}.csv"
+            )
+        writer = self._writer(self.node_files[label, tuple(header)], header, new)
+        writer.writerow([node_id, *(text for _, _, text in columns), label])
+        self.counts[label] += 1
+
+    def _relationship(self, kind: str, start: str, end: str) -> None:
+        new = kind not in self.relationship_files
+        if new:
+            self.relationship_files[kind] = self.out_dir / f"{kind}.csv"
+        writer = self._writer(
+            self.relationship_files[kind], [":START_ID", ":END_ID", ":TYPE"], new
+        )
+        writer.writerow([start, end, kind])
+        self.counts[kind] += 1
+
+    def add_file(self, hdf5_filepath: Path, depends_on: list[Path] = []) -> None:
+        """Export an hdf5 file with its File node, its groups and datasets.
+
+        Args:
+            hdf5_filepath (Path): Path to hdf5 which should be exported.
+            depends_on (list[Path], optional): Filepaths of the files the File node
+                depends on. Defaults to [].
+        """
+        filepath = str(hdf5_filepath)
+        file_id = _node_id("File", filepath)
+        stat = hdf5_filepath.stat()
+        self._node(
+            "File",
+            file_id,
+            {
+                "name": hdf5_filepath.name,
+                "filepath": filepath,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime_ns,
+            },
+        )
+        for i in depends_on:
+            self._relationship("depends_on", file_id, _node_id("File", str(i)))
+
+        def emit(kind, record):
+            if kind == "group":
+                node_id = _node_id("Group", filepath, record["hdf5_path"])
+                props = {
+                    "name": record["obj_name"],
+                    "hdf5_path": record["hdf5_path"],
+                    "filepath": filepath,
+                }
+                self._node("Group", node_id, {**props, **record["attrs"]})
+            else:
+                value = (
+                    csv_property(record["value"])
+                    if record["value"] is not None
+                    else None
+                )
+                if value is None:
+                    node_id = _node_id("Dataset", filepath, record["hdf5_path"])
+                    props = {
+                        "name": record["obj_name"],
+                        "hdf5_path": record["hdf5_path"],
+                        "filepath": filepath,
+                    }
+                    self._node(
+                        "Dataset",
+                        node_id,
+                        {**props, **record["array_props"], **record["attrs"]},
+                    )
+                else:
+                    # datasets with the same name and value are the same node,
+                    # as with MERGE
+                    node_id = _node_id("Dataset", record["obj_name"], *value)
+                    if node_id not in self._datasets:
+                        self._datasets.add(node_id)
+                        props = {
+                            "name": record["obj_name"],
+                            "value": record["value"],
+                            "hdf5_path": record["hdf5_path"],
+                        }
+                        self._node(
+                            "Dataset",
+                            node_id,
+                            {**props, **record["array_props"], **record["attrs"]},
+                        )
+            parent = (
+                file_id
+                if record["parent"] == filepath
+                else _node_id("Group", filepath, record["parent"])
+            )
+            self._relationship("holds", parent, node_id)
+
+        walk_hdf5(
+            hdf5_filepath,
+            emit,
+            self.exclude_datasets,
+            self.exclude_groups,
+            self.exclude_paths,
+            self.transfer_attrs,
+            self.array_policy,
+            self.attr_policy,
+        )
+
+    def import_args(self) -> list[str]:
+        """Get the arguments of ``neo4j-admin database import full`` for the files.
+
+        Returns:
+            list[str]: Arguments, without the name of the database.
+        """
+        args = [f"--nodes={path}" for path in self.node_files.values()]
+        args += [f"--relationships={path}" for path in self.relationship_files.values()]
+        args += ["--array-delimiter=U+001F", "--multiline-fields=true"]
+        return args
+
+
+def export_hdf5_to_csv(
+    hdf5_filepath: Path, out_dir: Path, depends_on: list[Path] = [], **kwargs
+) -> list[str]:
+    """Export an hdf5 file to CSV files for ``neo4j-admin database import``.
+
+    Keyword arguments are supplied to ``CsvExport``.
+
+    Args:
+        hdf5_filepath (Path): Path to hdf5 which should be exported.
+        out_dir (Path): Directory the CSV files are written to.
+        depends_on (list[Path], optional): Filepaths of the files the File node depends
+            on. Defaults to [].
+
+    Returns:
+        list[str]: Arguments of ``neo4j-admin database import full`` importing the
+            written files.
+    """
+    with CsvExport(out_dir, **kwargs) as export:
+        export.add_file(hdf5_filepath, depends_on)
+    return export.import_args()
+
+
+def export_dir_to_csv(
+    dir_path: Path, out_dir: Path, suffixes: tuple[str] = DEFAULT_SUFFIXES, **kwargs
+) -> list[str]:
+    """Export all h5-files of a directory for ``neo4j-admin database import``.
+
+    The files are made dependent on each other, based on the nesting.
+
+    Keyword arguments are supplied to ``CsvExport``.
+
+    Args:
+        dir_path (Path): Path to directory, which should be traversed.
+        out_dir (Path): Directory the CSV files are written to.
+        suffixes (tuple[str], optional): Suffixes of the h5-files, e.g.
+            ``HDF5_SUFFIXES``. Defaults to DEFAULT_SUFFIXES.
+
+    Returns:
+        list[str]: Arguments of ``neo4j-admin database import full`` importing the
+            written files.
+    """
+    with CsvExport(out_dir, **kwargs) as export:
+        for hdf5_filepath, parent_files in iter_h5_files(dir_path, suffixes=suffixes):
+            export.add_file(hdf5_filepath, parent_files)
+    return export.import_args()
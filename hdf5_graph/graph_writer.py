@@ -0,0 +1,133 @@
+"""Interface of the backends the registries of hdf5 files are written to."""
+
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+
+class GraphWriter(ABC):
+    """Interface of the backends the registries of hdf5 files are written to.
+
+    ``put_hdf5_in_neo4j``, ``put_dir_in_neo4j`` and ``write_hdf5_diff`` accept a writer
+    in place of the session, a plain session is wrapped into a ``CypherWriter``.
+    The records are those of ``read_hdf5_registries``, groups are always written before
+    the datasets they hold.
+    A backend has to implement all abstract methods, otherwise it cannot be
+    instantiated.
+    """
+
+    def create_schema(self) -> None:
+        """Create the indexes and constraints the writes rely on, if there are any."""
+        pass
+
+    @abstractmethod
+    def create_file(self, hdf5_filepath: Path) -> None:
+        """Create the File node of a file.
+
+        Args:
+            hdf5_filepath (Path): Path to the hdf5 file.
+        """
+
+    @abstractmethod
+    def write_groups(
+        self, hdf5_filepath: Path, groups: list[dict], transfer_attrs: bool = True
+    ) -> None:
+        """Create Group nodes and the holds relationships from their parents.
+
+        Args:
+            hdf5_filepath (Path): Path to the hdf5 file of the groups.
+            groups (list[dict]): Records of the groups.
+            transfer_attrs (bool, optional): Whether the attrs are stored as properties.
+                Defaults to True.
+        """
+
+    @abstractmethod
+    def write_datasets(
+        self, hdf5_filepath: Path, datasets: list[dict], transfer_attrs: bool = True
+    ) -> None:
+        """Create Dataset nodes and the holds relationships from their parents.
+
+        Datasets with a value are merged by (name, value), so equal datasets of all
+        files are one node. Datasets without a value always get their own node.
+
+        Args:
+            hdf5_filepath (Path): Path to the hdf5 file of the datasets.
+            datasets (list[dict]): Records of the datasets.
+            transfer_attrs (bool, optional): Whether the attrs are stored as properties.
+                Defaults to True.
+        """
+
+    @abstractmethod
+    def link_file(self, hdf5_filepath: Path, connect_to_filepath: list[Path]) -> None:
+        """Let the File node of a file depend on the nodes of other files.
+
+        Args:
+            hdf5_filepath (Path): Path to the depending hdf5 file.
+            connect_to_filepath (list[Path]): Paths of the files it depends on.
+        """
+
+    @abstractmethod
+    def link_dependencies(self, dependencies: list[tuple[Path, list[Path]]]) -> None:
+        """Create the depends_on relationships between already written File nodes.
+
+        Args:
+            dependencies (list[tuple[Path, list[Path]]]): Pairs of a filepath and the
+                filepaths it depends on.
+        """
+
+    @abstractmethod
+    def stored_tree(
+        self, hdf5_filepath: Path
+    ) -> tuple[dict[str, dict], dict[str, dict]]:
+        """Get the properties of the groups and datasets stored for a file.
+
+        Args:
+            hdf5_filepath (Path): Path to the hdf5 file.
+
+        Returns:
+            tuple[dict[str, dict], dict[str, dict]]: Properties of the groups and of the
+                datasets held by the file, keyed by their hdf5_path in the file.
+        """
+
+    @abstractmethod
+    def remove_datasets(self, hdf5_filepath: Path, datasets: list[dict]) -> None:
+        """Remove datasets from their parents, and the datasets not held anymore.
+
+        Args:
+            hdf5_filepath (Path): Path to the hdf5 file of the datasets.
+            datasets (list[dict]): Parent, name and value of the datasets.
+        """
+
+    @abstractmethod
+    def remove_groups(self, hdf5_filepath: Path, hdf5_paths: list[str]) -> None:
+        """Remove Group nodes with their relationships.
+
+        Args:
+            hdf5_filepath (Path): Path to the hdf5 file of the groups.
+            hdf5_paths (list[str]): Paths of the groups in the file.
+        """
+
+    @abstractmethod
+    def update_groups(self, hdf5_filepath: Path, groups: list[dict]) -> None:
+        """Replace the properties of Group nodes.
+
+        Args:
+            hdf5_filepath (Path): Path to the hdf5 file of the groups.
+            groups (list[dict]): Path and new properties of the groups.
+        """
+
+    @abstractmethod
+    def update_datasets(self, hdf5_filepath: Path, datasets: list[dict]) -> None:
+        """Replace the properties of Dataset nodes without a value.
+
+        Args:
+            hdf5_filepath (Path): Path to the hdf5 file of the datasets.
+            datasets (list[dict]): Path and new properties of the datasets.
+        """
+
+    @abstractmethod
+    def update_shared_datasets(self, datasets: list[dict]) -> None:
+        """Add attrs to the Dataset nodes merged by (name, value).
+
+        Args:
+            datasets (list[dict]): Name, value and attrs of the datasets.
+        """
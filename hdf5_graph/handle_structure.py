@@ -1,49 +1,371 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 
 import neo4j
 from neo4j import GraphDatabase
 
-from hdf5_graph.single_hdf5 import put_hdf5_in_neo4j
+from hdf5_graph.checkpoint import Checkpoint
+from hdf5_graph.graph_writer import GraphWriter
+from hdf5_graph.incremental import (
+    check_hdf5_file,
+    record_fingerprint,
+    update_hdf5_in_neo4j,
+    write_hdf5_diff,
+)
+from hdf5_graph.metrics import emit_event, timed_phase
+from hdf5_graph.records import (
+    iter_read_files,
+    read_packed_registries,
+    unpack_registries,
+)
+from hdf5_graph.remove import purge
+from hdf5_graph.single_hdf5 import (
+    as_writer,
+    log_traversal,
+    put_hdf5_in_neo4j,
+    write_hdf5_registries,
+)
 
+# Suffixes of the h5-files found in a directory by default, and the usual suffixes of
+# hdf5 files
+DEFAULT_SUFFIXES = (".h5",)
+HDF5_SUFFIXES = (".h5", ".hdf5", ".nxs")
+# Keyword arguments of ``put_hdf5_in_neo4j`` used for reading and for writing a file,
+# when ingesting with several workers
+READ_KWARGS = (
+    "exclude_datasets",
+    "exclude_groups",
+    "exclude_paths",
+    "transfer_attrs",
+    "array_policy",
+    "attr_policy",
+)
+WRITE_KWARGS = (
+    "batch_size",
+    "transfer_attrs",
+    "parallel_group",
+    "parallel_dataset",
+    "concurrency",
+    "engine",
+    "dataset_cache",
+)
 
-def put_dir_in_neo4j(dir_path: Path, session: neo4j.Session, **kwargs) -> None:
-    """Traverse a directory, and put all found h5-files into neo4j, making them dependent on each other, based on the nesting.
 
-    Keyword arguments are supplied to the ``put_hdf5_in_neo4j`` function
+def iter_h5_files(
+    path: Path, parent_files: list[Path] = None, suffixes: tuple[str] = DEFAULT_SUFFIXES
+):
+    """Yield all h5-files of a directory tree with the h5-files they depend on.
+
+    A file depends on the h5-files found in the directory directly above it.
+    Every directory is listed once with ``os.scandir``, and the pairs are yielded while
+    the directory tree is still traversed.
+    The files of a directory are yielded in name order before its subdirectories, which
+    are traversed depth-first.
+    All files of a subdirectory share the same list of parent files, which must not be
+    changed.
 
     Args:
-        dir_path (Path): Path to directory, which should be traversed.
-        session (neo4j.Session): Open neo4j-Session.
+        path (Path): Path to directory, which should be traversed.
+        parent_files (list[Path], optional): h5-files the files in ``path`` depend on.
+            Defaults to None.
+        suffixes (tuple[str], optional): Suffixes of the h5-files, e.g.
+            ``HDF5_SUFFIXES``. Defaults to DEFAULT_SUFFIXES.
+
+    Yields:
+        tuple[Path, list[Path]]: Path of the h5-file and paths of the files it depends
+            on.
     """
-    # handle kwargs, as connected_to_filepath is set by function itself:
-    kwargs = {k: v for k, v in kwargs.items() if k != "connect_to_filepath"}
+    suffixes = tuple(suffixes)
+    # directories still to be listed, together with the files their files depend on
+    pending = [(Path(path), parent_files if parent_files is not None else [])]
+    while pending:
+        directory, parents = pending.pop()
+        current_files, subdirs = [], []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    subdirs.append(entry.path)
+                elif entry.name.endswith(suffixes):
+                    current_files.append(Path(entry.path))
+        current_files.sort()
+        for i in current_files:
+            yield i, parents
+        # reversed, so the subdirectories are taken from the stack in name order
+        pending.extend((Path(i), current_files) for i in sorted(subdirs, reverse=True))
 
-    def _find_h5_files(path, level=1, accumulated_files=None):
-        # Initialize a list for the current level if it doesn't exist
-        # if level not in h5_files_dict:
-        #     h5_files_dict[level] = []
 
-        # If accumulated_files is None, create an empty list
-        if accumulated_files is None:
-            accumulated_files = []
+def link_dependencies(
+    session: neo4j.Session,
+    dependencies: list[tuple[Path, list[Path]]],
+    batch_size: int = 1000,
+) -> None:
+    """Create the depends_on relationships between already existing File nodes.
 
-        # Find all .h5 files in the current directory
-        current_files = list(path.glob("*.h5"))
-        # accumulated_files.extend(current_files)
+    Args:
+        session (neo4j.Session | GraphWriter): Open neo4j-Session, or another writer.
+        dependencies (list[tuple[Path, list[Path]]]): Pairs of a filepath and the
+            filepaths it depends on.
+        batch_size (int, optional): Number of files linked per query. Defaults to 1000.
+    """
+    with timed_phase(
+        None, "linking", files=sum(1 for _, depends_on in dependencies if depends_on)
+    ):
+        as_writer(session, batch_size=batch_size).link_dependencies(dependencies)
 
-        # Add all accumulated .h5 files to the current level
-        for i in current_files:
-            put_hdf5_in_neo4j(
-                i, session, connect_to_filepath=accumulated_files, **kwargs
+
+def _write_file(
+    session: neo4j.Session,
+    hdf5_filepath: Path,
+    status: str,
+    group_registry: list[dict],
+    dataset_registry: list[dict],
+    hash_content: bool = False,
+    **write_kwargs,
+) -> None:
+    # Write the registries of a new file, or the difference to the stored registries of
+    # a changed file
+    if status == "new":
+        write_hdf5_registries(
+            hdf5_filepath, session, group_registry, dataset_registry, **write_kwargs
+        )
+        if hash_content:
+            record_fingerprint(session, hdf5_filepath, hash_content)
+    else:
+        write_hdf5_diff(
+            hdf5_filepath, session, group_registry, dataset_registry, **write_kwargs
+        )
+        record_fingerprint(session, hdf5_filepath, hash_content)
+
+
+def _put_dir_in_neo4j_parallel(
+    files,
+    driver: neo4j.Driver,
+    workers: int,
+    readers: int,
+    incremental: bool = False,
+    hash_content: bool = False,
+    checkpoint: Checkpoint = None,
+    **kwargs,
+) -> None:
+    read_kwargs = {k: v for k, v in kwargs.items() if k in READ_KWARGS}
+    write_kwargs = {k: v for k, v in kwargs.items() if k in WRITE_KWARGS}
+
+    # One session per writing thread, all taken from the connection pool of the driver
+    local = threading.local()
+    sessions = []
+    sessions_lock = threading.Lock()
+
+    def worker_session():
+        if not hasattr(local, "session"):
+            local.session = driver.session()
+            with sessions_lock:
+                sessions.append(local.session)
+        return local.session
+
+    def ingest(hdf5_filepath):
+        session = worker_session()
+        if checkpoint is not None and not checkpoint.begin(session, hdf5_filepath):
+            return
+        status = (
+            check_hdf5_file(session, hdf5_filepath, hash_content)
+            if incremental
+            else "new"
+        )
+        if status == "unchanged":
+            if checkpoint is not None:
+                checkpoint.finish(hdf5_filepath)
+            return
+        start = time.perf_counter()
+        # reading is done in another process, while the other threads are writing
+        packed, stats = reader_pool.submit(
+            read_packed_registries, hdf5_filepath, **read_kwargs
+        ).result()
+        log_traversal(hdf5_filepath, stats)
+        group_registry, dataset_registry = unpack_registries(hdf5_filepath, packed)
+        _write_file(
+            session,
+            hdf5_filepath,
+            status,
+            group_registry,
+            dataset_registry,
+            hash_content,
+            **write_kwargs,
+        )
+        if checkpoint is not None:
+            checkpoint.finish(hdf5_filepath)
+        emit_event("file", hdf5_filepath, seconds=round(time.perf_counter() - start, 6))
+
+    try:
+        with (
+            ProcessPoolExecutor(max_workers=readers) as reader_pool,
+            ThreadPoolExecutor(max_workers=workers) as writers,
+        ):
+            for i in [
+                writers.submit(ingest, hdf5_filepath) for hdf5_filepath, _ in files
+            ]:
+                i.result()
+    finally:
+        for session in sessions:
+            session.close()
+
+
+def _put_dir_in_neo4j_readers(
+    files,
+    session: neo4j.Session,
+    readers: int,
+    incremental: bool = False,
+    hash_content: bool = False,
+    checkpoint: Checkpoint = None,
+    **kwargs,
+) -> None:
+    read_kwargs = {k: v for k, v in kwargs.items() if k in READ_KWARGS}
+    write_kwargs = {k: v for k, v in kwargs.items() if k in WRITE_KWARGS}
+    statuses = {}
+
+    def changed_files():
+        # checked while the readers are filled, unchanged files are never read
+        for hdf5_filepath, parent_files in files:
+            if checkpoint is not None and not checkpoint.begin(session, hdf5_filepath):
+                continue
+            statuses[hdf5_filepath] = (
+                check_hdf5_file(session, hdf5_filepath, hash_content)
+                if incremental
+                else "new"
             )
+            if statuses[hdf5_filepath] != "unchanged":
+                yield hdf5_filepath, parent_files
+            elif checkpoint is not None:
+                checkpoint.finish(hdf5_filepath)
+
+    # The files are read ahead by the reader processes, the session is the only writer
+    start = time.perf_counter()
+    for hdf5_filepath, _, group_registry, dataset_registry in iter_read_files(
+        changed_files(), readers, **read_kwargs
+    ):
+        _write_file(
+            session,
+            hdf5_filepath,
+            statuses[hdf5_filepath],
+            group_registry,
+            dataset_registry,
+            hash_content,
+            **write_kwargs,
+        )
+        if checkpoint is not None:
+            checkpoint.finish(hdf5_filepath)
+        emit_event("file", hdf5_filepath, seconds=round(time.perf_counter() - start, 6))
+        start = time.perf_counter()
+
+
+def put_dir_in_neo4j(
+    dir_path: Path,
+    session: neo4j.Session | GraphWriter,
+    workers: int = 1,
+    driver: neo4j.Driver = None,
+    incremental: bool = False,
+    readers: int = None,
+    checkpoint: Checkpoint = None,
+    suffixes: tuple[str] = DEFAULT_SUFFIXES,
+    **kwargs,
+) -> None:
+    """Put all h5-files of a directory into neo4j.
+
+    The files are made dependent on each other, based on the nesting.
+
+    Keyword arguments are supplied to the ``put_hdf5_in_neo4j`` function, or to
+    ``update_hdf5_in_neo4j`` if ``incremental`` is set.
+    A ``dataset_cache`` given as keyword argument is shared by all files.
+
+    With more than one worker, the files are read in a process pool and written by a
+    pool of threads, each with its own session of ``driver``.
+    With a single worker and more than one reader, the files are read ahead in a process
+    pool and written one after another by ``session``.
+    The readers decode the values and send the registries back packed into NumPy arrays,
+    so the writers do not spend their time on the traversal.
+    The files are ingested while the directory is still traversed. The depends_on
+    relationships of all files are created in a final pass, after all files are written,
+    in batches of ``batch_size`` files.
+
+    With a ``checkpoint``, every file is journaled when it is started and completed.
+    Resuming with the journal of a failed run skips the completed files and writes
+    unfinished files again, after removing what was written of them.
+    Instead of a session, a ``GraphWriter`` such as ``MemoryGraph`` can be given, with a
+    single worker and without incremental updates or checkpoint.
+
+    Args:
+        dir_path (Path): Path to directory, which should be traversed.
+        session (neo4j.Session | GraphWriter): Open neo4j-Session, or another writer.
+        workers (int, optional): Number of files which are written in parallel. Defaults
+            to 1.
+        driver (neo4j.Driver, optional): Driver providing the sessions of the workers,
+            needed if workers > 1. Defaults to None.
+        incremental (bool, optional): Whether unchanged files should be skipped and
+            changed files only be updated. Defaults to False.
+        readers (int, optional): Number of processes reading files, if None as many as
+            there are workers. Defaults to None.
+        checkpoint (Checkpoint, optional): Journal of the written files, to resume a
+            failed ingestion. Defaults to None.
+        suffixes (tuple[str], optional): Suffixes of the h5-files, e.g.
+            ``HDF5_SUFFIXES``. Defaults to DEFAULT_SUFFIXES.
+    """
+    if isinstance(session, GraphWriter) and (
+        incremental or checkpoint is not None or workers > 1
+    ):
+        raise ValueError(
+            "Incremental updates, checkpoints and several workers need a "
+            "neo4j session instead of a writer."
+        )
+    # handle kwargs, as connected_to_filepath is set by function itself:
+    kwargs = {k: v for k, v in kwargs.items() if k != "connect_to_filepath"}
+    # the schema is created once for the whole directory, not once per file:
+    if kwargs.pop("bootstrap_schema", True):
+        as_writer(session).create_schema()
+    kwargs["bootstrap_schema"] = False
+    if not incremental:
+        kwargs.pop("hash_content", None)
+    if readers is None:
+        readers = workers
+
+    if workers > 1 and driver is None:
+        raise ValueError(
+            "A driver is needed to ingest a directory with several workers."
+        )
+
+    # The files are ingested while the directory is still traversed, their dependencies
+    # are kept for the final pass
+    dependencies = []
 
-        # Recursively traverse subdirectories
-        for subdir in path.iterdir():
-            if subdir.is_dir():
-                # Pass down the accumulated files to the subdirectory
-                _find_h5_files(subdir, level + 1, current_files.copy())
+    def discovered():
+        for pair in iter_h5_files(dir_path, suffixes=suffixes):
+            dependencies.append(pair)
+            yield pair
 
-    _find_h5_files(dir_path)
+    if workers > 1:
+        _put_dir_in_neo4j_parallel(
+            discovered(),
+            driver,
+            workers,
+            readers,
+            incremental,
+            checkpoint=checkpoint,
+            **kwargs,
+        )
+    elif readers > 1:
+        _put_dir_in_neo4j_readers(
+            discovered(), session, readers, incremental, checkpoint=checkpoint, **kwargs
+        )
+    else:
+        ingest = update_hdf5_in_neo4j if incremental else put_hdf5_in_neo4j
+        for hdf5_filepath, _ in discovered():
+            if checkpoint is not None and not checkpoint.begin(session, hdf5_filepath):
+                continue
+            ingest(hdf5_filepath, session, driver=driver, **kwargs)
+            if checkpoint is not None:
+                checkpoint.finish(hdf5_filepath)
+    link_dependencies(session, dependencies, kwargs.get("batch_size", 1000))
 
 
 if __name__ == "__main__":
@@ -56,11 +378,10 @@ if __name__ == "__main__":
     # dir_path = Path("data/ng5/id0/pre1/sim1")
     dir_path = Path("data/ng5")
 
-    with GraphDatabase.driver(URI, auth=AUTH, database=DATABASE) as driver:
-        with driver.session() as session:
-            session.run("""
-                        MATCH (n)
-                        DETACH DELETE n
-                        """)
+    with (
+        GraphDatabase.driver(URI, auth=AUTH, database=DATABASE) as driver,
+        driver.session() as session,
+    ):
+        purge(session)
 
-            put_dir_in_neo4j(dir_path, session)
+        put_dir_in_neo4j(dir_path, session)
@@ -1,10 +1,36 @@
 import argparse
+import asyncio
+import logging
 from pathlib import Path
 
-from neo4j import GraphDatabase
+from neo4j import AsyncGraphDatabase, GraphDatabase
 
-from hdf5_graph.handle_structure import put_dir_in_neo4j
+from hdf5_graph.arrays import (
+    ARRAY_POLICIES,
+    LIST_MAX_BYTES,
+    ArrayPolicy,
+    parse_array_patterns,
+)
+from hdf5_graph.async_ingest import put_dir_in_neo4j_async, put_hdf5_in_neo4j_async
+from hdf5_graph.attrs import OVERSIZED_POLICIES, AttrPolicy
+from hdf5_graph.checkpoint import Checkpoint
+from hdf5_graph.dedup import DatasetCache
+from hdf5_graph.export import export_dir_to_csv, export_hdf5_to_csv
+from hdf5_graph.handle_structure import (
+    DEFAULT_SUFFIXES,
+    HDF5_SUFFIXES,
+    iter_h5_files,
+    put_dir_in_neo4j,
+)
+from hdf5_graph.helpers import AdaptiveBatchSize
+from hdf5_graph.incremental import update_hdf5_in_neo4j
+from hdf5_graph.memory_graph import MemoryGraph
+from hdf5_graph.metrics import IngestMetrics
+from hdf5_graph.remove import purge, remove_file
+from hdf5_graph.scan import DEFAULT_THROUGHPUT, estimate, scan_files
 from hdf5_graph.single_hdf5 import put_hdf5_in_neo4j
+from hdf5_graph.watch import watch_dir
+from hdf5_graph.writers import ENGINES
 
 
 def gen_parser():
@@ -14,50 +40,63 @@ def gen_parser():
 
     subparsers = parser.add_subparsers(dest="command")
 
-    # Common arguments for both commands
-    common_parser = argparse.ArgumentParser(add_help=False)
-    # Global arguments for Neo4j connection
-    common_parser.add_argument(
+    # Global arguments for Neo4j connection, shared by all commands using the database
+    connection_parser = argparse.ArgumentParser(add_help=False)
+    connection_parser.add_argument(
         "--uri",
         type=str,
         default="neo4j://localhost",
         help="URI for the Neo4j database (default: neo4j://localhost).",
     )
-    common_parser.add_argument(
+    connection_parser.add_argument(
         "--username",
         type=str,
         default="neo4j",
         help="Username for the Neo4j database (default: neo4j).",
     )
-    common_parser.add_argument(
+    connection_parser.add_argument(
         "--password",
         type=str,
         default="neo4jadmin",
         help="Password for the Neo4j database (default: neo4jadmin).",
     )
-    common_parser.add_argument(
+    connection_parser.add_argument(
         "--database",
         type=str,
         default="neo4j",
         help="Database name for the Neo4j database (default: neo4j).",
     )
+    connection_parser.add_argument(
+        "--log-level",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        default="INFO",
+        help="Level of the logged ingestion events, one line per written query "
+        "and file at INFO (default: INFO).",
+    )
+
+    # Common arguments for both commands
+    common_parser = argparse.ArgumentParser(add_help=False, parents=[connection_parser])
     common_parser.add_argument(
         "--exclude-datasets",
         nargs="*",
         default=[],
-        help="List of dataset names to exclude.",
+        help="List of dataset names to exclude, glob patterns (e.g. Curve_*) or "
+        "regular expressions prefixed by re:.",
     )
     common_parser.add_argument(
         "--exclude-groups",
         nargs="*",
         default=[],
-        help="List of group names to exclude.",
+        help="List of group names to exclude together with everything below them, "
+        "glob patterns or regular expressions prefixed by re:.",
     )
     common_parser.add_argument(
         "--exclude-paths",
         nargs="*",
         default=[],
-        help="List of path parts of datasets to exclude.",
+        help="List of path parts of groups and datasets to exclude, glob patterns "
+        "matching the whole path (e.g. /*/Spline) "
+        "or regular expressions prefixed by re:.",
     )
     common_parser.add_argument(
         "--connect-to-filepath",
@@ -72,6 +111,20 @@ def gen_parser():
         default=1000,
         help="Number of transactions stored in heap before commiting.",
     )
+    common_parser.add_argument(
+        "--adaptive-batchsize",
+        action="store_true",
+        default=False,
+        help="Adapt the batch size to the observed "
+        "commit latency, starting with --batchsize.",
+    )
+    common_parser.add_argument(
+        "--target-latency",
+        type=float,
+        default=1.0,
+        help="Commit latency per batch in seconds aimed for by "
+        "--adaptive-batchsize (default: 1.0).",
+    )
     common_parser.add_argument(
         "--transfer_attrs",
         action="store_true",
@@ -93,7 +146,9 @@ def gen_parser():
         "--parallel_dataset",
         action="store_true",
         default=False,
-        help="Activate parallelization of the batches creating HDF5-datasets.",
+        help="Activate parallelization of the batches creating HDF5-datasets. "
+        "Datasets sharing a parent or a merged (name, value) node are kept "
+        "in the same batch, so parallel batches do not deadlock.",
     )
     common_parser.add_argument(
         "--concurrency",
@@ -101,14 +156,175 @@ def gen_parser():
         default=50,
         help="Number of concurrent tasks which are generated when using parallel.",
     )
+    common_parser.add_argument(
+        "--stream",
+        action="store_true",
+        default=False,
+        help="Write the HDF5-objects in chunks of batchsize while traversing the "
+        "file, instead of gathering the whole file in memory first.",
+    )
+    common_parser.add_argument(
+        "--incremental",
+        action="store_true",
+        default=False,
+        help="Skip files which did not change since the last ingestion and only "
+        "update the changed parts of the others.",
+    )
+    common_parser.add_argument(
+        "--hash-content",
+        action="store_true",
+        default=False,
+        help="Use a sha256 hash of the file content for the change detection of "
+        "--incremental, if the mtime changed.",
+    )
+    common_parser.add_argument(
+        "--array-policy",
+        choices=ARRAY_POLICIES,
+        default="none",
+        help="How array datasets larger than --array-list-size are stored: "
+        "without value, as list, as summary statistics "
+        "or as chunk reference (default: none).",
+    )
+    common_parser.add_argument(
+        "--array-list-size",
+        type=int,
+        default=0,
+        help="Arrays with at most this number of "
+        "elements are stored as list (default: 0).",
+    )
+    common_parser.add_argument(
+        "--array-list-bytes",
+        type=int,
+        default=LIST_MAX_BYTES,
+        help="Maximum size of a stored list in bytes, larger arrays are stored as "
+        f"summary or reference (default: {LIST_MAX_BYTES}).",
+    )
+    common_parser.add_argument(
+        "--array-patterns",
+        nargs="*",
+        default=[],
+        help="Array policies for hdf5 paths matching a glob pattern, given as "
+        "PATTERN=POLICY. They take precedence over the size.",
+    )
+    common_parser.add_argument(
+        "--attr-include",
+        nargs="*",
+        default=[],
+        help="Glob patterns of attr names which are transferred, all if not given.",
+    )
+    common_parser.add_argument(
+        "--attr-exclude",
+        nargs="*",
+        default=[],
+        help="Glob patterns of attr names which are not transferred.",
+    )
+    common_parser.add_argument(
+        "--attr-max-bytes",
+        type=int,
+        default=None,
+        help="Maximum size of a transferred attr value in bytes, larger attrs are "
+        "not read (default: no limit).",
+    )
+    common_parser.add_argument(
+        "--attr-oversized",
+        choices=OVERSIZED_POLICIES,
+        default="reference",
+        help="How attrs larger than --attr-max-bytes are stored: only their shape "
+        "and dtype, or not at all (default: reference).",
+    )
+    common_parser.add_argument(
+        "--backend",
+        choices=["neo4j", "memory"],
+        default="neo4j",
+        help="Where the graph is written: the neo4j database, or an in-process "
+        "graph without a server, e.g. to profile the "
+        "reading and conversion (default: neo4j).",
+    )
+    common_parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="apoc",
+        help="Engine writing the batches: apoc.periodic.iterate on the server, or "
+        "client-side UNWIND batches in managed "
+        "transactions, which need no APOC (default: apoc).",
+    )
+    common_parser.add_argument(
+        "--dataset-cache-size",
+        type=int,
+        default=0,
+        help="Cache the ids of up to this number of datasets with value, to link "
+        "known values by id instead of a MERGE (default: 0, no cache).",
+    )
+    common_parser.add_argument(
+        "--warm-dataset-cache",
+        action="store_true",
+        default=False,
+        help="Fill the dataset cache with the datasets "
+        "already in the database before the ingestion.",
+    )
+    common_parser.add_argument(
+        "--async",
+        dest="asynchronous",
+        action="store_true",
+        default=False,
+        help="Ingest with the async driver: reading runs in an executor while up "
+        "to --concurrency batches are in flight. Always streams with "
+        "client-side UNWIND batches, so --stream, --parallel_* and the "
+        "dataset cache cannot be used with it.",
+    )
+    common_parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        default=None,
+        help="Journal the started and completed files in this file, so a failed "
+        "ingestion can be continued with --resume.",
+    )
+    common_parser.add_argument(
+        "--resume",
+        action="store_true",
+        default=False,
+        help="Continue the ingestion journaled in --checkpoint: completed files "
+        "are skipped, unfinished files are removed and written again.",
+    )
+    common_parser.add_argument(
+        "--profile",
+        action="store_true",
+        default=False,
+        help="Print the time spent per file in traversal, value conversion, group "
+        "and dataset writes and linking, to see whether reading or the "
+        "database is the bottleneck.",
+    )
+    common_parser.add_argument(
+        "--suffixes",
+        nargs="+",
+        default=list(DEFAULT_SUFFIXES),
+        help="Suffixes of the HDF5 files found in a directory, e.g. "
+        f"{' '.join(HDF5_SUFFIXES)} (default: {' '.join(DEFAULT_SUFFIXES)}).",
+    )
+    common_parser.add_argument(
+        "--metrics-file",
+        type=Path,
+        default=None,
+        help="Write the ingestion metrics per file to this textfile in the "
+        "Prometheus format, e.g. for the textfile collector of the node exporter.",
+    )
 
     # Parser for the 'file' command
     parser_file = subparsers.add_parser(
         "file",
-        help="""Put all of the contents of the hdf5 file into a neo4j graph database, supplied by session.
-            This method traverses the complete hdf5-file, putting the datasets and possibly groups as 'experiments' between them in a neo4j graph.
-            Datasets will be transformed into valid Cypher datatypes if possible, also checking if there is already a node with the same name and value, and then not duplicating it, but instead creating a relationship.
-            The File node can be connected to other nodes via the connect_to_filepath list, where one supplies a list of filenames to connect to. The graph is then traversed and looks for nodes with a fitting filepath-property.""",
+        help="""Put all of the contents of the hdf5 file into a neo4j graph database,
+            supplied by session.
+            This method traverses the complete hdf5-file, putting the datasets and
+            possibly groups as 'experiments' between them in a neo4j graph.
+            Datasets will be transformed into valid Cypher datatypes if possible, also
+            checking if there is already a node with the same name and value, and then
+            not duplicating it, but instead creating a relationship.
+            The File node can be connected to other nodes via the connect_to_filepath
+            list, where one supplies a list of filenames to connect to. The File nodes
+            with a fitting filepath-property are looked up by the filepath index.
+            A file which is already in the database is rejected by the unique filepath
+            constraint, use --incremental to update it or the 'remove' command to remove
+            it first.""",
         parents=[common_parser],
     )
     parser_file.add_argument(
@@ -128,47 +344,563 @@ def gen_parser():
     parser_dir.add_argument(
         "dir_path", type=Path, help="Path to the directory to be traversed."
     )
+    parser_dir.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of files which are read and written in parallel (default: 1).",
+    )
+    parser_dir.add_argument(
+        "--readers",
+        type=int,
+        default=None,
+        help="Number of processes reading and decoding files ahead of the writers "
+        "(default: as many as --workers).",
+    )
+
+    # Parser for the 'export' command
+    parser_export = subparsers.add_parser(
+        "export",
+        help="""
+            Export an h5-file, or all h5-files of a directory, to CSV files for an
+            offline bulk import with neo4j-admin database import.
+
+            The same nodes and relationships as with the 'file' and 'directory' commands
+            are written, the import command is printed at the end.
+            """,
+        parents=[common_parser],
+    )
+    parser_export.add_argument(
+        "path", type=Path, help="Path to the HDF5 file or directory to be exported."
+    )
+    parser_export.add_argument(
+        "out_dir", type=Path, help="Directory the CSV files are written to."
+    )
+
+    # Parser for the 'scan' command
+    parser_scan = subparsers.add_parser(
+        "scan",
+        help="""
+            Estimate what putting an h5-file, or all h5-files of a directory, into neo4j
+            would create, without connecting to the database.
+
+            Only the metadata and the values of scalar datasets are read, with the same
+            exclusion rules as for an ingestion.
+            The nodes per label, relationships, distinct (name, value) pairs of the
+            merged datasets, attribute volume and the projected time are printed.
+            """,
+        parents=[common_parser],
+    )
+    parser_scan.add_argument(
+        "path", type=Path, help="Path to the HDF5 file or directory to be scanned."
+    )
+    parser_scan.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of files which are scanned in parallel (default: 1).",
+    )
+    parser_scan.add_argument(
+        "--throughput",
+        type=float,
+        default=DEFAULT_THROUGHPUT,
+        help="Ingested objects per second for the projected time, calibrate it "
+        "with the objects/s of a --profile run on a sample of the files "
+        f"(default: {DEFAULT_THROUGHPUT:g}).",
+    )
+
+    # Parser for the 'watch' command
+    parser_watch = subparsers.add_parser(
+        "watch",
+        help="""
+            Watch a directory and put every h5-file into neo4j as soon as it is
+            finished, until interrupted.
+
+            The directory is polled, a file is written once its size and mtime stayed
+            the same for --settle seconds and it can be opened.
+            Unchanged files are skipped and changed files are updated, so the watch can
+            be restarted. The files are linked based on the nesting, like with the
+            'directory' command.
+            """,
+        parents=[common_parser],
+    )
+    parser_watch.add_argument(
+        "dir_path", type=Path, help="Path to the directory to be watched."
+    )
+    parser_watch.add_argument(
+        "--interval",
+        type=float,
+        default=1.0,
+        help="Seconds between two polls of the directory (default: 1.0).",
+    )
+    parser_watch.add_argument(
+        "--settle",
+        type=float,
+        default=2.0,
+        help="Seconds a file must stay unchanged before it is written (default: 2.0).",
+    )
+    parser_watch.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of files which are written in parallel (default: 1).",
+    )
+    parser_watch.add_argument(
+        "--retries",
+        type=int,
+        default=3,
+        help="""
+            Number of times a failed file is retried with a growing delay, before it is
+            only retried once it changes (default: 3).
+            """,
+    )
+
+    # Parser for the 'remove' command
+    parser_remove = subparsers.add_parser(
+        "remove",
+        help="""
+            Remove the subgraph of h5-files from neo4j: their File nodes, groups and
+            datasets, in transactions of at most --batchsize nodes.
+
+            Datasets merged by name and value are only removed, if no other file holds
+            them. The removed nodes are logged per step.
+            """,
+        parents=[connection_parser],
+    )
+    parser_remove.add_argument(
+        "hdf5_filepath",
+        nargs="+",
+        type=Path,
+        help="Paths of the HDF5 files to be removed, as they were ingested.",
+    )
+    parser_remove.add_argument(
+        "--batchsize",
+        type=int,
+        default=10000,
+        help="Number of nodes deleted per transaction (default: 10000).",
+    )
+
+    # Parser for the 'purge' command
+    parser_purge = subparsers.add_parser(
+        "purge",
+        help="""
+            Remove all ingested File, Group and Dataset nodes from neo4j, in
+            transactions of at most --batchsize nodes.
+
+            The removed nodes are logged after every transaction.
+            """,
+        parents=[connection_parser],
+    )
+    parser_purge.add_argument(
+        "--batchsize",
+        type=int,
+        default=10000,
+        help="Number of nodes deleted per transaction (default: 10000).",
+    )
+    parser_purge.add_argument(
+        "--yes",
+        action="store_true",
+        default=False,
+        help="Confirm that the whole graph should be removed.",
+    )
 
     return parser
 
 
+def main_remove(args):
+    """Remove the given files, or all nodes of the database for purge."""
+    with (
+        GraphDatabase.driver(
+            args.uri, auth=(args.username, args.password), database=args.database
+        ) as driver,
+        driver.session() as session,
+    ):
+        if args.command == "purge":
+            removed = purge(session, args.batchsize)
+            print(
+                "Removed nodes: "
+                + ", ".join(f"{label}: {count}" for label, count in removed.items())
+            )
+            return
+        for hdf5_filepath in args.hdf5_filepath:
+            removed = remove_file(session, hdf5_filepath, args.batchsize)
+            print(
+                f"Removed from {hdf5_filepath}: "
+                + ", ".join(f"{step}: {count}" for step, count in removed.items())
+            )
+
+
+def main_scan(args, attr_policy):
+    """Print the estimate of the graph of a file or directory, without a database."""
+    if args.path.is_dir():
+        files = iter_h5_files(args.path, suffixes=args.suffixes)
+    else:
+        files = [(args.path, args.connect_to_filepath or [])]
+    scan = scan_files(
+        files,
+        workers=args.workers,
+        exclude_datasets=args.exclude_datasets,
+        exclude_groups=args.exclude_groups,
+        exclude_paths=args.exclude_paths,
+        transfer_attrs=args.transfer_attrs,
+        attr_policy=attr_policy,
+    )
+    result = estimate(scan, args.throughput)
+    print(
+        f"Files: {scan['files']}, groups: {scan['groups']}, scalar datasets: "
+        f"{scan['scalars']}, array datasets: {scan['arrays']}"
+    )
+    print(
+        "Nodes: "
+        + ", ".join(f"{label}: {count}" for label, count in result["nodes"].items())
+    )
+    print(
+        "Relationships: "
+        + ", ".join(
+            f"{rel_type}: {count}"
+            for rel_type, count in result["relationships"].items()
+        )
+    )
+    print(
+        f"Distinct (name, value) pairs: {result['distinct_values']}, dedup "
+        f"ratio: {result['dedup_ratio'] or 0:.2f}"
+    )
+    print(
+        f"Attributes: {result['attrs']}, property bytes: "
+        f"{result['property_bytes']}, array bytes not stored: "
+        f"{result['array_bytes_not_stored']}"
+    )
+    print(
+        f"Projected time: {result['projected_seconds']:.1f} s at "
+        f"{args.throughput:g} objects/s"
+    )
+
+
 def main():
     parser = gen_parser()
 
     args = parser.parse_args()
 
+    if args.command in ("remove", "purge"):
+        if args.command == "purge" and not args.yes:
+            parser.error(
+                "purge removes all File, Group and Dataset nodes of the "
+                "database, confirm it with --yes."
+            )
+        logging.basicConfig(
+            level=args.log_level, format="%(asctime)s %(levelname)s %(message)s"
+        )
+        main_remove(args)
+        return
+    array_policy = ArrayPolicy(
+        args.array_policy,
+        args.array_list_size,
+        parse_array_patterns(args.array_patterns),
+        args.array_list_bytes,
+    )
+    attr_policy = AttrPolicy(
+        args.attr_include, args.attr_exclude, args.attr_max_bytes, args.attr_oversized
+    )
+    if args.command == "scan":
+        main_scan(args, attr_policy)
+        return
+    if args.command == "export":
+        export_kwargs = {
+            "exclude_datasets": args.exclude_datasets,
+            "exclude_groups": args.exclude_groups,
+            "exclude_paths": args.exclude_paths,
+            "transfer_attrs": args.transfer_attrs,
+            "array_policy": array_policy,
+            "attr_policy": attr_policy,
+        }
+        if args.path.is_dir():
+            import_args = export_dir_to_csv(
+                args.path, args.out_dir, args.suffixes, **export_kwargs
+            )
+        else:
+            import_args = export_hdf5_to_csv(
+                args.path, args.out_dir, args.connect_to_filepath or [], **export_kwargs
+            )
+        print(
+            "neo4j-admin database import full "
+            + " ".join(import_args)
+            + f" {args.database}"
+        )
+        return
+
+    batch_size = args.batchsize
+    if args.adaptive_batchsize:
+        batch_size = AdaptiveBatchSize(args.batchsize, args.target_latency)
+
+    # The metrics enable the events of the hdf5_graph logger, the handler keeps the
+    # chosen level for the output
+    handler = logging.StreamHandler()
+    handler.setLevel(args.log_level)
+    logging.basicConfig(
+        level=args.log_level,
+        format="%(asctime)s %(levelname)s %(message)s",
+        handlers=[handler],
+    )
+    if args.asynchronous and args.incremental:
+        parser.error("--incremental is not supported together with --async.")
+    if args.resume and args.checkpoint is None:
+        parser.error("--resume needs the journal given by --checkpoint.")
+    if args.asynchronous and args.checkpoint is not None:
+        parser.error("--checkpoint is not supported together with --async.")
+    if args.asynchronous and (
+        args.stream
+        or args.parallel_group
+        or args.parallel_dataset
+        or args.dataset_cache_size > 0
+        or args.warm_dataset_cache
+    ):
+        parser.error(
+            "--async always streams with UNWIND batches, --stream, "
+            "--parallel_group, --parallel_dataset and the dataset cache are "
+            "not supported together with it."
+        )
+    if args.command == "watch" and (
+        args.backend == "memory" or args.asynchronous or args.checkpoint is not None
+    ):
+        parser.error(
+            "watch is not supported together with "
+            "--backend memory, --async or --checkpoint."
+        )
+    if args.backend == "memory" and (
+        args.asynchronous
+        or args.incremental
+        or args.checkpoint is not None
+        or getattr(args, "workers", 1) > 1
+    ):
+        parser.error(
+            "--backend memory is not supported together with --async, "
+            "--incremental, --checkpoint or several --workers."
+        )
+    with IngestMetrics(prometheus_path=args.metrics_file) as metrics:
+        if args.command == "watch":
+            main_watch(args, batch_size, array_policy, attr_policy)
+        elif args.backend == "memory":
+            main_memory(args, batch_size, array_policy, attr_policy)
+        elif args.asynchronous:
+            asyncio.run(main_async(args, batch_size, array_policy, attr_policy))
+        else:
+            main_sync(args, batch_size, array_policy, attr_policy)
+
+    if args.adaptive_batchsize:
+        print(f"Adaptive batch size: {batch_size.report()}")
+    if args.profile:
+        print(metrics.profile())
+        print(f"Total: {metrics.report()}")
+
+
+def main_memory(args, batch_size, array_policy, attr_policy):
+    """Ingest into a ``MemoryGraph`` and print its report."""
+    graph = MemoryGraph()
+    kwargs = {
+        "exclude_datasets": args.exclude_datasets,
+        "exclude_groups": args.exclude_groups,
+        "exclude_paths": args.exclude_paths,
+        "batch_size": batch_size,
+        "transfer_attrs": args.transfer_attrs,
+        "stream": args.stream,
+        "array_policy": array_policy,
+        "attr_policy": attr_policy,
+    }
+    if args.command == "file":
+        put_hdf5_in_neo4j(
+            args.hdf5_filepath,
+            graph,
+            connect_to_filepath=args.connect_to_filepath,
+            **kwargs,
+        )
+    elif args.command == "directory":
+        put_dir_in_neo4j(
+            args.dir_path, graph, readers=args.readers, suffixes=args.suffixes, **kwargs
+        )
+    report = graph.report()
+    print(
+        "Nodes: "
+        + ", ".join(f"{label}: {count}" for label, count in report["nodes"].items())
+    )
+    print(
+        "Relationships: "
+        + ", ".join(
+            f"{rel_type}: {count}"
+            for rel_type, count in report["relationships"].items()
+        )
+    )
+
+
+def main_watch(args, batch_size, array_policy, attr_policy):
+    """Watch a directory until interrupted."""
     with GraphDatabase.driver(
         args.uri, auth=(args.username, args.password), database=args.database
     ) as driver:
-        with driver.session() as session:
-            if args.command == "file":
-                put_hdf5_in_neo4j(
-                    hdf5_filepath=args.hdf5_filepath,
-                    session=session,
-                    exclude_datasets=args.exclude_datasets,
-                    exclude_groups=args.exclude_groups,
-                    exclude_paths=args.exclude_paths,
-                    connect_to_filepath=args.connect_to_filepath,
-                    batch_size=args.batchsize,
-                    transfer_attrs=args.transfer_attrs,
-                    parallel_group=args.parallel_group,
-                    parallel_dataset=args.parallel_dataset,
-                    concurrency=args.concurrency,
-                )
-            elif args.command == "directory":
-                put_dir_in_neo4j(
-                    dir_path=args.dir_path,
-                    session=session,
-                    exclude_datasets=args.exclude_datasets,
-                    exclude_groups=args.exclude_groups,
-                    exclude_paths=args.exclude_paths,
-                    connect_to_filepath=args.connect_to_filepath,
-                    batch_size=args.batchsize,
-                    transfer_attrs=args.transfer_attrs,
-                    parallel_group=args.parallel_group,
-                    parallel_dataset=args.parallel_dataset,
-                    concurrency=args.concurrency,
-                )
+        dataset_cache = None
+        if args.dataset_cache_size > 0:
+            dataset_cache = DatasetCache(args.dataset_cache_size)
+            if args.warm_dataset_cache:
+                with driver.session() as session:
+                    dataset_cache.warm(session)
+        try:
+            watch_dir(
+                dir_path=args.dir_path,
+                driver=driver,
+                interval=args.interval,
+                settle=args.settle,
+                workers=args.workers,
+                suffixes=args.suffixes,
+                retries=args.retries,
+                hash_content=args.hash_content,
+                exclude_datasets=args.exclude_datasets,
+                exclude_groups=args.exclude_groups,
+                exclude_paths=args.exclude_paths,
+                batch_size=batch_size,
+                transfer_attrs=args.transfer_attrs,
+                parallel_group=args.parallel_group,
+                parallel_dataset=args.parallel_dataset,
+                concurrency=args.concurrency,
+                array_policy=array_policy,
+                attr_policy=attr_policy,
+                engine=args.engine,
+                stream=args.stream,
+                dataset_cache=dataset_cache,
+            )
+        except KeyboardInterrupt:
+            print("Watch stopped.")
+
+
+async def main_async(args, batch_size, array_policy, attr_policy):
+    """Ingest a file or directory with the async driver."""
+    kwargs = {
+        "exclude_datasets": args.exclude_datasets,
+        "exclude_groups": args.exclude_groups,
+        "exclude_paths": args.exclude_paths,
+        "batch_size": batch_size,
+        "transfer_attrs": args.transfer_attrs,
+        "concurrency": args.concurrency,
+        "array_policy": array_policy,
+        "attr_policy": attr_policy,
+    }
+    async with AsyncGraphDatabase.driver(
+        args.uri, auth=(args.username, args.password), database=args.database
+    ) as driver:
+        if args.command == "file":
+            await put_hdf5_in_neo4j_async(
+                args.hdf5_filepath,
+                driver,
+                connect_to_filepath=args.connect_to_filepath,
+                **kwargs,
+            )
+        elif args.command == "directory":
+            await put_dir_in_neo4j_async(
+                args.dir_path,
+                driver,
+                files=args.workers,
+                suffixes=args.suffixes,
+                **kwargs,
+            )
+
+
+def main_sync(args, batch_size, array_policy, attr_policy):
+    """Ingest a file or directory with a session, incrementally or resumable."""
+    with (
+        GraphDatabase.driver(
+            args.uri, auth=(args.username, args.password), database=args.database
+        ) as driver,
+        driver.session() as session,
+    ):
+        dataset_cache = None
+        if args.dataset_cache_size > 0:
+            dataset_cache = DatasetCache(args.dataset_cache_size)
+            if args.warm_dataset_cache:
+                dataset_cache.warm(session)
+        checkpoint = (
+            Checkpoint(args.checkpoint, args.resume)
+            if args.checkpoint is not None
+            else None
+        )
+        completed = (
+            args.command == "file"
+            and checkpoint is not None
+            and not checkpoint.begin(session, args.hdf5_filepath)
+        )
+        if completed:
+            print(
+                f"{args.hdf5_filepath} was already "
+                f"completed according to {args.checkpoint}."
+            )
+        elif args.command == "file" and args.incremental:
+            update_hdf5_in_neo4j(
+                hdf5_filepath=args.hdf5_filepath,
+                session=session,
+                driver=driver,
+                exclude_datasets=args.exclude_datasets,
+                exclude_groups=args.exclude_groups,
+                exclude_paths=args.exclude_paths,
+                connect_to_filepath=args.connect_to_filepath,
+                batch_size=batch_size,
+                transfer_attrs=args.transfer_attrs,
+                parallel_group=args.parallel_group,
+                parallel_dataset=args.parallel_dataset,
+                concurrency=args.concurrency,
+                array_policy=array_policy,
+                attr_policy=attr_policy,
+                engine=args.engine,
+                stream=args.stream,
+                dataset_cache=dataset_cache,
+                hash_content=args.hash_content,
+            )
+        elif args.command == "file":
+            put_hdf5_in_neo4j(
+                hdf5_filepath=args.hdf5_filepath,
+                session=session,
+                driver=driver,
+                exclude_datasets=args.exclude_datasets,
+                exclude_groups=args.exclude_groups,
+                exclude_paths=args.exclude_paths,
+                connect_to_filepath=args.connect_to_filepath,
+                batch_size=batch_size,
+                transfer_attrs=args.transfer_attrs,
+                parallel_group=args.parallel_group,
+                parallel_dataset=args.parallel_dataset,
+                concurrency=args.concurrency,
+                array_policy=array_policy,
+                attr_policy=attr_policy,
+                engine=args.engine,
+                stream=args.stream,
+                dataset_cache=dataset_cache,
+            )
+        elif args.command == "directory":
+            put_dir_in_neo4j(
+                dir_path=args.dir_path,
+                session=session,
+                workers=args.workers,
+                readers=args.readers,
+                driver=driver,
+                incremental=args.incremental,
+                hash_content=args.hash_content,
+                exclude_datasets=args.exclude_datasets,
+                exclude_groups=args.exclude_groups,
+                exclude_paths=args.exclude_paths,
+                connect_to_filepath=args.connect_to_filepath,
+                batch_size=batch_size,
+                transfer_attrs=args.transfer_attrs,
+                parallel_group=args.parallel_group,
+                parallel_dataset=args.parallel_dataset,
+                concurrency=args.concurrency,
+                array_policy=array_policy,
+                attr_policy=attr_policy,
+                engine=args.engine,
+                stream=args.stream,
+                dataset_cache=dataset_cache,
+                checkpoint=checkpoint,
+                suffixes=args.suffixes,
+            )
+        if args.command == "file" and checkpoint is not None and not completed:
+            checkpoint.finish(args.hdf5_filepath)
+        if dataset_cache is not None:
+            print(f"Dataset cache: {dataset_cache.report()}")
 
 
 if __name__ == "__main__":
@@ -1,31 +1,123 @@
+import threading
 
-# Currently not used!
-# Reformulate as decorator?
-def optimize_batch_size(session, initial_batch_size, max_retries=5):
-    batch_size = initial_batch_size
-    retries = 0
-
-    while retries < max_retries:
-        print(f"Testing with batch size: {batch_size}")
-        try:
-            result = session.run(group_query, group_list=group_registry, batch_size=batch_size, set_attrs=True)
-            for record in result:
-                print(
-                    f"--- Batch Summary ---\n"
-                    f"Batches Processed : {record['batches']}\n"
-                    f"Total Entries     : {record['total']}\n"
-                    f"Time Taken (ms)   : {record['timeTaken']}\n"
-                    f"Failed Operations : {record['failedOperations']}\n"
-                    f"------------------------------------"
-                )
-            # If successful, try a larger batch size
-            batch_size *= 2
-            retries = 0  # Reset retries if successful
-        except neo4j.exceptions.TransientError as e:
-            print(f"Memory error with batch size {batch_size}: {e}")
-            # Reduce batch size and retry
-            batch_size //= 2
-            retries += 1
-
-    print(f"Final optimized batch size: {batch_size}")
-    return batch_size
+
+def is_memory_error(error: Exception) -> bool:
+    """Check if a neo4j error was caused by the server running out of memory.
+
+    Args:
+        error (Exception): Raised error.
+
+    Returns:
+        bool: Whether a smaller batch could succeed.
+    """
+    code = getattr(error, "code", None) or ""
+    return "OutOfMemory" in code or "MemoryLimit" in code
+
+
+class AdaptiveBatchSize:
+    """Batch size, which adapts itself to the observed commit latency of the batches.
+
+    After every batch, the batch size is moved towards the size which would have taken
+    ``target_latency`` seconds, changing by at most ``factor`` at once.
+    On transient errors (e.g. deadlocks) and out-of-memory errors of the server it is
+    halved.
+    The controller can be passed everywhere a ``batch_size`` is expected, ``int()``
+    gives the current size. It is thread-safe, so it can be shared by all files and
+    workers of an ingestion.
+
+    Args:
+        initial (int, optional): Batch size to start with. Defaults to 1000.
+        target_latency (float, optional): Commit latency per batch in seconds to aim
+            for. Defaults to 1.0.
+        min_size (int, optional): Lower limit of the batch size. Defaults to 10.
+        max_size (int, optional): Upper limit of the batch size. Defaults to 100000.
+        factor (float, optional): Maximum factor of growth and shrinkage per batch.
+            Defaults to 2.0.
+    """
+
+    def __init__(
+        self,
+        initial: int = 1000,
+        target_latency: float = 1.0,
+        min_size: int = 10,
+        max_size: int = 100000,
+        factor: float = 2.0,
+    ):
+        """Start with the initial batch size, within the limits."""
+        self.target_latency = target_latency
+        self.min_size = min_size
+        self.max_size = max_size
+        self.factor = factor
+        self.size = min(max(initial, min_size), max_size)
+        self.batches = 0
+        self.backoffs = 0
+        self.latency = None  # exponential moving average of the latency per batch
+        self._lock = threading.Lock()
+
+    def __int__(self) -> int:
+        """Get the current batch size."""
+        return self.size
+
+    def __repr__(self) -> str:
+        """Show the current batch size and the target latency."""
+        return (
+            f"AdaptiveBatchSize(size={self.size}, target_latency={self.target_latency})"
+        )
+
+    def record(self, rows: int, seconds: float) -> None:
+        """Adapt the batch size to the latency of a committed batch.
+
+        Args:
+            rows (int): Number of rows of the batch.
+            seconds (float): Wall-clock time it took to commit the batch.
+        """
+        if rows <= 0 or seconds <= 0:
+            return
+        with self._lock:
+            self.batches += 1
+            self.latency = (
+                seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+            )
+            ideal = rows * self.target_latency / seconds
+            ideal = min(max(ideal, self.size / self.factor), self.size * self.factor)
+            self.size = int(min(max(ideal, self.min_size), self.max_size))
+
+    def back_off(self) -> None:
+        """Halve the batch size after a failed or retried batch."""
+        with self._lock:
+            self.backoffs += 1
+            self.size = max(self.min_size, self.size // 2)
+
+    def report(self) -> dict:
+        """Get the state the controller converged on.
+
+        Returns:
+            dict: Current batch size, number of recorded batches and back-offs and the
+                mean latency per batch.
+        """
+        return {
+            "batch_size": self.size,
+            "batches": self.batches,
+            "backoffs": self.backoffs,
+            "latency": self.latency,
+        }
+
+
+def record_batches(
+    batch_size, rows: int, batches: int, seconds: float, failed: bool
+) -> None:
+    """Report the outcome of written batches to the batch size, if it is adaptive.
+
+    Args:
+        batch_size (int | AdaptiveBatchSize): Batch size used for the batches.
+        rows (int): Number of written rows.
+        batches (int): Number of batches the rows were split into.
+        seconds (float): Wall-clock time of all batches.
+        failed (bool): Whether batches failed or were retried.
+    """
+    if not isinstance(batch_size, AdaptiveBatchSize):
+        return
+    if failed:
+        batch_size.back_off()
+    elif batches:
+        batch_size.record(rows / batches, seconds / batches)
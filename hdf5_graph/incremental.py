@@ -0,0 +1,464 @@
+"""Incremental re-ingestion, skipping unchanged and updating changed files."""
+
+import hashlib
+import math
+import time
+from pathlib import Path
+
+import neo4j
+import numpy as np
+
+from hdf5_graph.arrays import ArrayPolicy
+from hdf5_graph.attrs import AttrPolicy
+from hdf5_graph.dedup import DatasetCache
+from hdf5_graph.graph_writer import GraphWriter
+from hdf5_graph.metrics import emit_event
+from hdf5_graph.schema import create_schema
+from hdf5_graph.single_hdf5 import (
+    as_writer,
+    connect_file,
+    put_hdf5_in_neo4j,
+    read_hdf5_registries,
+)
+
+
+def file_fingerprint(hdf5_filepath: Path, hash_content: bool = False) -> dict:
+    """Get the fingerprint of a file, stored on its File node to detect changes.
+
+    Args:
+        hdf5_filepath (Path): Path to the file.
+        hash_content (bool, optional): Whether the sha256 hash of the content should be
+            part of the fingerprint. Defaults to False.
+
+    Returns:
+        dict: Size, mtime in ns and possibly content_hash of the file.
+    """
+    stat = hdf5_filepath.stat()
+    fingerprint = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+    if hash_content:
+        with open(hdf5_filepath, "rb") as f:
+            fingerprint["content_hash"] = hashlib.file_digest(f, "sha256").hexdigest()
+    return fingerprint
+
+
+def record_fingerprint(
+    session: neo4j.Session, hdf5_filepath: Path, hash_content: bool = False
+) -> None:
+    """Store the current fingerprint of the file on its File node.
+
+    Args:
+        session (neo4j.Session): Neo4j session instance with connected DBMS.
+        hdf5_filepath (Path): Path to hdf5 of the File node.
+        hash_content (bool, optional): Whether the sha256 hash of the content should be
+            stored as well. Defaults to False.
+
+    Returns:
+        None
+    """
+    session.run(
+        """
+            MATCH (f:File {filepath: $filepath})
+            SET f += $fingerprint
+        """,
+        filepath=str(hdf5_filepath),
+        fingerprint=file_fingerprint(hdf5_filepath, hash_content),
+    ).consume()
+
+
+def check_hdf5_file(
+    session: neo4j.Session, hdf5_filepath: Path, hash_content: bool = False
+) -> str:
+    """Compare the file with the fingerprint stored on its File node.
+
+    Size and mtime are compared first. If only the mtime differs and hash_content is
+    set, the content hashes decide, so touched but unchanged files are not read again.
+
+    Args:
+        session (neo4j.Session): Neo4j session instance with connected DBMS.
+        hdf5_filepath (Path): Path to hdf5 which should be checked.
+        hash_content (bool, optional): Whether to compare the content hashes, if the
+            mtime changed. Defaults to False.
+
+    Returns:
+        str: "new" if there is no File node yet, otherwise "unchanged" or "changed".
+    """
+    stored = session.run(
+        """
+            MATCH (f:File {filepath: $filepath})
+            RETURN f.size AS size, f.mtime AS mtime, f.content_hash AS content_hash
+        """,
+        filepath=str(hdf5_filepath),
+    ).single()
+    if stored is None:
+        return "new"
+    fingerprint = file_fingerprint(hdf5_filepath)
+    if stored["size"] != fingerprint["size"]:
+        return "changed"
+    if stored["mtime"] == fingerprint["mtime"]:
+        return "unchanged"
+    if (
+        hash_content
+        and stored["content_hash"] is not None
+        and stored["content_hash"]
+        == file_fingerprint(hdf5_filepath, True)["content_hash"]
+    ):
+        # only touched, remember the new mtime to skip the hashing next time
+        record_fingerprint(session, hdf5_filepath, hash_content)
+        return "unchanged"
+    return "changed"
+
+
+def _plain(value):
+    # Convert numpy types into the python types neo4j returns for them
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, list | tuple):
+        return [_plain(v) for v in value]
+    return value
+
+
+def _equal(a, b) -> bool:
+    # Compare plain values, NaN is equal to itself, so stored NaN values do not show up
+    # as changes
+    if (
+        isinstance(a, float)
+        and isinstance(b, float)
+        and math.isnan(a)
+        and math.isnan(b)
+    ):
+        return True
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_equal(a[k], b[k]) for k in a)
+    if isinstance(a, list | tuple) and isinstance(b, list | tuple):
+        return len(a) == len(b) and all(_equal(i, j) for i, j in zip(a, b))
+    return a == b
+
+
+def _parent(hdf5_filepath: Path, hdf5_path: str) -> str:
+    parent = hdf5_path.rsplit("/", 1)[0]
+    return parent if parent else str(hdf5_filepath)
+
+
+def diff_registries(
+    hdf5_filepath: Path,
+    stored_groups: dict[str, dict],
+    stored_datasets: dict[str, dict],
+    group_registry: list[dict],
+    dataset_registry: list[dict],
+    transfer_attrs: bool = True,
+) -> dict[str, list]:
+    """Compare the stored groups and datasets with the ones currently in the file.
+
+    Datasets with a value are shared between files, so a changed value is not updated in
+    place, but the dataset is removed from the file and added again.
+
+    Args:
+        hdf5_filepath (Path): Path to hdf5 the registries were read from.
+        stored_groups (dict[str, dict]): Properties of the stored groups, keyed by
+            hdf5_path.
+        stored_datasets (dict[str, dict]): Properties of the stored datasets, keyed by
+            their hdf5_path in this file.
+        group_registry (list[dict]): Records of the groups, as returned by
+            ``read_hdf5_registries``.
+        dataset_registry (list[dict]): Records of the datasets, as returned by
+            ``read_hdf5_registries``.
+        transfer_attrs (bool, optional): Whether the attrs of the HDF5-objects are put
+            into the database. Defaults to True.
+
+    Returns:
+        dict[str, list]: Records to add, remove and update, for groups and datasets.
+    """
+    diff = {
+        "add_groups": [],
+        "update_groups": [],
+        "remove_groups": [],
+        "add_datasets": [],
+        "update_datasets": [],
+        "update_shared_datasets": [],
+        "remove_datasets": [],
+    }
+
+    def props(record):
+        props = {
+            "name": record["obj_name"],
+            "hdf5_path": record["hdf5_path"],
+            "filepath": str(hdf5_filepath),
+        }
+        props.update(_plain(record.get("array_props", {})))
+        if transfer_attrs:
+            props.update(_plain(record["attrs"]))
+        return props
+
+    seen = set()
+    for record in group_registry:
+        seen.add(record["hdf5_path"])
+        stored = stored_groups.get(record["hdf5_path"])
+        if stored is None:
+            diff["add_groups"].append(record)
+        elif not _equal(_plain(stored), props(record)):
+            diff["update_groups"].append(
+                {"hdf5_path": record["hdf5_path"], "props": props(record)}
+            )
+    diff["remove_groups"] = [path for path in stored_groups if path not in seen]
+
+    seen = set()
+    for record in dataset_registry:
+        seen.add(record["hdf5_path"])
+        stored = stored_datasets.get(record["hdf5_path"])
+        value = _plain(record["value"])
+        if stored is None:
+            diff["add_datasets"].append(record)
+        elif not _equal(_plain(stored.get("value")), value):
+            # changed value -> other shared node
+            diff["remove_datasets"].append(
+                {
+                    "parent": record["parent"],
+                    "obj_name": record["obj_name"],
+                    "value": stored.get("value"),
+                }
+            )
+            diff["add_datasets"].append(record)
+        elif value is None:
+            if not _equal(_plain(stored), props(record)):
+                diff["update_datasets"].append(
+                    {"hdf5_path": record["hdf5_path"], "props": props(record)}
+                )
+        elif transfer_attrs and any(
+            not _equal(_plain(stored.get(k)), v)
+            for k, v in _plain(record["attrs"]).items()
+        ):
+            diff["update_shared_datasets"].append(
+                {
+                    "obj_name": record["obj_name"],
+                    "value": value,
+                    "attrs": _plain(record["attrs"]),
+                }
+            )
+    for path, stored in stored_datasets.items():
+        if path not in seen:
+            diff["remove_datasets"].append(
+                {
+                    "parent": _parent(hdf5_filepath, path),
+                    "obj_name": stored["name"],
+                    "value": stored.get("value"),
+                }
+            )
+    return diff
+
+
+def write_hdf5_diff(
+    hdf5_filepath: Path,
+    session: neo4j.Session | GraphWriter,
+    group_registry: list[dict],
+    dataset_registry: list[dict],
+    batch_size: int = 1000,
+    transfer_attrs: bool = True,
+    parallel_group: bool = False,
+    parallel_dataset: bool = False,
+    concurrency: int = 50,
+    engine: str = "apoc",
+    driver: neo4j.Driver = None,
+    dataset_cache: DatasetCache = None,
+) -> dict[str, int]:
+    """Bring the subgraph of an ingested file up to date, only writing the differences.
+
+    Nodes written by earlier versions without a filepath are adopted by the file first,
+    so they are updated instead of added again.
+    The options of the writer are only used if a plain session is given.
+
+    Args:
+        hdf5_filepath (Path): Path to hdf5 the registries were read from.
+        session (neo4j.Session | GraphWriter): Neo4j session instance with connected
+            DBMS, or a writer like ``MemoryGraph``.
+        group_registry (list[dict]): Records of the groups, as returned by
+            ``read_hdf5_registries``.
+        dataset_registry (list[dict]): Records of the datasets, as returned by
+            ``read_hdf5_registries``.
+        batch_size (int, optional): Number of transactions stored in heap before
+            commiting. Defaults to 1000.
+        transfer_attrs (bool, optional): Whether the attrs of the HDF5-objects should be
+            put into the database. Defaults to True.
+        parallel_group (bool, optional): Whether parallelization of the batches creating
+            HDF5-groups should be turned on. Defaults to False.
+        parallel_dataset (bool, optional): Whether parallelization of the batches
+            creating HDF5-datasets should be turned on. Defaults to False.
+        concurrency (int, optional): Number of concurrent tasks which are generated when
+            using parallel. Defaults to 50.
+        engine (str, optional): Engine writing the added groups and datasets, "apoc" or
+            "unwind". Defaults to "apoc".
+        driver (neo4j.Driver, optional): Driver providing further sessions for the
+            "unwind" engine. Defaults to None.
+        dataset_cache (DatasetCache, optional): Cache of the ids of datasets with value,
+            linking known datasets by id instead of a MERGE. Defaults to None.
+
+    Returns:
+        dict[str, int]: Number of changed records per kind of change.
+    """
+    writer = as_writer(
+        session,
+        batch_size=batch_size,
+        parallel_group=parallel_group,
+        parallel_dataset=parallel_dataset,
+        concurrency=concurrency,
+        engine=engine,
+        driver=driver,
+        dataset_cache=dataset_cache,
+    )
+    stored_groups, stored_datasets = writer.stored_tree(hdf5_filepath)
+    diff = diff_registries(
+        hdf5_filepath,
+        stored_groups,
+        stored_datasets,
+        group_registry,
+        dataset_registry,
+        transfer_attrs,
+    )
+
+    # Remove datasets first, their parent groups may be removed afterwards
+    writer.remove_datasets(hdf5_filepath, diff["remove_datasets"])
+    writer.remove_groups(hdf5_filepath, diff["remove_groups"])
+    if diff["add_groups"]:
+        writer.write_groups(hdf5_filepath, diff["add_groups"], transfer_attrs)
+    if diff["add_datasets"]:
+        writer.write_datasets(hdf5_filepath, diff["add_datasets"], transfer_attrs)
+    writer.update_groups(hdf5_filepath, diff["update_groups"])
+    writer.update_datasets(hdf5_filepath, diff["update_datasets"])
+    writer.update_shared_datasets(diff["update_shared_datasets"])
+
+    counts = {k: len(v) for k, v in diff.items()}
+    emit_event("update", hdf5_filepath, **counts)
+    return counts
+
+
+def update_hdf5_in_neo4j(
+    hdf5_filepath: Path,
+    session: neo4j.Session,
+    exclude_datasets: list[str] = [],
+    exclude_groups: list[str] = [],
+    exclude_paths: list = [],
+    connect_to_filepath: list[Path] = None,
+    batch_size: int = 1000,
+    transfer_attrs: bool = True,
+    parallel_group: bool = False,
+    parallel_dataset: bool = False,
+    concurrency: int = 50,
+    bootstrap_schema: bool = True,
+    stream: bool = False,
+    hash_content: bool = False,
+    array_policy: ArrayPolicy = None,
+    engine: str = "apoc",
+    driver: neo4j.Driver = None,
+    dataset_cache: DatasetCache = None,
+    attr_policy: AttrPolicy = None,
+) -> str:
+    """Incrementally put the hdf5 file into the neo4j database, supplied by session.
+
+    New files are put into the database like with ``put_hdf5_in_neo4j``. Files whose
+    fingerprint (size, mtime and optionally content hash) did not change are skipped.
+    For changed files, only the groups and datasets which differ from the stored ones
+    are added, updated or removed.
+
+    Args:
+        hdf5_filepath (Path): Path to hdf5 which should be transformed.
+        session (neo4j.Session): Neo4j session instance with connected DBMS.
+        exclude_datasets (list[str], optional): List of strings with names of datasets
+            which should not be read in. Defaults to [].
+        exclude_groups (list[str], optional): List of strings with names of groups which
+            should not be read in. Defaults to [].
+        exclude_paths (list[str], optional): List of strings with pathparts of datasets
+            which should not be read in. Defaults to [].
+        connect_to_filepath (list[Path], optional): List of Filepaths, which the File
+            node should depend on. Defaults to None.
+        batch_size (int, optional): Number of transactions stored in heap before
+            commiting. Defaults to 1000.
+        transfer_attrs (bool, optional): Whether the attrs of the HDF5-objects should be
+            put into the database. Defaults to True.
+        parallel_group (bool, optional): Whether parallelization of the batches creating
+            HDF5-groups should be turned on. Defaults to False.
+        parallel_dataset (bool, optional): Whether parallelization of the batches
+            creating HDF5-datasets should be turned on. Defaults to False.
+        concurrency (int, optional): Number of concurrent tasks which are generated when
+            using parallel. Defaults to 50.
+        bootstrap_schema (bool, optional): Whether the indexes and constraints used by
+            the queries should be created first. Defaults to True.
+        stream (bool, optional): Whether new files should be written while they are
+            traversed. Defaults to False.
+        hash_content (bool, optional): Whether the sha256 hash of the content is part of
+            the fingerprint. Defaults to False.
+        array_policy (ArrayPolicy, optional): How array datasets are stored, if None
+            they are stored without value. Defaults to None.
+        engine (str, optional): Engine writing the batches, "apoc" or "unwind". Defaults
+            to "apoc".
+        driver (neo4j.Driver, optional): Driver providing further sessions for the
+            "unwind" engine. Defaults to None.
+        dataset_cache (DatasetCache, optional): Cache of the ids of datasets with value,
+            linking known datasets by id instead of a MERGE. Defaults to None.
+        attr_policy (AttrPolicy, optional): Which attrs are put into the database and
+            how they are converted. If None all attrs are put as they are. Defaults to
+            None.
+
+    Returns:
+        str: "new", "unchanged" or "changed", the state of the file before the update.
+    """
+    if bootstrap_schema:
+        create_schema(session)
+
+    status = check_hdf5_file(session, hdf5_filepath, hash_content)
+    if status == "new":
+        put_hdf5_in_neo4j(
+            hdf5_filepath,
+            session,
+            exclude_datasets,
+            exclude_groups,
+            exclude_paths,
+            batch_size=batch_size,
+            transfer_attrs=transfer_attrs,
+            parallel_group=parallel_group,
+            parallel_dataset=parallel_dataset,
+            concurrency=concurrency,
+            bootstrap_schema=False,
+            stream=stream,
+            array_policy=array_policy,
+            engine=engine,
+            driver=driver,
+            dataset_cache=dataset_cache,
+            attr_policy=attr_policy,
+        )
+        if hash_content:
+            record_fingerprint(session, hdf5_filepath, hash_content)
+    elif status == "changed":
+        start = time.perf_counter()
+        group_registry, dataset_registry = read_hdf5_registries(
+            hdf5_filepath,
+            exclude_datasets,
+            exclude_groups,
+            exclude_paths,
+            transfer_attrs,
+            array_policy,
+            attr_policy,
+        )
+        write_hdf5_diff(
+            hdf5_filepath,
+            session,
+            group_registry,
+            dataset_registry,
+            batch_size,
+            transfer_attrs,
+            parallel_group,
+            parallel_dataset,
+            concurrency,
+            engine,
+            driver,
+            dataset_cache,
+        )
+        record_fingerprint(session, hdf5_filepath, hash_content)
+
+    if connect_to_filepath:
+        connect_file(session, hdf5_filepath, connect_to_filepath)
+    if status == "changed":
+        emit_event("file", hdf5_filepath, seconds=round(time.perf_counter() - start, 6))
+    return status
@@ -0,0 +1,377 @@
+"""In-process graph backend, without a database."""
+
+import threading
+from array import array
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+from hdf5_graph.dedup import dataset_key
+from hdf5_graph.graph_writer import GraphWriter
+from hdf5_graph.metrics import timed_phase
+from hdf5_graph.single_hdf5 import _file_params
+
+LABELS = ("File", "Group", "Dataset")
+RELATIONSHIP_TYPES = ("holds", "depends_on")
+_HOLDS = RELATIONSHIP_TYPES.index("holds")
+
+
+def _merge_key(name: str, value) -> tuple:
+    # (name, value) key of merged datasets, values without a hashable form are compared
+    # by their representation
+    key = dataset_key(name, value)
+    try:
+        hash(key)
+    except TypeError:
+        key = (name, repr(value))
+    return key
+
+
+class MemoryGraph(GraphWriter):
+    """In-process backend keeping the graph in compact tables, without a database.
+
+    Nodes are numbered in the order they are created. Their labels are stored in one
+    array of label codes and their properties in a list.
+    Relationships are stored as three arrays of start node, end node and type code,
+    and indexed by the nodes they start and end at, so the relationships of a node are
+    found without scanning the arrays.
+    The nodes and relationships are the same as in neo4j, datasets with a value are
+    merged by (name, value) and their holds relationships are not duplicated.
+    Removed nodes and relationships keep their number, their code is set to -1 and they
+    are no longer counted.
+    The writes are thread-safe.
+    """
+
+    def __init__(self):
+        """Create an empty graph."""
+        self.labels = array("b")
+        self.properties = []
+        self.starts = array("q")
+        self.ends = array("q")
+        self.types = array("b")
+        self._files = {}  # filepath -> node
+        self._groups = {}  # (filepath, hdf5_path) -> node
+        self._datasets = {}  # (name, value) -> node of merged datasets
+        self._unmerged = {}  # (filepath, hdf5_path) -> node of datasets without value
+        self._merged = {}  # (start, end, type) -> merged relationship
+        self._outgoing = defaultdict(set)  # node -> relationships starting at it
+        self._incoming = defaultdict(set)  # node -> relationships ending at it
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Get the number of nodes."""
+        return self.count_nodes()
+
+    def _node(self, label: str, props: dict) -> int:
+        self.labels.append(LABELS.index(label))
+        self.properties.append(props)
+        return len(self.labels) - 1
+
+    def _relationship(
+        self, start: int, end: int, rel_type: str, merge: bool = False
+    ) -> None:
+        code = RELATIONSHIP_TYPES.index(rel_type)
+        if merge and (start, end, code) in self._merged:
+            return
+        i = len(self.types)
+        if merge:
+            self._merged[(start, end, code)] = i
+        self.starts.append(start)
+        self.ends.append(end)
+        self.types.append(code)
+        self._outgoing[start].add(i)
+        self._incoming[end].add(i)
+
+    def _parent(self, filepath: str, parent: str) -> int | None:
+        return (
+            self._files.get(parent)
+            if parent == filepath
+            else self._groups.get((filepath, parent))
+        )
+
+    def create_file(self, hdf5_filepath: Path) -> None:
+        """Add the File node with the fingerprint of the file."""
+        params = _file_params(Path(hdf5_filepath))
+        with self._lock:
+            self._files[params["path"]] = self._node(
+                "File",
+                {
+                    "name": params["obj_name"],
+                    "filepath": params["path"],
+                    "size": params["size"],
+                    "mtime": params["mtime"],
+                },
+            )
+
+    def write_groups(
+        self, hdf5_filepath: Path, groups: list[dict], transfer_attrs: bool = True
+    ) -> None:
+        """Add the Group nodes and link them to their parents."""
+        filepath = str(hdf5_filepath)
+        with timed_phase(hdf5_filepath, "group_write"), self._lock:
+            for entry in groups:
+                props = {
+                    "name": entry["obj_name"],
+                    "hdf5_path": entry["hdf5_path"],
+                    "filepath": filepath,
+                }
+                if transfer_attrs:
+                    props.update(entry["attrs"])
+                self._groups[(filepath, entry["hdf5_path"])] = self._node(
+                    "Group", props
+                )
+            # as in neo4j, groups are linked after all of them were created
+            for entry in groups:
+                parent = self._parent(filepath, entry["parent"])
+                if parent is not None:
+                    self._relationship(
+                        parent, self._groups[(filepath, entry["hdf5_path"])], "holds"
+                    )
+
+    def write_datasets(
+        self, hdf5_filepath: Path, datasets: list[dict], transfer_attrs: bool = True
+    ) -> None:
+        """Add the datasets without value, and merge the others by (name, value)."""
+        filepath = str(hdf5_filepath)
+        with timed_phase(hdf5_filepath, "dataset_write"), self._lock:
+            for entry in datasets:
+                parent = self._parent(filepath, entry["parent"])
+                if parent is None:
+                    continue  # the parent lookup of the queries finds nothing either
+                attrs = entry["attrs"] if transfer_attrs else {}
+                if entry["value"] is None:
+                    props = {
+                        "name": entry["obj_name"],
+                        "hdf5_path": entry["hdf5_path"],
+                        "filepath": filepath,
+                    }
+                    node = self._unmerged[(filepath, entry["hdf5_path"])] = self._node(
+                        "Dataset", {**props, **entry["array_props"], **attrs}
+                    )
+                    self._relationship(parent, node, "holds")
+                    continue
+                key = _merge_key(entry["obj_name"], entry["value"])
+                node = self._datasets.get(key)
+                if node is None:
+                    props = {
+                        "name": entry["obj_name"],
+                        "value": entry["value"],
+                        "hdf5_path": entry["hdf5_path"],
+                    }
+                    node = self._datasets[key] = self._node(
+                        "Dataset", {**props, **entry["array_props"]}
+                    )
+                self.properties[node].update(attrs)
+                self._relationship(parent, node, "holds", merge=True)
+
+    def _holds(self, start: int) -> list[int]:
+        # numbers of the holds relationships starting at a node
+        return sorted(
+            i for i in self._outgoing.get(start, ()) if self.types[i] == _HOLDS
+        )
+
+    def _delete_relationship(self, i: int) -> None:
+        start, end = self.starts[i], self.ends[i]
+        if self._merged.get((start, end, self.types[i])) == i:
+            del self._merged[(start, end, self.types[i])]
+        self._outgoing[start].discard(i)
+        self._incoming[end].discard(i)
+        self.types[i] = -1
+
+    def _delete_node(self, node: int) -> None:
+        # as DETACH DELETE, the relationships of the node are deleted with it
+        for i in self._outgoing.pop(node, set()) | self._incoming.pop(node, set()):
+            self._delete_relationship(i)
+        self.labels[node] = -1
+        self.properties[node] = None
+
+    def stored_tree(
+        self, hdf5_filepath: Path
+    ) -> tuple[dict[str, dict], dict[str, dict]]:
+        """Get the properties of the groups and datasets held by the file."""
+        filepath = str(hdf5_filepath)
+        with self._lock:
+            stored_groups = {
+                path: dict(self.properties[node])
+                for (i, path), node in self._groups.items()
+                if i == filepath
+            }
+            parents = {self._files[filepath]: ""} if filepath in self._files else {}
+            parents.update(
+                {
+                    node: path
+                    for (i, path), node in self._groups.items()
+                    if i == filepath
+                }
+            )
+            stored_datasets = {}
+            for parent, parent_path in parents.items():
+                for i in self._holds(parent):
+                    node = self.ends[i]
+                    if self.labels[node] == LABELS.index("Dataset"):
+                        props = self.properties[node]
+                        stored_datasets[f"{parent_path}/{props['name']}"] = dict(props)
+        return stored_groups, stored_datasets
+
+    def remove_datasets(self, hdf5_filepath: Path, datasets: list[dict]) -> None:
+        """Remove the holds relationships and the nodes nothing else holds."""
+        filepath = str(hdf5_filepath)
+        with self._lock:
+            for entry in datasets:
+                parent = self._parent(filepath, entry["parent"])
+                if parent is None:
+                    continue
+                if entry["value"] is None:
+                    parent_path = "" if entry["parent"] == filepath else entry["parent"]
+                    node = self._unmerged.pop(
+                        (filepath, f"{parent_path}/{entry['obj_name']}"), None
+                    )
+                    if node is not None:
+                        self._delete_node(node)
+                    continue
+                key = _merge_key(entry["obj_name"], entry["value"])
+                node = self._datasets.get(key)
+                i = self._merged.get((parent, node, _HOLDS))
+                if i is None:
+                    continue
+                self._delete_relationship(i)
+                # shared datasets are only deleted if nothing else holds them
+                if not any(self.types[j] == _HOLDS for j in self._incoming[node]):
+                    del self._datasets[key]
+                    self._delete_node(node)
+
+    def remove_groups(self, hdf5_filepath: Path, hdf5_paths: list[str]) -> None:
+        """Remove the Group nodes with their relationships."""
+        filepath = str(hdf5_filepath)
+        with self._lock:
+            for path in hdf5_paths:
+                node = self._groups.pop((filepath, path), None)
+                if node is not None:
+                    self._delete_node(node)
+
+    def update_groups(self, hdf5_filepath: Path, groups: list[dict]) -> None:
+        """Replace the properties of the groups."""
+        filepath = str(hdf5_filepath)
+        with self._lock:
+            for entry in groups:
+                node = self._groups.get((filepath, entry["hdf5_path"]))
+                if node is not None:
+                    self.properties[node] = dict(entry["props"])
+
+    def update_datasets(self, hdf5_filepath: Path, datasets: list[dict]) -> None:
+        """Replace the properties of the datasets without value."""
+        filepath = str(hdf5_filepath)
+        with self._lock:
+            for entry in datasets:
+                node = self._unmerged.get((filepath, entry["hdf5_path"]))
+                if node is not None:
+                    self.properties[node] = dict(entry["props"])
+
+    def update_shared_datasets(self, datasets: list[dict]) -> None:
+        """Update the attrs of the merged datasets."""
+        with self._lock:
+            for entry in datasets:
+                node = self._datasets.get(_merge_key(entry["obj_name"], entry["value"]))
+                if node is not None:
+                    self.properties[node].update(entry["attrs"])
+
+    def link_file(self, hdf5_filepath: Path, connect_to_filepath: list[Path]) -> None:
+        """Add depends_on relationships to the given File nodes."""
+        self.link_dependencies([(hdf5_filepath, connect_to_filepath)])
+
+    def link_dependencies(self, dependencies: list[tuple[Path, list[Path]]]) -> None:
+        """Merge the depends_on relationships between the File nodes."""
+        with self._lock:
+            for filepath, depends_on in dependencies:
+                node = self._files.get(str(filepath))
+                if node is None:
+                    continue
+                for i in depends_on:
+                    other = self._files.get(str(i))
+                    if other is not None:
+                        self._relationship(node, other, "depends_on", merge=True)
+
+    def count_nodes(self, label: str = None) -> int:
+        """Count the nodes, of all labels or of one.
+
+        Args:
+            label (str, optional): One of ``LABELS``, if None all nodes are counted.
+                Defaults to None.
+
+        Returns:
+            int: Number of nodes.
+        """
+        if label is None:
+            return int(np.count_nonzero(np.frombuffer(self.labels, dtype=np.int8) >= 0))
+        return int(
+            np.count_nonzero(
+                np.frombuffer(self.labels, dtype=np.int8) == LABELS.index(label)
+            )
+        )
+
+    def count_relationships(self, rel_type: str = None) -> int:
+        """Count the relationships, of all types or of one.
+
+        Args:
+            rel_type (str, optional): One of ``RELATIONSHIP_TYPES``, if None all
+                relationships are counted. Defaults to None.
+
+        Returns:
+            int: Number of relationships.
+        """
+        if rel_type is None:
+            return int(np.count_nonzero(np.frombuffer(self.types, dtype=np.int8) >= 0))
+        return int(
+            np.count_nonzero(
+                np.frombuffer(self.types, dtype=np.int8)
+                == RELATIONSHIP_TYPES.index(rel_type)
+            )
+        )
+
+    def nodes(self, label: str) -> list[dict]:
+        """Get the properties of all nodes with a label.
+
+        Args:
+            label (str): One of ``LABELS``.
+
+        Returns:
+            list[dict]: Properties of the nodes, in the order they were created.
+        """
+        code = LABELS.index(label)
+        return [props for i, props in zip(self.labels, self.properties) if i == code]
+
+    def relationships(self, rel_type: str) -> np.ndarray:
+        """Get the start and end nodes of all relationships of a type.
+
+        Args:
+            rel_type (str): One of ``RELATIONSHIP_TYPES``.
+
+        Returns:
+            np.ndarray: Array of shape (n, 2) with the numbers of the start and end
+                nodes.
+        """
+        mask = np.frombuffer(self.types, dtype=np.int8) == RELATIONSHIP_TYPES.index(
+            rel_type
+        )
+        return np.stack(
+            [
+                np.frombuffer(self.starts, dtype=np.int64)[mask],
+                np.frombuffer(self.ends, dtype=np.int64)[mask],
+            ],
+            axis=1,
+        )
+
+    def report(self) -> dict:
+        """Get the number of nodes per label and of relationships per type.
+
+        Returns:
+            dict: Counts of the nodes and relationships.
+        """
+        return {
+            "nodes": {label: self.count_nodes(label) for label in LABELS},
+            "relationships": {
+                rel_type: self.count_relationships(rel_type)
+                for rel_type in RELATIONSHIP_TYPES
+            },
+        }
@@ -0,0 +1,272 @@
+"""Structured ingestion events and metrics."""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Logger of all ingestion events, every record carries the name of the event, the file
+# and the measured fields as extra attributes
+logger = logging.getLogger("hdf5_graph")
+
+# Phases of an ingestion, in the order they are reported
+PHASES = ("traversal", "conversion", "group_write", "dataset_write", "linking")
+# Counters summed up per file, from the events of traversal and writing
+COUNTERS = (
+    "objects",
+    "bytes_read",
+    "batches",
+    "committed_operations",
+    "failed_operations",
+    "failed_batches",
+    "retries",
+    "deadlocks",
+)
+
+# Keys of the write summaries (apoc.periodic.iterate or ``new_summary``) of the summed
+# up counters
+_SUMMARY_KEYS = {
+    "batches": "batches",
+    "committedOperations": "committed_operations",
+    "failedOperations": "failed_operations",
+    "failedBatches": "failed_batches",
+    "retries": "retries",
+    "deadlocks": "deadlocks",
+}
+
+
+def emit_event(event: str, hdf5_filepath: Path = None, **fields) -> None:
+    """Log a structured ingestion event on the ``hdf5_graph`` logger.
+
+    The message is a single ``key=value`` line, the event, the file and the fields are
+    attached to the log record as ``event``, ``filepath`` and ``fields``.
+
+    Args:
+        event (str): Name of the event, e.g. "phase", "write" or "file".
+        hdf5_filepath (Path, optional): File the event belongs to, None for events of a
+            whole directory. Defaults to None.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    filepath = str(hdf5_filepath) if hdf5_filepath is not None else None
+    message = " ".join(f"{key}={value}" for key, value in fields.items())
+    logger.info(
+        "%s file=%s %s",
+        event,
+        filepath,
+        message,
+        extra={"event": event, "filepath": filepath, "fields": fields},
+    )
+
+
+@contextmanager
+def timed_phase(hdf5_filepath: Path, phase: str, **fields):
+    """Measure the wall-clock time of a phase and emit it as "phase" event.
+
+    Args:
+        hdf5_filepath (Path): File the phase belongs to, None for phases of a whole
+            directory.
+        phase (str): Name of the phase, one of ``PHASES``.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        emit_event(
+            "phase",
+            hdf5_filepath,
+            phase=phase,
+            seconds=round(time.perf_counter() - start, 6),
+            **fields,
+        )
+
+
+def log_write_summary(hdf5_filepath: Path, title: str, summary: dict) -> None:
+    """Emit the summary of written batches as "write" event.
+
+    Args:
+        hdf5_filepath (Path): File the batches belong to.
+        title (str): Description of the written batches, e.g. "Dataset Query".
+        summary (dict): Summary of apoc.periodic.iterate or of ``write_batches``.
+    """
+    fields = {
+        name: summary[key] for key, name in _SUMMARY_KEYS.items() if key in summary
+    }
+    fields["total"] = summary.get("total", 0)
+    fields["seconds"] = summary.get("timeTaken", 0)
+    if summary.get("errorMessages"):
+        fields["errors"] = dict(summary["errorMessages"])
+    emit_event("write", hdf5_filepath, title=title, **fields)
+
+
+def new_file_metrics() -> dict:
+    """Get the empty metrics of a file, with all phases and counters at zero.
+
+    Returns:
+        dict: Seconds per phase, counters and the wall-clock time of the file.
+    """
+    return {
+        "seconds": 0.0,
+        **{phase: 0.0 for phase in PHASES},
+        **{counter: 0 for counter in COUNTERS},
+    }
+
+
+class IngestMetrics(logging.Handler):
+    """Aggregate the events of the ``hdf5_graph`` logger into metrics per file.
+
+    Used as context manager, the handler is attached to the logger, and detached on
+    exit, writing the Prometheus textfile if ``prometheus_path`` is given.
+    Every event is additionally passed to ``callback`` as
+    ``callback(event, filepath, fields)``, e.g. to forward it to another metrics system.
+
+    Args:
+        callback (Callable, optional): Function receiving every event. Defaults to None.
+        prometheus_path (Path, optional): Path of a textfile for the textfile collector
+            of the Prometheus node exporter. Defaults to None.
+    """
+
+    def __init__(self, callback=None, prometheus_path: Path = None):
+        """Create a handler without metrics, which is not attached yet."""
+        super().__init__()
+        self.callback = callback
+        self.prometheus_path = prometheus_path
+        self.files = {}  # filepath -> metrics, None for events of a whole directory
+        self._previous_level = None
+        # logging.Handler already has a lock attribute
+        self._metrics_lock = threading.Lock()
+
+    def __enter__(self):
+        """Attach the handler."""
+        self.attach()
+        return self
+
+    def __exit__(self, *exc):
+        """Detach the handler, writing the Prometheus textfile."""
+        self.detach()
+        return False
+
+    def attach(self) -> None:
+        """Attach the handler to the ``hdf5_graph`` logger, enabling its INFO events."""
+        logger.addHandler(self)
+        if not logger.isEnabledFor(logging.INFO):
+            self._previous_level = logger.level
+            logger.setLevel(logging.INFO)
+
+    def detach(self) -> None:
+        """Detach the handler and write the Prometheus textfile, if one is given."""
+        logger.removeHandler(self)
+        if self._previous_level is not None:
+            logger.setLevel(self._previous_level)
+            self._previous_level = None
+        if self.prometheus_path is not None:
+            self.write_prometheus(self.prometheus_path)
+
+    def emit(self, record: logging.LogRecord) -> None:
+        """Add the event of a log record to the metrics and pass it to the callback."""
+        event = getattr(record, "event", None)
+        if event is None:
+            return
+        fields = record.fields
+        with self._metrics_lock:
+            metrics = self.files.setdefault(record.filepath, new_file_metrics())
+            if event == "phase":
+                metrics[fields["phase"]] += fields["seconds"]
+            elif event == "file":
+                metrics["seconds"] += fields["seconds"]
+            for counter in COUNTERS:
+                if isinstance(fields.get(counter), (int, float)):
+                    metrics[counter] += fields[counter]
+        if self.callback is not None:
+            self.callback(event, record.filepath, fields)
+
+    def report(self) -> dict:
+        """Get the metrics summed up over all files.
+
+        Returns:
+            dict: Number of files, seconds per phase, counters, the wall-clock time of
+                the files and the objects per second.
+        """
+        total = new_file_metrics()
+        with self._metrics_lock:
+            for metrics in self.files.values():
+                for key, value in metrics.items():
+                    total[key] += value
+            files = sum(1 for i in self.files if i is not None)
+        total["files"] = files
+        total["objects_per_s"] = (
+            total["objects"] / total["seconds"] if total["seconds"] else None
+        )
+        return total
+
+    def profile(self) -> str:
+        """Format the timing breakdown per file as table.
+
+        The table shows whether a file is bound by reading or by the database.
+
+        Returns:
+            str: One line per file with the seconds per phase and the objects per
+                second.
+        """
+        header = (
+            f"{'file':<40} {'total':>8} "
+            + " ".join(f"{phase:>13}" for phase in PHASES)
+            + f" {'objects/s':>10}"
+        )
+        lines = [header]
+        with self._metrics_lock:
+            files = sorted(
+                self.files.items(), key=lambda item: (item[0] is None, item[0] or "")
+            )
+        for filepath, metrics in files:
+            name = Path(filepath).name if filepath is not None else "(directory)"
+            rate = (
+                f"{metrics['objects'] / metrics['seconds']:.1f}"
+                if metrics["seconds"]
+                else "-"
+            )
+            lines.append(
+                f"{name[-40:]:<40} {metrics['seconds']:>8.3f} "
+                + " ".join(f"{metrics[phase]:>13.3f}" for phase in PHASES)
+                + f" {rate:>10}"
+            )
+        return "\n".join(lines)
+
+    def write_prometheus(self, path: Path) -> None:
+        """Write the metrics per file in the Prometheus text format, atomically.
+
+        Args:
+            path (Path): Path of the textfile, should end with ".prom" for the node
+                exporter.
+        """
+        lines = [
+            "# HELP hdf5_graph_phase_seconds Wall-clock time of the ingestion phases.",
+            "# TYPE hdf5_graph_phase_seconds gauge",
+        ]
+        with self._metrics_lock:
+            files = list(self.files.items())
+        for filepath, metrics in files:
+            label = (filepath or "").replace("\\", "\\\\").replace('"', '\\"')
+            lines += [
+                f'hdf5_graph_phase_seconds{{file="{label}",phase="{phase}"}} '
+                f"{metrics[phase]}"
+                for phase in PHASES
+            ]
+        for counter in ("seconds", *COUNTERS):
+            name = (
+                f"hdf5_graph_file_{counter}"
+                if counter == "seconds"
+                else f"hdf5_graph_{counter}_total"
+            )
+            lines.append(
+                f"# TYPE {name} {'gauge' if counter == 'seconds' else 'counter'}"
+            )
+            for filepath, metrics in files:
+                label = (filepath or "").replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{name}{{file="{label}"}} {metrics[counter]}')
+        path = Path(path)
+        temporary = path.with_name(f".{path.name}.{os.getpid()}")
+        temporary.write_text("\n".join(lines) + "\n")
+        os.replace(temporary, path)
@@ -0,0 +1,120 @@
+"""Partitioning of parallel writes, so concurrent batches lock no shared nodes."""
+
+from collections import defaultdict
+
+from hdf5_graph.dedup import dataset_key
+
+
+def group_lock_keys(entry: dict):
+    """Yield the nodes locked when linking a group to its parent.
+
+    These are the parent and the group itself, which is the parent of the groups
+    below it. So the links of a group tree are only independent within one level, see
+    ``group_levels``.
+
+    Args:
+        entry (dict): Entry of the group registry.
+
+    Yields:
+        tuple: Keys of the locked nodes.
+    """
+    yield ("parent", entry["parent"])
+    yield ("parent", entry["hdf5_path"])
+
+
+def group_levels(rows: list[dict]) -> list[list[dict]]:
+    """Split group entries into the levels of their nesting depth.
+
+    A link locks a group of one level and its parent of the level above, so the links
+    of one level can be written concurrently, while the levels are written one after
+    the other.
+
+    Args:
+        rows (list[dict]): Entries of the group registry.
+
+    Returns:
+        list[list[dict]]: Entries per level, starting with the top-level groups.
+    """
+    levels = defaultdict(list)
+    for row in rows:
+        levels[row["hdf5_path"].count("/")].append(row)
+    return [levels[depth] for depth in sorted(levels)]
+
+
+def dataset_lock_keys(entry: dict):
+    """Yield the nodes locked when writing a dataset.
+
+    These are its parent and the merged (name, value) node.
+
+    Args:
+        entry (dict): Entry of the dataset registry.
+
+    Yields:
+        tuple: Keys of the locked nodes.
+    """
+    yield ("parent", entry["parent"])
+    if entry["value"] is not None:
+        try:
+            key = dataset_key(entry["obj_name"], entry["value"])
+            hash(key)
+        except TypeError:
+            return
+        yield ("dataset", *key)
+
+
+def partition_rows(
+    rows: list[dict], batch_size, lock_keys
+) -> tuple[list[list[dict]], list[list[dict]]]:
+    """Split rows into batches, which lock no common nodes when written concurrently.
+
+    Rows sharing a lock key (e.g. the same parent or the same merged dataset) are
+    connected, and all connected rows are put into the same batch.
+    Connected rows, which do not fit into one batch, are split into serial batches,
+    which have to be written one after the other.
+
+    Args:
+        rows (list[dict]): Registry entries which should be written.
+        batch_size (int | AdaptiveBatchSize): Maximum number of rows per batch.
+        lock_keys (Callable): Function yielding the keys of the nodes locked by a row.
+
+    Returns:
+        tuple[list[list[dict]], list[list[dict]]]: Independent batches and serial
+            batches.
+    """
+    # union-find over the rows, connected by their lock keys
+    root = list(range(len(rows)))
+
+    def find(i):
+        while root[i] != i:
+            root[i] = root[root[i]]
+            i = root[i]
+        return i
+
+    owner = {}
+    for i, row in enumerate(rows):
+        for key in lock_keys(row):
+            j = find(owner.setdefault(key, i))
+            k = find(i)
+            if j != k:
+                root[max(j, k)] = min(j, k)
+
+    components = defaultdict(list)
+    for i, row in enumerate(rows):
+        components[find(i)].append(row)
+
+    size = int(batch_size)
+    independent, serial, batch = [], [], []
+    for component in components.values():
+        if len(component) > size:
+            serial.extend(
+                component[start : start + size]
+                for start in range(0, len(component), size)
+            )
+            continue
+        if len(batch) + len(component) > size:
+            independent.append(batch)
+            batch = []
+        batch.extend(component)
+    if batch:
+        independent.append(batch)
+    return independent, serial
@@ -0,0 +1,208 @@
+"""Reading hdf5 files ahead in reader processes, with packed registries."""
+
+import itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from hdf5_graph.single_hdf5 import _read_registries, log_traversal
+
+# One row per group or dataset, the hdf5_path is stored in a shared buffer, the value in
+# the column of its kind
+RECORD_DTYPE = np.dtype(
+    [
+        ("dataset", "?"),
+        ("path_end", "<i8"),  # end offset of the hdf5_path in the path buffer
+        ("value_kind", "u1"),
+        ("int_value", "<i8"),
+        ("float_value", "<f8"),
+        ("extra", "<i8"),  # index into the extras, -1 if the record has none
+    ]
+)
+# Kinds of the values,
+# values of other kinds (strings, lists, ...) are kept in the extras
+VALUE_NONE, VALUE_INT, VALUE_FLOAT, VALUE_BOOL, VALUE_OTHER = range(5)
+
+
+def _value_columns(value) -> tuple[int, int, float]:
+    if value is None:
+        return VALUE_NONE, 0, 0.0
+    if isinstance(value, (bool, np.bool_)):
+        return VALUE_BOOL, int(value), 0.0
+    if isinstance(value, (int, np.integer)) and -(2**63) <= value < 2**63:
+        return VALUE_INT, int(value), 0.0
+    if isinstance(value, (float, np.floating)):
+        return VALUE_FLOAT, 0, float(value)
+    return VALUE_OTHER, 0, 0.0
+
+
+def pack_registries(group_registry: list[dict], dataset_registry: list[dict]) -> dict:
+    """Pack the registries of a file into a compact columnar form.
+
+    The packed form is cheap to send between processes.
+
+    The hdf5 paths are concatenated into one buffer and scalar values go into typed
+    columns of a structured array.
+    Only strings, lists and the attrs and array properties of a record are kept as
+    python objects.
+    Names and parents are not stored at all, as they follow from the hdf5 path.
+
+    Args:
+        group_registry (list[dict]): Records of the groups, as returned by
+            ``read_hdf5_registries``.
+        dataset_registry (list[dict]): Records of the datasets, as returned by
+            ``read_hdf5_registries``.
+
+    Returns:
+        dict: Structured array of the records, buffer of the paths and list of the
+            extras.
+    """
+    records = np.zeros(len(group_registry) + len(dataset_registry), dtype=RECORD_DTYPE)
+    paths = []
+    extras = []
+    end = 0
+    for i, entry in enumerate(itertools.chain(group_registry, dataset_registry)):
+        path = entry["hdf5_path"].encode()
+        paths.append(path)
+        end += len(path)
+        value = entry.get("value")
+        kind, int_value, float_value = _value_columns(value)
+        extra = (
+            value if kind == VALUE_OTHER else None,
+            entry.get("array_props") or {},
+            entry["attrs"],
+        )
+        index = -1
+        if extra[0] is not None or extra[1] or extra[2]:
+            index = len(extras)
+            extras.append(extra)
+        records[i] = (
+            i >= len(group_registry),
+            end,
+            kind,
+            int_value,
+            float_value,
+            index,
+        )
+    return {"records": records, "paths": b"".join(paths), "extras": extras}
+
+
+def unpack_registries(
+    hdf5_filepath: Path, packed: dict
+) -> tuple[list[dict], list[dict]]:
+    """Restore the registries of a file from their packed form.
+
+    Args:
+        hdf5_filepath (Path): Path to hdf5 the registries were read from.
+        packed (dict): Registries packed by ``pack_registries``.
+
+    Returns:
+        tuple[list[dict], list[dict]]: Group registry and dataset registry.
+    """
+    group_registry = []
+    dataset_registry = []
+    records, paths, extras = packed["records"], packed["paths"], packed["extras"]
+    starts = np.concatenate(([0], records["path_end"][:-1])).tolist()
+    kinds = records["value_kind"].tolist()
+    int_values = records["int_value"].tolist()
+    float_values = records["float_value"].tolist()
+    for i, (dataset, end, extra) in enumerate(
+        zip(
+            records["dataset"].tolist(),
+            records["path_end"].tolist(),
+            records["extra"].tolist(),
+        )
+    ):
+        hdf5_path = paths[starts[i] : end].decode()
+        parent, _, obj_name = hdf5_path.rpartition("/")
+        other, array_props, attrs = extras[extra] if extra >= 0 else (None, {}, {})
+        entry = {
+            "parent": parent or str(hdf5_filepath),
+            "obj_name": obj_name,
+            "hdf5_path": hdf5_path,
+        }
+        if dataset:
+            kind = kinds[i]
+            if kind == VALUE_INT:
+                value = int_values[i]
+            elif kind == VALUE_BOOL:
+                value = bool(int_values[i])
+            elif kind == VALUE_FLOAT:
+                value = float_values[i]
+            else:
+                value = other
+            entry["value"] = value
+            entry["array_props"] = array_props
+            entry["attrs"] = attrs
+            dataset_registry.append(entry)
+        else:
+            entry["attrs"] = attrs
+            group_registry.append(entry)
+    return group_registry, dataset_registry
+
+
+def read_packed_registries(hdf5_filepath: Path, **read_kwargs) -> tuple[dict, dict]:
+    """Traverse an hdf5 file and pack its registries, to be run in a reader process.
+
+    Keyword arguments are supplied to ``read_hdf5_registries``.
+
+    Args:
+        hdf5_filepath (Path): Path to hdf5 which should be traversed.
+
+    Returns:
+        tuple[dict, dict]: Packed registries and the counters of the traversal.
+    """
+    group_registry, dataset_registry, stats = _read_registries(
+        hdf5_filepath, **read_kwargs
+    )
+    return pack_registries(group_registry, dataset_registry), stats
+
+
+def iter_read_files(files, readers: int = 2, max_pending: int = None, **read_kwargs):
+    """Read hdf5 files in a pool of reader processes and yield their registries.
+
+    The registries are yielded in the order of ``files``.
+
+    The traversal and the decoding of the values run in the readers, only the packed
+    registries are sent back.
+    At most ``readers + max_pending`` files are read ahead of the consumer.
+    Keyword arguments are supplied to ``read_hdf5_registries``.
+
+    Args:
+        files (Iterable[tuple[Path, list[Path]]]): Pairs of a filepath and the filepaths
+            it depends on, as of ``iter_h5_files``.
+        readers (int, optional): Number of reader processes. Defaults to 2.
+        max_pending (int, optional): Number of files read ahead in addition to those
+            being read, if None as many as there are readers. Defaults to None.
+
+    Yields:
+        tuple[Path, list[Path], list[dict], list[dict]]: Filepath, the filepaths it
+            depends on, group registry and dataset registry.
+    """
+    files = iter(files)
+    ahead = readers + (readers if max_pending is None else max_pending)
+    pending = deque()
+    pool = ProcessPoolExecutor(max_workers=readers)
+
+    def submit(count):
+        for hdf5_filepath, parent_files in itertools.islice(files, count):
+            pending.append(
+                (
+                    hdf5_filepath,
+                    parent_files,
+                    pool.submit(read_packed_registries, hdf5_filepath, **read_kwargs),
+                )
+            )
+
+    try:
+        submit(ahead)
+        while pending:
+            hdf5_filepath, parent_files, future = pending.popleft()
+            packed, stats = future.result()
+            submit(1)
+            log_traversal(hdf5_filepath, stats)
+            yield hdf5_filepath, parent_files, *unpack_registries(hdf5_filepath, packed)
+    finally:
+        pool.shutdown(cancel_futures=True)
@@ -0,0 +1,136 @@
+"""Removal of ingested files and their nodes from the database."""
+
+from pathlib import Path
+
+import neo4j
+
+from hdf5_graph.metrics import emit_event
+from hdf5_graph.single_hdf5 import adopt_legacy_nodes
+
+# Shared datasets (merged by name and value) held by the file,
+# which no other file holds.
+# They have no filepath, so they are found through the holds relationships of the file's
+# groups and File node.
+# Holders without a filepath, written by earlier versions, may belong to any file and
+# keep the dataset.
+REMOVE_SHARED_DATASETS_QUERY = """
+    CALL {
+        MATCH (:File {filepath: $filepath})-[:holds]->(d:Dataset)
+        WHERE d.value IS NOT NULL
+        RETURN d
+        UNION
+        MATCH (g:Group)-[:holds]->(d:Dataset)
+        WHERE g.filepath = $filepath AND g.hdf5_path IS NOT NULL AND d.value IS NOT NULL
+        RETURN d
+    }
+    CALL {
+        WITH d
+        OPTIONAL MATCH (other)-[:holds]->(d)
+        WHERE other.filepath IS NULL OR other.filepath <> $filepath
+        WITH d, count(other) AS holders
+        WHERE holders = 0
+        DETACH DELETE d
+    } IN TRANSACTIONS OF {batch_size} ROWS
+"""
+# Nodes of the file, the predicate on hdf5_path lets the (filepath, hdf5_path) indexes
+# serve the lookup
+REMOVE_DATASETS_QUERY = """
+    MATCH (d:Dataset)
+    WHERE d.filepath = $filepath AND d.hdf5_path IS NOT NULL
+    CALL { WITH d DETACH DELETE d } IN TRANSACTIONS OF {batch_size} ROWS
+"""
+REMOVE_GROUPS_QUERY = """
+    MATCH (g:Group)
+    WHERE g.filepath = $filepath AND g.hdf5_path IS NOT NULL
+    CALL { WITH g DETACH DELETE g } IN TRANSACTIONS OF {batch_size} ROWS
+"""
+REMOVE_FILE_QUERY = """
+    MATCH (f:File {filepath: $filepath})
+    DETACH DELETE f
+"""
+# Labels of the ingested nodes, in the order they are purged
+PURGE_LABELS = ("Dataset", "Group", "File")
+# One chunk of nodes of a label, each chunk is its own auto-commit transaction, so the
+# progress can be reported in between
+PURGE_QUERY = """
+    MATCH (n:{label})
+    WITH n LIMIT $batch_size
+    DETACH DELETE n
+"""
+
+
+def _run_batched(session: neo4j.Session, query: str, batch_size: int, **params) -> int:
+    # CALL { ... } IN TRANSACTIONS needs an auto-commit transaction, so it is run with
+    # session.run
+    result = session.run(query.replace("{batch_size}", str(int(batch_size))), **params)
+    return result.consume().counters.nodes_deleted
+
+
+def remove_file(
+    session: neo4j.Session, hdf5_filepath: Path, batch_size: int = 10000
+) -> dict:
+    """Remove the subgraph of a file: its File node, groups and datasets.
+
+    The nodes are deleted in transactions of at most ``batch_size`` nodes.
+
+    Datasets merged by name and value are only removed, if no other file holds them.
+    Groups and datasets written by earlier versions without a filepath are adopted by
+    the file first, so they are removed with it.
+
+    Args:
+        session (neo4j.Session): Neo4j session instance with connected DBMS.
+        hdf5_filepath (Path): Path of the file, as stored in the filepath of its nodes.
+        batch_size (int, optional): Number of nodes deleted per transaction. Defaults to
+            10000.
+
+    Returns:
+        dict: Number of removed shared datasets, datasets, groups and File nodes.
+    """
+    filepath = str(hdf5_filepath)
+    steps = {
+        "shared_datasets": REMOVE_SHARED_DATASETS_QUERY,
+        "datasets": REMOVE_DATASETS_QUERY,
+        "groups": REMOVE_GROUPS_QUERY,
+        "files": REMOVE_FILE_QUERY,
+    }
+    adopt_legacy_nodes(session, hdf5_filepath)
+    removed = {}
+    for step, query in steps.items():
+        removed[step] = _run_batched(session, query, batch_size, filepath=filepath)
+        emit_event("remove", hdf5_filepath, step=step, deleted=removed[step])
+    return removed
+
+
+def purge(session: neo4j.Session, batch_size: int = 10000) -> dict:
+    """Remove all ingested File, Group and Dataset nodes with their relationships.
+
+    The nodes are deleted in transactions of at most ``batch_size`` nodes.
+
+    Unlike a single ``MATCH (n) DETACH DELETE n``, the transaction state stays bounded
+    for graphs of any size. After every chunk a "purge" event with the nodes deleted so
+    far is emitted.
+
+    Args:
+        session (neo4j.Session): Neo4j session instance with connected DBMS.
+        batch_size (int, optional): Number of nodes deleted per transaction. Defaults to
+            10000.
+
+    Returns:
+        dict: Number of removed nodes per label.
+    """
+    batch_size = int(batch_size)
+    removed = {}
+    for label in PURGE_LABELS:
+        query = PURGE_QUERY.replace("{label}", label)
+        removed[label] = 0
+        while True:
+            deleted = (
+                session.run(query, batch_size=batch_size)
+                .consume()
+                .counters.nodes_deleted
+            )
+            removed[label] += deleted
+            emit_event("purge", label=label, deleted=removed[label])
+            if deleted < batch_size:
+                break
+    return removed
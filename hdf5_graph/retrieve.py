@@ -0,0 +1,226 @@
+"""Retrieval of the array datasets referenced by query results."""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import h5py
+import neo4j
+import numpy as np
+
+# Array datasets are stored with the path of their file, so a query can return the
+# references directly, e.g.
+ARRAYS_QUERY = """
+    MATCH (d:Dataset)
+    WHERE d.filepath IS NOT NULL AND d.hdf5_path IS NOT NULL
+    RETURN d.filepath AS filepath, d.hdf5_path AS hdf5_path
+"""
+
+
+class FileCache:
+    """LRU cache of open hdf5 files, so a file is only opened once.
+
+    The least recently used file is closed if more than ``max_open`` files are open. The
+    cache is thread-safe.
+
+    Args:
+        max_open (int, optional): Maximum number of open files. Defaults to 16.
+    """
+
+    def __init__(self, max_open: int = 16):
+        """Create an empty cache."""
+        self.max_open = max_open
+        self.opened = 0
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Get the number of open files."""
+        return len(self._files)
+
+    def __enter__(self):
+        """Enter the cache, the files are closed on exit."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close all open files."""
+        self.close()
+
+    def get(self, hdf5_filepath: Path) -> h5py.File:
+        """Get the open file, opening it read-only if it is not cached.
+
+        Args:
+            hdf5_filepath (Path): Path to the hdf5 file.
+
+        Returns:
+            h5py.File: Open file.
+        """
+        key = str(hdf5_filepath)
+        with self._lock:
+            hdf = self._files.get(key)
+            if hdf is not None:
+                self._files.move_to_end(key)
+                return hdf
+            hdf = h5py.File(key, mode="r")
+            self.opened += 1
+            self._files[key] = hdf
+            while len(self._files) > self.max_open:
+                self._files.popitem(last=False)[1].close()
+            return hdf
+
+    def close(self) -> None:
+        """Close all open files."""
+        with self._lock:
+            for hdf in self._files.values():
+                hdf.close()
+            self._files.clear()
+
+
+def _reference(record) -> tuple[str, str]:
+    # Records of a query result (or dicts) with filepath and hdf5_path, or (filepath,
+    # hdf5_path) pairs
+    if hasattr(record, "keys"):
+        return str(record["filepath"]), record["hdf5_path"]
+    filepath, hdf5_path = record
+    return str(filepath), hdf5_path
+
+
+def read_dataset(hdf: h5py.File, hdf5_path: str, selection=()) -> np.ndarray:
+    """Read a dataset, or a selection of it, from an open hdf5 file.
+
+    Args:
+        hdf (h5py.File): Open hdf5 file.
+        hdf5_path (str): Path of the dataset in the file.
+        selection (optional): Index expression of h5py, e.g. ``np.s_[10:20, ::2]`` for a
+            hyperslab with stride, or a ``h5py.MultiBlockSlice``. Defaults to (), the
+            whole dataset.
+
+    Returns:
+        np.ndarray: Read values.
+    """
+    dataset = hdf[hdf5_path]
+    if not isinstance(dataset, h5py.Dataset):
+        raise KeyError(f"{hdf5_path} in {hdf.filename} is no dataset.")
+    return dataset[selection]
+
+
+def _read_file(
+    hdf5_filepath: str, hdf5_paths: list[str], selection, cache: FileCache
+) -> list[np.ndarray]:
+    hdf = cache.get(hdf5_filepath)
+    return [read_dataset(hdf, hdf5_path, selection) for hdf5_path in hdf5_paths]
+
+
+# Cache of the reader processes,
+# which can not share the open files of the calling process
+_process_cache = None
+
+
+def _init_process(max_open: int) -> None:
+    global _process_cache
+    _process_cache = FileCache(max_open)
+
+
+def _read_file_in_process(
+    hdf5_filepath: str, hdf5_paths: list[str], selection
+) -> list[np.ndarray]:
+    return _read_file(hdf5_filepath, hdf5_paths, selection, _process_cache)
+
+
+def fetch_datasets(
+    records, selection=(), workers: int = 1, cache: FileCache = None, max_open: int = 16
+) -> list[np.ndarray]:
+    """Read the datasets referenced by a query result straight from their hdf5 files.
+
+    The references are grouped by file, so every file is opened once and all its
+    datasets are read together.
+    With more than one worker, the files are read in parallel by processes, each with
+    its own cache of open files.
+
+    Args:
+        records (Iterable): Records of a query result (or dicts) with ``filepath`` and
+            ``hdf5_path``, or (filepath, hdf5_path) pairs.
+        selection (optional): Index expression applied to every dataset, e.g.
+            ``np.s_[:100]`` or ``np.s_[::2, 3]``. Defaults to (), the whole datasets.
+        workers (int, optional): Number of processes reading files in parallel, files
+            are read by the calling process if 1. Defaults to 1.
+        cache (FileCache, optional): Cache of open files used by the calling process,
+            kept open for further calls. If None a temporary one is used. Defaults to
+            None.
+        max_open (int, optional): Maximum number of open files of a temporary cache and
+            of every reader process. Defaults to 16.
+
+    Returns:
+        list[np.ndarray]: Values of the datasets, in the order of the records.
+    """
+    by_file = {}  # filepath -> (positions, hdf5_paths)
+    count = 0
+    for count, record in enumerate(records, start=1):
+        filepath, hdf5_path = _reference(record)
+        positions, hdf5_paths = by_file.setdefault(filepath, ([], []))
+        positions.append(count - 1)
+        hdf5_paths.append(hdf5_path)
+    values = [None] * count
+    files = list(by_file)
+    if workers > 1 and len(files) > 1:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_process, initargs=(max_open,)
+        ) as pool:
+            results = pool.map(
+                _read_file_in_process,
+                files,
+                [by_file[i][1] for i in files],
+                [selection] * len(files),
+            )
+            for filepath, read in zip(files, results):
+                for position, value in zip(by_file[filepath][0], read):
+                    values[position] = value
+        return values
+    own_cache = cache is None
+    if own_cache:
+        cache = FileCache(max_open)
+    try:
+        for filepath in files:
+            positions, hdf5_paths = by_file[filepath]
+            for position, value in zip(
+                positions, _read_file(filepath, hdf5_paths, selection, cache)
+            ):
+                values[position] = value
+    finally:
+        if own_cache:
+            cache.close()
+    return values
+
+
+def query_datasets(
+    session: neo4j.Session,
+    query: str = ARRAYS_QUERY,
+    selection=(),
+    workers: int = 1,
+    cache: FileCache = None,
+    **params,
+) -> list[tuple[dict, np.ndarray]]:
+    """Run a query returning dataset references and read the referenced datasets.
+
+    The graph is used as an index of the hdf5 files.
+
+    Keyword arguments are supplied to the query as parameters.
+
+    Args:
+        session (neo4j.Session): Neo4j session instance with connected DBMS.
+        query (str, optional): Query returning ``filepath`` and ``hdf5_path`` columns.
+            Defaults to ARRAYS_QUERY, all array datasets.
+        selection (optional): Index expression applied to every dataset. Defaults to (),
+            the whole datasets.
+        workers (int, optional): Number of processes reading files in parallel. Defaults
+            to 1.
+        cache (FileCache, optional): Cache of open files, kept open for further calls.
+            Defaults to None.
+
+    Returns:
+        list[tuple[dict, np.ndarray]]: Returned record as dict and the values of its
+            dataset.
+    """
+    records = [record.data() for record in session.run(query, **params)]
+    return list(zip(records, fetch_datasets(records, selection, workers, cache)))
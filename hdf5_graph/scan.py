@@ -0,0 +1,212 @@
+"""Scan of hdf5 files, estimating the size and cost of their ingestion."""
+
+import contextlib
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import h5py
+
+from hdf5_graph.attrs import AttrPolicy
+from hdf5_graph.dedup import dataset_key
+from hdf5_graph.exclusion import PathFilter
+from hdf5_graph.walker import convert_value_to_cypher, iter_objects
+
+# Ingested objects per second assumed for the projected time, if no throughput measured
+# with --profile is given
+DEFAULT_THROUGHPUT = 5000.0
+
+
+def _key_hash(name: str, value) -> int:
+    # Stable between processes, unlike hash(), so the keys of all files can be merged
+    return int.from_bytes(
+        hashlib.blake2b(
+            repr(dataset_key(name, value)).encode(), digest_size=8
+        ).digest(),
+        "little",
+    )
+
+
+def _attr_bytes(obj, attr_policy: AttrPolicy = None) -> tuple[int, int]:
+    # Number and storage size of the stored attrs, without reading their values
+    count, size = 0, 0
+    for name in obj.attrs:
+        if attr_policy is not None and not attr_policy.select(name):
+            continue
+        count += 1
+        with contextlib.suppress(Exception):
+            size += obj.attrs.get_id(name).get_storage_size()
+    return count, size
+
+
+def new_scan() -> dict:
+    """Get the empty counters of a scan.
+
+    Returns:
+        dict: Counters of files, objects, attrs and bytes, and the hashes of the (name,
+            value) keys.
+    """
+    return {
+        "files": 0,
+        "groups": 0,
+        "scalars": 0,
+        "arrays": 0,
+        "attrs": 0,
+        "attr_bytes": 0,
+        "value_bytes": 0,
+        "array_bytes": 0,
+        "path_bytes": 0,
+        "depends_on": 0,
+        "value_keys": set(),
+    }
+
+
+def scan_hdf5(
+    hdf5_filepath: Path,
+    exclude_datasets: list[str] = [],
+    exclude_groups: list[str] = [],
+    exclude_paths: list = [],
+    transfer_attrs: bool = True,
+    attr_policy: AttrPolicy = None,
+) -> dict:
+    """Count what ingesting an hdf5 file would write.
+
+    Only the metadata and the values of scalar datasets are read.
+
+    The same exclusion rules as for the ingestion are applied. Array datasets and attrs
+    are never read, only their sizes are taken from the metadata.
+
+    Args:
+        hdf5_filepath (Path): Path to hdf5 which should be scanned.
+        exclude_datasets (list[str], optional): List of strings with names of datasets
+            which should not be read in. Defaults to [].
+        exclude_groups (list[str], optional): List of strings with names of groups which
+            should not be read in. Defaults to [].
+        exclude_paths (list[str], optional): List of strings with pathparts of datasets
+            which should not be read in. Defaults to [].
+        transfer_attrs (bool, optional): Whether the attrs would be transferred.
+            Defaults to True.
+        attr_policy (AttrPolicy, optional): Which attrs would be transferred, if None
+            all of them. Defaults to None.
+
+    Returns:
+        dict: Counters of the scan, as of ``new_scan``.
+    """
+    scan = new_scan()
+    scan["files"] = 1
+    path_filter = PathFilter(exclude_datasets, exclude_groups, exclude_paths)
+
+    with h5py.File(hdf5_filepath, mode="r") as hdf:
+        for kind, obj_name, hdf5_path, _, oid in iter_objects(hdf, path_filter):
+            if kind == "group":
+                obj = h5py.Group(oid)
+                scan["groups"] += 1  # excluded groups are not visited
+            else:
+                obj = h5py.Dataset(oid)
+                if obj.shape == () and obj.size:
+                    value = convert_value_to_cypher(obj)
+                    scan["scalars"] += 1
+                    scan["value_bytes"] += obj.dtype.itemsize
+                    if value is not None:
+                        scan["value_keys"].add(_key_hash(obj_name, value))
+                else:
+                    scan["arrays"] += 1
+                    scan["array_bytes"] += obj.nbytes
+            scan["path_bytes"] += len(hdf5_path)
+            if transfer_attrs:
+                count, size = _attr_bytes(obj, attr_policy)
+                scan["attrs"] += count
+                scan["attr_bytes"] += size
+    return scan
+
+
+def merge_scans(scans) -> dict:
+    """Sum up the scans of several files.
+
+    Args:
+        scans (Iterable[dict]): Scans of single files.
+
+    Returns:
+        dict: Summed up counters, with the union of the (name, value) keys.
+    """
+    total = new_scan()
+    for scan in scans:
+        for key, value in scan.items():
+            if key == "value_keys":
+                total[key] |= value
+            else:
+                total[key] += value
+    return total
+
+
+def scan_files(files, workers: int = 1, **kwargs) -> dict:
+    """Scan hdf5 files, in parallel across files with more than one worker.
+
+    Keyword arguments are supplied to ``scan_hdf5``.
+
+    Args:
+        files (Iterable[tuple[Path, list[Path]]]): Pairs of a filepath and the filepaths
+            it depends on, as of ``iter_h5_files``.
+        workers (int, optional): Number of processes scanning files. Defaults to 1.
+
+    Returns:
+        dict: Summed up counters of all files.
+    """
+    files = list(files)
+    filepaths = [hdf5_filepath for hdf5_filepath, _ in files]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            scans = list(
+                pool.map(_scan_with_kwargs, filepaths, [kwargs] * len(filepaths))
+            )
+    else:
+        scans = [scan_hdf5(hdf5_filepath, **kwargs) for hdf5_filepath in filepaths]
+    total = merge_scans(scans)
+    total["depends_on"] = sum(len(parent_files) for _, parent_files in files)
+    return total
+
+
+def _scan_with_kwargs(hdf5_filepath: Path, kwargs: dict) -> dict:
+    return scan_hdf5(hdf5_filepath, **kwargs)
+
+
+def estimate(scan: dict, throughput: float = DEFAULT_THROUGHPUT) -> dict:
+    """Estimate the nodes, relationships and properties an ingestion would create.
+
+    The duration of the ingestion is estimated as well.
+
+    Scalar datasets with the same name and value are merged into one node, arrays always
+    get their own node.
+
+    Args:
+        scan (dict): Counters of a scan.
+        throughput (float, optional): Ingested groups and datasets per second, e.g. the
+            objects/s reported by ``--profile`` for a sample of the files. Defaults to
+            DEFAULT_THROUGHPUT.
+
+    Returns:
+        dict: Nodes per label, relationships per type, distinct (name, value) keys,
+            property bytes and the projected seconds.
+    """
+    distinct = len(scan["value_keys"])
+    objects = scan["groups"] + scan["scalars"] + scan["arrays"]
+    return {
+        "nodes": {
+            "File": scan["files"],
+            "Group": scan["groups"],
+            "Dataset": distinct + scan["arrays"],
+        },
+        "relationships": {
+            "holds": objects,
+            "depends_on": scan["depends_on"],
+        },
+        "distinct_values": distinct,
+        "scalars": scan["scalars"],
+        "dedup_ratio": scan["scalars"] / distinct if distinct else None,
+        "attrs": scan["attrs"],
+        "property_bytes": scan["attr_bytes"]
+        + scan["value_bytes"]
+        + 2 * scan["path_bytes"],
+        "array_bytes_not_stored": scan["array_bytes"],
+        "projected_seconds": objects / throughput if throughput else None,
+    }
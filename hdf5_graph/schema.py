@@ -0,0 +1,100 @@
+"""Indexes and constraints needed by the ingestion queries."""
+
+import neo4j
+
+# Indexes and constraints backing the lookups of the ingestion queries.
+# All statements are idempotent, so they can be run before every ingestion.
+SCHEMA_QUERIES = [
+    """
+    CREATE CONSTRAINT file_filepath IF NOT EXISTS
+    FOR (f:File) REQUIRE f.filepath IS UNIQUE
+    """,
+    # groups are looked up by their path within the file they belong to
+    """
+    CREATE INDEX group_filepath_hdf5_path IF NOT EXISTS
+    FOR (g:Group) ON (g.filepath, g.hdf5_path)
+    """,
+    """
+    CREATE INDEX dataset_filepath_hdf5_path IF NOT EXISTS
+    FOR (d:Dataset) ON (d.filepath, d.hdf5_path)
+    """,
+    # unique, so that concurrent writers cannot MERGE the same dataset twice,
+    # datasets without a value are not affected by the constraint
+    """
+    CREATE CONSTRAINT dataset_name_value IF NOT EXISTS
+    FOR (d:Dataset) REQUIRE (d.name, d.value) IS UNIQUE
+    """,
+]
+
+
+# Earlier versions created dataset_name_value as a plain index, its name blocks the
+# constraint
+LEGACY_INDEX_QUERY = """
+    SHOW INDEXES YIELD name, owningConstraint
+    WHERE name = 'dataset_name_value' AND owningConstraint IS NULL
+    RETURN name
+"""
+CONSTRAINT_QUERY = """
+    SHOW CONSTRAINTS YIELD name
+    WHERE name = 'dataset_name_value'
+    RETURN name
+"""
+DUPLICATES_QUERY = """
+    MATCH (d:Dataset)
+    WHERE d.value IS NOT NULL
+    WITH d.name AS name, d.value AS value, count(*) AS nodes
+    WHERE nodes > 1
+    RETURN name, value, nodes
+    LIMIT 5
+"""
+DROP_LEGACY_INDEX_QUERY = "DROP INDEX dataset_name_value IF EXISTS"
+
+
+def _check_duplicates(records) -> None:
+    # Raise if stored datasets share a name and value, records of DUPLICATES_QUERY
+    duplicates = [
+        (record["name"], record["value"], record["nodes"]) for record in records
+    ]
+    if duplicates:
+        examples = ", ".join(
+            f"{name!r}={value!r} ({nodes} nodes)" for name, value, nodes in duplicates
+        )
+        raise ValueError(
+            "Datasets with the same name and value are stored more than "
+            f"once, e.g. {examples}. Merge or remove them, before the "
+            "dataset_name_value constraint can be created."
+        )
+
+
+def _prepare_dataset_constraint(session: neo4j.Session) -> None:
+    # Drop the index of earlier versions and check that the constraint can be created,
+    # before any schema query runs. create_schema_async does the same on the async
+    # driver
+    if list(session.run(CONSTRAINT_QUERY)):
+        return
+    _check_duplicates(session.run(DUPLICATES_QUERY))
+    if list(session.run(LEGACY_INDEX_QUERY)):
+        session.run(DROP_LEGACY_INDEX_QUERY).consume()
+
+
+def create_schema(session: neo4j.Session, wait: bool = True) -> None:
+    """Create the indexes and constraints of the ingestion queries, if they are missing.
+
+    The plain ``dataset_name_value`` index of earlier versions is replaced by the unique
+    constraint.
+    A ValueError is raised if stored datasets share a name and value, as the constraint
+    cannot be created then.
+
+    Args:
+        session (neo4j.Session): Neo4j session instance with connected DBMS.
+        wait (bool, optional): Whether to block until all indexes are online. Defaults
+            to True.
+
+    Returns:
+        None
+    """
+    _prepare_dataset_constraint(session)
+    for query in SCHEMA_QUERIES:
+        session.run(query).consume()
+    if wait:
+        session.run("CALL db.awaitIndexes()").consume()
@@ -1,212 +1,1156 @@
+import queue
+import threading
+import time
 from pathlib import Path
 
-import h5py
 import neo4j
 
+from hdf5_graph.arrays import ArrayPolicy
+from hdf5_graph.attrs import AttrPolicy
+from hdf5_graph.dedup import DatasetCache
+from hdf5_graph.graph_writer import GraphWriter
+from hdf5_graph.helpers import record_batches
+from hdf5_graph.metrics import emit_event, log_write_summary, timed_phase
+from hdf5_graph.partition import (
+    dataset_lock_keys,
+    group_levels,
+    group_lock_keys,
+    partition_rows,
+)
+from hdf5_graph.schema import create_schema
 
-def convert_value_to_cypher(dataset):
-    try:
-        if dataset.dtype.str == "|O":  # first strings, because also true in 2nd if
-            return dataset.asstr()[()]
-        elif not dataset.shape and not dataset._is_empty:
-            return dataset[()]
-        else:
-            return None
-    except Exception:
-        # print(f"For dataset with name {dataset.name}, the conversion did not work!")
-        return None
+# convert_value_to_cypher was defined here, it is still importable from this module
+from hdf5_graph.walker import convert_value_to_cypher, walk_hdf5  # noqa: F401
+from hdf5_graph.writers import ENGINES, write_batches, write_unwind
 
+# Find the parent node of an entry, either the File node (top-level objects) or a Group
+# node of the same file.
+# Separate labeled branches, so that both lookups are served by an index.
+PARENT_LOOKUP = """CALL {
+            WITH entry
+            MATCH (p:File {filepath: entry.parent})
+            RETURN p
+            UNION
+            WITH entry
+            MATCH (p:Group {filepath: $filepath, hdf5_path: entry.parent})
+            RETURN p
+        }"""
 
-def put_hdf5_in_neo4j(
+# Creation of a Group node, executed for every entry of the group registry.
+# The nodes are linked to their parents afterwards, so all groups of a registry can be
+# created at once.
+GROUP_NODE_ACTION = """CREATE (e:Group {
+            name: entry.obj_name, hdf5_path: entry.hdf5_path, filepath: $filepath
+        })
+        FOREACH (ignoreMe IN CASE WHEN $transfer_attrs THEN [1] ELSE [] END |
+            SET e += entry.attrs
+        )"""
+# Link a created Group node to its parent, which is looked up by the path of the parent
+GROUP_LINK_ACTION = f"""{PARENT_LOOKUP}
+        MATCH (e:Group {{filepath: $filepath, hdf5_path: entry.hdf5_path}})
+        CREATE (p)-[:holds]->(e)"""
+# Creation or merge of a Dataset node, executed for every entry of the dataset registry
+DATASET_ACTION = f"""{PARENT_LOOKUP}
+        WITH p AS e, entry
+        FOREACH (ignoreMe IN CASE WHEN entry.value IS NULL THEN [1] ELSE [] END |
+            CREATE (e)-[:holds]->(dset:Dataset {{
+                name: entry.obj_name, hdf5_path: entry.hdf5_path, filepath: $filepath
+            }})
+            SET dset += entry.array_props
+            FOREACH (ignoreMe IN CASE WHEN $transfer_attrs THEN [1] ELSE [] END |
+                SET dset += entry.attrs
+            )
+        )
+        FOREACH (ignoreMe IN CASE WHEN entry.value IS NOT NULL THEN [1] ELSE [] END |
+            MERGE (dset:Dataset {{name: entry.obj_name, value: entry.value}})
+                ON CREATE SET
+                    dset.hdf5_path = entry.hdf5_path, dset += entry.array_props
+            FOREACH (ignoreMe IN CASE WHEN $transfer_attrs THEN [1] ELSE [] END |
+                SET dset += entry.attrs
+            )
+            MERGE (e)-[:holds]->(dset)
+        )"""
+# Link a Dataset node, whose id was found in the DatasetCache, to its holder.
+# If the node does not exist anymore (or the id was reused), it is merged as usual.
+DATASET_CACHED_ACTION = f"""{PARENT_LOOKUP}
+        WITH p AS e, entry
+        OPTIONAL MATCH (known:Dataset)
+        WHERE elementId(known) = entry.node_id
+            AND known.name = entry.obj_name AND known.value = entry.value
+        FOREACH (ignoreMe IN CASE WHEN known IS NOT NULL THEN [1] ELSE [] END |
+            CREATE (e)-[:holds]->(known)
+            FOREACH (ignoreMe IN CASE WHEN $transfer_attrs THEN [1] ELSE [] END |
+                SET known += entry.attrs
+            )
+        )
+        FOREACH (ignoreMe IN CASE WHEN known IS NULL THEN [1] ELSE [] END |
+            MERGE (dset:Dataset {{name: entry.obj_name, value: entry.value}})
+                ON CREATE SET
+                    dset.hdf5_path = entry.hdf5_path, dset += entry.array_props
+            FOREACH (ignoreMe IN CASE WHEN $transfer_attrs THEN [1] ELSE [] END |
+                SET dset += entry.attrs
+            )
+            MERGE (e)-[:holds]->(dset)
+        )"""
+
+
+def _periodic_iterate(action: str, variable: str = "entry") -> str:
+    # apoc.periodic.iterate running action for every element of the list parameter $rows
+    return f"""
+    CALL apoc.periodic.iterate(
+        'UNWIND $rows AS {variable} RETURN {variable}',
+        '{action}',
+        {{batchSize: $batch_size, parallel: $parallel, concurrency: $concurrency,
+            params: {{
+                rows: $rows, transfer_attrs: $transfer_attrs, filepath: $filepath
+            }}
+        }}
+    )
+    YIELD batches, total, timeTaken, committedOperations, failedOperations,
+        failedBatches, retries, errorMessages, batch, operations, wasTerminated,
+        failedParams, updateStatistics
+    RETURN batches, total, timeTaken, committedOperations, failedOperations,
+        failedBatches, retries, errorMessages, batch, operations, wasTerminated,
+        failedParams, updateStatistics
+    """
+
+
+def _partitioned(action: str) -> str:
+    # Every element of $rows is a partition of entries, written as one batch
+    return _periodic_iterate(f"UNWIND partition AS entry {action}", "partition")
+
+
+# Group queries -> Group Nodes, and their holds relationships
+GROUP_NODE_QUERY = _periodic_iterate(GROUP_NODE_ACTION)
+GROUP_LINK_QUERY = _periodic_iterate(GROUP_LINK_ACTION)
+GROUP_LINK_PARTITION_QUERY = _partitioned(GROUP_LINK_ACTION)
+# Database query -> Database nodes
+DATASET_QUERY = _periodic_iterate(DATASET_ACTION)
+DATASET_PARTITION_QUERY = _partitioned(DATASET_ACTION)
+DATASET_CACHED_QUERY = _periodic_iterate(DATASET_CACHED_ACTION)
+DATASET_CACHED_PARTITION_QUERY = _partitioned(DATASET_CACHED_ACTION)
+# File node, with size and mtime as fingerprint to detect changes on re-ingestion
+FILE_QUERY = """
+            CREATE (f:File {
+                name: $obj_name, filepath:$path, size: $size, mtime: $mtime
+            })
+            """
+# depends_on relationships of a File node, the labels let the filepath index serve
+# both lookups
+CONNECT_QUERY = """
+            UNWIND $connect_path AS path
+            MATCH (f:File {filepath: $filepath}), (c:File {filepath: path})
+            MERGE (f)-[:depends_on]->(c)
+        """
+# depends_on relationships between already existing File nodes, for a batch of files
+LINK_QUERY = """
+                UNWIND $rows AS row
+                MATCH (f:File {filepath: row.filepath})
+                UNWIND row.depends_on AS path
+                MATCH (c:File {filepath: path})
+                MERGE (f)-[:depends_on]->(c)
+            """
+# Same actions for the client-side batching of ``write_unwind``
+GROUP_NODE_UNWIND_QUERY = f"""
+        UNWIND $rows AS entry
+        {GROUP_NODE_ACTION}
+    """
+GROUP_LINK_UNWIND_QUERY = f"""
+        UNWIND $rows AS entry
+        {GROUP_LINK_ACTION}
+    """
+DATASET_UNWIND_QUERY = f"""
+        UNWIND $rows AS entry
+        {DATASET_ACTION}
+    """
+DATASET_CACHED_UNWIND_QUERY = f"""
+        UNWIND $rows AS entry
+        {DATASET_CACHED_ACTION}
+    """
+
+# Marks the end of the traversal in ``iter_hdf5_records``
+_STREAM_END = object()
+
+
+def new_traversal_stats() -> dict:
+    """Get the empty counters of a traversal, filled by ``walk_hdf5``.
+
+    Returns:
+        dict: Number of emitted objects, bytes of the read dataset values and seconds of
+            traversal and value conversion.
+    """
+    return {"objects": 0, "bytes_read": 0, "traversal": 0.0, "conversion": 0.0}
+
+
+def _traverse(
+    hdf5_filepath: Path,
+    emit,
+    exclude_datasets,
+    exclude_groups,
+    exclude_paths,
+    *visit_args,
+) -> dict:
+    # Visit the whole file but the excluded branches, the traversal time excludes the
+    # value conversion, which is reported separately
+    stats = new_traversal_stats()
+    start = time.perf_counter()
+    walk_hdf5(
+        hdf5_filepath,
+        emit,
+        exclude_datasets,
+        exclude_groups,
+        exclude_paths,
+        *visit_args,
+        stats=stats,
+    )
+    stats["traversal"] = time.perf_counter() - start - stats["conversion"]
+    return stats
+
+
+def log_traversal(hdf5_filepath: Path, stats: dict) -> None:
+    """Emit the counters of a traversal as "phase" events.
+
+    There is one event of the traversal and one of the value conversion.
+
+    Args:
+        hdf5_filepath (Path): Traversed file.
+        stats (dict): Counters of the traversal, as of ``new_traversal_stats``.
+    """
+    emit_event(
+        "phase",
+        hdf5_filepath,
+        phase="traversal",
+        seconds=round(stats["traversal"], 6),
+        objects=stats["objects"],
+        bytes_read=stats["bytes_read"],
+    )
+    emit_event(
+        "phase",
+        hdf5_filepath,
+        phase="conversion",
+        seconds=round(stats["conversion"], 6),
+    )
+
+
+def iter_hdf5_records(
     hdf5_filepath: Path,
-    session: neo4j.Session,
     exclude_datasets: list[str] = [],
     exclude_groups: list[str] = [],
     exclude_paths: list = [],
-    connect_to_filepath: list[Path] = None,
-    batch_size: int = 1000,
-    transfer_attrs: bool =True,
-    parallel_group: bool = False,
-    parallel_dataset: bool = False,
-    concurrency: int = 50,
+    transfer_attrs: bool = True,
+    max_pending: int = 1000,
+    array_policy: ArrayPolicy = None,
+    attr_policy: AttrPolicy = None,
+):
+    """Traverse the hdf5 file in a background thread and yield its records.
+
+    The records of the groups and datasets are yielded while they are visited.
+
+    At most ``max_pending`` records are held in memory, the traversal blocks until the
+    consumer catches up.
+    Parents are always yielded before their children.
+
+    Args:
+        hdf5_filepath (Path): Path to hdf5 which should be traversed.
+        exclude_datasets (list[str], optional): List of strings with names of datasets
+            which should not be read in. Defaults to [].
+        exclude_groups (list[str], optional): List of strings with names of groups which
+            should not be read in. Defaults to [].
+        exclude_paths (list[str], optional): List of strings with pathparts of datasets
+            which should not be read in. Defaults to [].
+        transfer_attrs (bool, optional): Whether the attrs of the HDF5-objects should be
+            read. Defaults to True.
+        max_pending (int, optional): Maximum number of records buffered between
+            traversal and consumer. Defaults to 1000.
+        array_policy (ArrayPolicy, optional): How array datasets are encoded, if None
+            they get no value. Defaults to None.
+        attr_policy (AttrPolicy, optional): Which attrs are read and how they are
+            converted, if None all attrs are read as they are. Defaults to None.
+
+    Yields:
+        tuple[str, dict]: Kind of the object ("group" or "dataset") and its record.
+    """
+    pending = queue.Queue(maxsize=max(1, max_pending))
+    stop = threading.Event()
+    waited = [0.0]  # seconds the traversal was blocked by the consumer
+
+    def put(item):
+        # do not block forever, if the consumer stopped early
+        start = time.perf_counter()
+        try:
+            while not stop.is_set():
+                try:
+                    pending.put(item, timeout=0.1)
+                    return None
+                except queue.Full:
+                    continue
+            return 1  # stops the traversal
+        finally:
+            waited[0] += time.perf_counter() - start
+
+    def emit(kind, record):
+        return put((kind, record))
+
+    def produce():
+        end = _STREAM_END
+        try:
+            stats = _traverse(
+                hdf5_filepath,
+                emit,
+                exclude_datasets,
+                exclude_groups,
+                exclude_paths,
+                transfer_attrs,
+                array_policy,
+                attr_policy,
+            )
+            # the time waiting for the consumer to write the records
+            # is no traversal time
+            stats["traversal"] = max(0.0, stats["traversal"] - waited[0])
+            log_traversal(hdf5_filepath, stats)
+        except Exception as e:
+            end = e
+        put(end)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = pending.get()
+            if item is _STREAM_END:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+def _file_params(hdf5_filepath: Path) -> dict:
+    stat = hdf5_filepath.stat()
+    return {
+        "obj_name": hdf5_filepath.name,
+        "path": str(hdf5_filepath),
+        "size": stat.st_size,
+        "mtime": stat.st_mtime_ns,
+    }
+
+
+def _create_file_node(session: neo4j.Session, hdf5_filepath: Path) -> None:
+    session.run(FILE_QUERY, **_file_params(hdf5_filepath))
+
+
+def _run_apoc(
+    session: neo4j.Session,
+    hdf5_filepath: Path,
+    title: str,
+    query: str,
+    rows: list,
+    batch_size,
+    parallel: bool,
+    concurrency: int,
+    **params,
 ) -> None:
-    """Put all of the contents of the hdf5 file into a neo4j graph database, supplied by session.
+    start = time.perf_counter()
+    result = session.run(
+        query,
+        rows=rows,
+        batch_size=int(batch_size),
+        parallel=parallel,
+        concurrency=concurrency,
+        **params,
+    )
+    for record in result:
+        summary = dict(record)
+        summary["deadlocks"] = sum(
+            count
+            for message, count in record["errorMessages"].items()
+            if "Deadlock" in message
+        )
+        log_write_summary(hdf5_filepath, title, summary)
+        # apoc.periodic.iterate only reports totals, so the mean batch is reported to an
+        # adaptive batch size
+        failed = record["failedBatches"] > 0 or record["retries"] > 0
+        record_batches(
+            batch_size,
+            record["total"],
+            record["batches"],
+            time.perf_counter() - start,
+            failed,
+        )
 
-    This method traverses the complete hdf5-file, putting the datasets and groups between them in a neo4j graph.
-    Datasets will be transformed into valid Cypher datatypes if possible, also checking if there is already a node with the same name and value, and then not duplicating it, but instead creating a relationship.
-    The File node can be connected to other nodes via the connect_to_filepath list, where one supplies a list of filenames to connect to. The graph is then traversed and looks for nodes with a fitting filepath-property.
+
+def _write_rows(
+    session: neo4j.Session,
+    hdf5_filepath: Path,
+    title: str,
+    queries: tuple,
+    rows: list[dict],
+    batch_size: int,
+    transfer_attrs: bool,
+    parallel: bool,
+    concurrency: int,
+    engine: str,
+    driver: neo4j.Driver,
+    lock_keys=None,
+) -> None:
+    # queries holds the apoc, the unwind and the partitioned apoc query
+    query, unwind_query, partition_query = queries
+    params = {"filepath": str(hdf5_filepath), "transfer_attrs": transfer_attrs}
+    if parallel and lock_keys is not None:
+        # Concurrent batches never lock the same nodes, so they do not deadlock.
+        # Connected rows too large for one batch are written serially afterwards.
+        independent, serial = partition_rows(rows, batch_size, lock_keys)
+        if engine == "unwind":
+            summary = write_batches(
+                session,
+                unwind_query,
+                independent,
+                batch_size,
+                driver,
+                concurrency,
+                **params,
+            )
+            log_write_summary(hdf5_filepath, f"{title} (parallel)", summary)
+        else:
+            _run_apoc(
+                session,
+                hdf5_filepath,
+                f"{title} (parallel)",
+                partition_query,
+                independent,
+                1,
+                True,
+                concurrency,
+                **params,
+            )
+        rows = [row for batch in serial for row in batch]
+        if not rows:
+            return
+        title, parallel = f"{title} (serial)", False
+    if engine == "unwind":
+        summary = write_unwind(
+            session,
+            unwind_query,
+            rows,
+            batch_size,
+            driver,
+            concurrency if parallel else 1,
+            **params,
+        )
+        log_write_summary(hdf5_filepath, title, summary)
+    else:
+        _run_apoc(
+            session,
+            hdf5_filepath,
+            title,
+            query,
+            rows,
+            batch_size,
+            parallel,
+            concurrency,
+            **params,
+        )
+
+
+def _write_groups(
+    session: neo4j.Session,
+    hdf5_filepath: Path,
+    groups: list[dict],
+    batch_size: int,
+    transfer_attrs: bool,
+    parallel: bool,
+    concurrency: int,
+    engine: str = "apoc",
+    driver: neo4j.Driver = None,
+) -> None:
+    if not groups:
+        return
+    # All nodes are created first and linked to their parents afterwards,
+    # so the number of round trips does not depend on the nesting depth
+    with timed_phase(hdf5_filepath, "group_write"):
+        _write_rows(
+            session,
+            hdf5_filepath,
+            "Group Query",
+            (GROUP_NODE_QUERY, GROUP_NODE_UNWIND_QUERY, None),
+            groups,
+            batch_size,
+            transfer_attrs,
+            parallel,
+            concurrency,
+            engine,
+            driver,
+        )
+        # A link locks the group and its parent, so parallel links are written level
+        # by level, each group being linked before the groups below it
+        for level in group_levels(groups) if parallel else [groups]:
+            _write_rows(
+                session,
+                hdf5_filepath,
+                "Group Link Query",
+                (GROUP_LINK_QUERY, GROUP_LINK_UNWIND_QUERY, GROUP_LINK_PARTITION_QUERY),
+                level,
+                batch_size,
+                transfer_attrs,
+                parallel,
+                concurrency,
+                engine,
+                driver,
+                group_lock_keys,
+            )
+
+
+def _write_datasets(
+    session: neo4j.Session,
+    hdf5_filepath: Path,
+    datasets: list[dict],
+    batch_size: int,
+    transfer_attrs: bool,
+    parallel: bool,
+    concurrency: int,
+    engine: str = "apoc",
+    driver: neo4j.Driver = None,
+    dataset_cache: DatasetCache = None,
+) -> None:
+    with timed_phase(hdf5_filepath, "dataset_write"):
+        if dataset_cache is not None:
+            # datasets with a known id are linked
+            # without looking them up by name and value
+            cached, datasets = dataset_cache.split(datasets)
+            if cached:
+                _write_rows(
+                    session,
+                    hdf5_filepath,
+                    "Cached Dataset Query",
+                    (
+                        DATASET_CACHED_QUERY,
+                        DATASET_CACHED_UNWIND_QUERY,
+                        DATASET_CACHED_PARTITION_QUERY,
+                    ),
+                    cached,
+                    batch_size,
+                    transfer_attrs,
+                    parallel,
+                    concurrency,
+                    engine,
+                    driver,
+                    dataset_lock_keys,
+                )
+        _write_rows(
+            session,
+            hdf5_filepath,
+            "Dataset Query",
+            (DATASET_QUERY, DATASET_UNWIND_QUERY, DATASET_PARTITION_QUERY),
+            datasets,
+            batch_size,
+            transfer_attrs,
+            parallel,
+            concurrency,
+            engine,
+            driver,
+            dataset_lock_keys,
+        )
+        if dataset_cache is not None:
+            dataset_cache.fill(session, datasets, batch_size)
+
+
+def connect_file(
+    session: neo4j.Session, hdf5_filepath: Path, connect_to_filepath: list[Path]
+) -> None:
+    """Let the File node depend on the File nodes of connect_to_filepath.
+
+    Existing relationships are not duplicated.
 
     Args:
-        hdf5_filepath (Path): Path to hdf5 which should be transformed.
         session (neo4j.Session): Neo4j session instance with connected DBMS.
-        exclude_datasets (list[str], optional): List of strings with names of datasets which should not be read in. Defaults to [].
-        exclude_groups (list[str], optional): List of strings with names of groups which should not be read in. Defaults to [].
-        exclude_paths (list[str], optional): List of strings with pathparts of datasets which should not be read in. Defaults to [].
-        connect_to_filepath (list[Path], optional): List of Filepaths, which the File node should depend on. Defaults to None.
-        batch_size (int, optional): Number of transactions stored in heap before commiting. Defaults to 1000.
-        transfer_attrs (bool, optional): Whether the attrs of the HDF5-objects should be put into the database. Defaults to True.
-        parallel_group (bool, optional): Whether parallelization of the batches creating HDF5-groups should be turned on. Defaults to False.
-        parallel_dataset (bool, optional): Whether parallelization of the batches creating HDF5-datasets should be turned on. Defaults to False.
-        concurrency (int, optional): Number of concurrent tasks which are generated when using parallel. Defaults to 50.
+        hdf5_filepath (Path): Path to hdf5 of the depending File node.
+        connect_to_filepath (list[Path]): List of Filepaths, which the File node should
+            depend on.
 
     Returns:
         None
     """
+    with timed_phase(hdf5_filepath, "linking"):
+        session.run(
+            CONNECT_QUERY,
+            filepath=str(hdf5_filepath),
+            connect_path=[str(i) for i in connect_to_filepath],
+        ).consume()
+
+
+def dependency_rows(dependencies: list[tuple[Path, list[Path]]]) -> list[dict]:
+    """Convert filepaths and the filepaths they depend on into rows of ``LINK_QUERY``.
+
+    Args:
+        dependencies (list[tuple[Path, list[Path]]]): Pairs of a filepath and the
+            filepaths it depends on.
+
+    Returns:
+        list[dict]: One row for every file with dependencies.
+    """
+    return [
+        {"filepath": str(filepath), "depends_on": [str(i) for i in depends_on]}
+        for filepath, depends_on in dependencies
+        if depends_on
+    ]
+
+
+# Nodes of a file written by earlier versions have no filepath, they are given the one
+# of their File node, so they are found by the lookups
+ADOPT_LEGACY_QUERY = """
+    MATCH (f:File {filepath: $filepath})
+    WHERE EXISTS {
+        MATCH (f)-[:holds]->(n) WHERE n.filepath IS NULL AND n.value IS NULL
+    }
+    MATCH (f)-[:holds*]->(n)
+    WHERE n.filepath IS NULL AND n.value IS NULL AND (n:Group OR n:Dataset)
+    SET n.filepath = f.filepath
+    RETURN count(DISTINCT n) AS adopted
+"""
+STORED_GROUPS_QUERY = """
+    MATCH (g:Group {filepath: $filepath})
+    WHERE g.hdf5_path IS NOT NULL
+    RETURN g.hdf5_path AS hdf5_path, properties(g) AS props
+"""
+# shared datasets carry the hdf5_path of the file which created them, so the path is
+# taken from the parent
+STORED_DATASETS_QUERY = """
+    MATCH (f:File {filepath: $filepath})
+    CALL {
+        WITH f
+        MATCH (f)-[:holds]->(d:Dataset)
+        RETURN "" AS parent_path, d
+        UNION
+        WITH f
+        MATCH (g:Group {filepath: f.filepath})-[:holds]->(d:Dataset)
+        WHERE g.hdf5_path IS NOT NULL
+        RETURN g.hdf5_path AS parent_path, d
+    }
+    RETURN parent_path + "/" + d.name AS hdf5_path, properties(d) AS props
+"""
+# Removed datasets lose the holds relationship of the file, shared datasets are only
+# deleted if nothing else holds them
+REMOVE_HELD_DATASETS_QUERY = f"""
+    UNWIND $rows AS entry
+    {PARENT_LOOKUP}
+    MATCH (p)-[r:holds]->(d:Dataset {{name: entry.obj_name}})
+    WHERE (entry.value IS NULL AND d.value IS NULL) OR d.value = entry.value
+    DELETE r
+    WITH d
+    WHERE d.value IS NULL OR NOT (d)<-[:holds]-()
+    DETACH DELETE d
+"""
+REMOVE_GROUP_PATHS_QUERY = """
+    UNWIND $rows AS path
+    MATCH (g:Group {filepath: $filepath, hdf5_path: path})
+    DETACH DELETE g
+"""
+UPDATE_GROUPS_QUERY = """
+    UNWIND $rows AS entry
+    MATCH (g:Group {filepath: $filepath, hdf5_path: entry.hdf5_path})
+    SET g = entry.props
+"""
+UPDATE_DATASETS_QUERY = """
+    UNWIND $rows AS entry
+    MATCH (d:Dataset {filepath: $filepath, hdf5_path: entry.hdf5_path})
+    SET d = entry.props
+"""
+UPDATE_SHARED_DATASETS_QUERY = """
+    UNWIND $rows AS entry
+    MATCH (d:Dataset {name: entry.obj_name, value: entry.value})
+    SET d += entry.attrs
+"""
+
+
+def adopt_legacy_nodes(session: neo4j.Session, hdf5_filepath: Path) -> int:
+    """Give the groups and datasets of a file written by earlier versions its filepath.
+
+    Earlier versions wrote no filepath on these nodes, so they are not found by the
+    lookups of the updates and removals. An "adopt" event is emitted if nodes were
+    adopted.
+
+    Args:
+        session (neo4j.Session): Neo4j session instance with connected DBMS.
+        hdf5_filepath (Path): Path of the file, as stored in its File node.
+
+    Returns:
+        int: Number of adopted nodes.
+    """
+    record = session.run(ADOPT_LEGACY_QUERY, filepath=str(hdf5_filepath)).single()
+    adopted = record["adopted"] if record is not None else 0
+    if adopted:
+        emit_event("adopt", hdf5_filepath, nodes=adopted)
+    return adopted
+
+
+class CypherWriter(GraphWriter):
+    """Writer of the registries into neo4j, with apoc or client-side UNWIND batches.
+
+    Args:
+        session (neo4j.Session): Neo4j session instance with connected DBMS.
+        batch_size (int | AdaptiveBatchSize, optional): Number of transactions stored in
+            heap before commiting, or a controller adapting it to the commit latency.
+            Defaults to 1000.
+        parallel_group (bool, optional): Whether parallelization of the batches creating
+            HDF5-groups should be turned on. Defaults to False.
+        parallel_dataset (bool, optional): Whether parallelization of the batches
+            creating HDF5-datasets should be turned on. Defaults to False.
+        concurrency (int, optional): Number of concurrent tasks which are generated when
+            using parallel. Defaults to 50.
+        engine (str, optional): Engine writing the batches, "apoc" for
+            apoc.periodic.iterate or "unwind" for client-side batching. Defaults to
+            "apoc".
+        driver (neo4j.Driver, optional): Driver providing further sessions, so the
+            "unwind" engine can write parallel batches concurrently. Defaults to None.
+        dataset_cache (DatasetCache, optional): Cache of the ids of datasets with value,
+            linking known datasets by id instead of a MERGE. Defaults to None.
+    """
+
+    def __init__(
+        self,
+        session: neo4j.Session,
+        batch_size: int = 1000,
+        parallel_group: bool = False,
+        parallel_dataset: bool = False,
+        concurrency: int = 50,
+        engine: str = "apoc",
+        driver: neo4j.Driver = None,
+        dataset_cache: DatasetCache = None,
+    ):
+        """Check the engine and keep the options of the writes."""
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, choose one of {ENGINES}.")
+        self.session = session
+        self.batch_size = batch_size
+        self.parallel_group = parallel_group
+        self.parallel_dataset = parallel_dataset
+        self.concurrency = concurrency
+        self.engine = engine
+        self.driver = driver
+        self.dataset_cache = dataset_cache
+
+    def create_schema(self) -> None:
+        """Create the indexes and constraints of the queries."""
+        create_schema(self.session)
+
+    def create_file(self, hdf5_filepath: Path) -> None:
+        """Create the File node with the fingerprint of the file."""
+        _create_file_node(self.session, hdf5_filepath)
+
+    def write_groups(
+        self, hdf5_filepath: Path, groups: list[dict], transfer_attrs: bool = True
+    ) -> None:
+        """Write the Group nodes with the configured engine."""
+        _write_groups(
+            self.session,
+            hdf5_filepath,
+            groups,
+            self.batch_size,
+            transfer_attrs,
+            self.parallel_group,
+            self.concurrency,
+            self.engine,
+            self.driver,
+        )
+
+    def write_datasets(
+        self, hdf5_filepath: Path, datasets: list[dict], transfer_attrs: bool = True
+    ) -> None:
+        """Write the Dataset nodes with the configured engine and dataset cache."""
+        _write_datasets(
+            self.session,
+            hdf5_filepath,
+            datasets,
+            self.batch_size,
+            transfer_attrs,
+            self.parallel_dataset,
+            self.concurrency,
+            self.engine,
+            self.driver,
+            self.dataset_cache,
+        )
+
+    def link_file(self, hdf5_filepath: Path, connect_to_filepath: list[Path]) -> None:
+        """Connect the File node to the nodes with the given filepaths."""
+        connect_file(self.session, hdf5_filepath, connect_to_filepath)
+
+    def link_dependencies(self, dependencies: list[tuple[Path, list[Path]]]) -> None:
+        """Merge the depends_on relationships in batches."""
+        rows = dependency_rows(dependencies)
+        batch_size = int(self.batch_size)
+        for start in range(0, len(rows), batch_size):
+            self.session.run(
+                LINK_QUERY, rows=rows[start : start + batch_size]
+            ).consume()
+
+    def _run_in_chunks(self, query: str, rows: list, **params) -> None:
+        start = 0
+        while start < len(rows):
+            chunk = rows[start : start + int(self.batch_size)]
+            self.session.run(query, rows=chunk, **params).consume()
+            start += len(chunk)
+
+    def stored_tree(
+        self, hdf5_filepath: Path
+    ) -> tuple[dict[str, dict], dict[str, dict]]:
+        """Adopt the legacy nodes of the file and get its groups and datasets."""
+        filepath = str(hdf5_filepath)
+        adopt_legacy_nodes(self.session, hdf5_filepath)
+        stored_groups = {
+            record["hdf5_path"]: record["props"]
+            for record in self.session.run(STORED_GROUPS_QUERY, filepath=filepath)
+        }
+        stored_datasets = {
+            record["hdf5_path"]: record["props"]
+            for record in self.session.run(STORED_DATASETS_QUERY, filepath=filepath)
+        }
+        return stored_groups, stored_datasets
+
+    def remove_datasets(self, hdf5_filepath: Path, datasets: list[dict]) -> None:
+        """Remove the holds relationships and the nodes nothing else holds."""
+        self._run_in_chunks(
+            REMOVE_HELD_DATASETS_QUERY, datasets, filepath=str(hdf5_filepath)
+        )
+
+    def remove_groups(self, hdf5_filepath: Path, hdf5_paths: list[str]) -> None:
+        """Remove the Group nodes with their relationships."""
+        self._run_in_chunks(
+            REMOVE_GROUP_PATHS_QUERY, hdf5_paths, filepath=str(hdf5_filepath)
+        )
+
+    def update_groups(self, hdf5_filepath: Path, groups: list[dict]) -> None:
+        """Replace the properties of the groups."""
+        self._run_in_chunks(UPDATE_GROUPS_QUERY, groups, filepath=str(hdf5_filepath))
+
+    def update_datasets(self, hdf5_filepath: Path, datasets: list[dict]) -> None:
+        """Replace the properties of the datasets without value."""
+        self._run_in_chunks(
+            UPDATE_DATASETS_QUERY, datasets, filepath=str(hdf5_filepath)
+        )
+
+    def update_shared_datasets(self, datasets: list[dict]) -> None:
+        """Update the attrs of the merged datasets."""
+        self._run_in_chunks(UPDATE_SHARED_DATASETS_QUERY, datasets)
+
+
+def as_writer(session: neo4j.Session | GraphWriter, **write_kwargs) -> GraphWriter:
+    """Get the writer of a session, wrapping it into a ``CypherWriter`` if needed.
+
+    Keyword arguments are supplied to ``CypherWriter``, a given writer keeps its own
+    options.
+
+    Args:
+        session (neo4j.Session | GraphWriter): Neo4j session instance with connected
+            DBMS, or a writer.
+
+    Returns:
+        GraphWriter: Writer of the registries.
+    """
+    if isinstance(session, GraphWriter):
+        return session
+    return CypherWriter(session, **write_kwargs)
+
+
+def _read_registries(
+    hdf5_filepath: Path,
+    exclude_datasets: list[str] = [],
+    exclude_groups: list[str] = [],
+    exclude_paths: list = [],
+    transfer_attrs: bool = True,
+    array_policy: ArrayPolicy = None,
+    attr_policy: AttrPolicy = None,
+) -> tuple[list[dict], list[dict], dict]:
+    # Registries and traversal stats, the stats are logged by the caller, as this may
+    # run in another process
     dataset_registry = []
     group_registry = []
 
-    # Create visiting method to put datasets into the registry
-    def visit(name, object):
-        """Visit all items, check if it is dataset, if yes, put it into neo4j."""
-        # decide if it is group or dataset
-        if isinstance(object, h5py.Group):
-            if object.parent.name == "/":
-                parent = hdf5_filepath.name
-            elif name.split("/")[-1] not in exclude_groups and not any(
-                x in object.name for x in exclude_paths
-            ):
-                parent = object.parent.name
-            else:
-                return None  # Break early and not add the group to the registriy
-            group_registry.append(
-                {
-                    "obj_name": object.name.split("/")[-1],
-                    "hdf5_path": object.name,
-                    # "filename": hdf5_filepath.name,
-                    "parent": parent,
-                    "attrs": dict(object.attrs)
-                }
-            )
-            return None
-        elif isinstance(object, h5py.Dataset):
-            if name.split("/")[-1] not in exclude_datasets and not any(
-                x in object.name for x in exclude_paths
-            ):
-                if object.parent.name == "/":
-                    parent = hdf5_filepath.name
-                else:
-                    parent = object.parent.name  # save path, to check for that criteria when looking for parent node
-                temp = {
-                    "parent": parent,
-                    "obj_name": object.name.split("/")[-1],
-                    "hdf5_path": object.name,
-                    "value": convert_value_to_cypher(object),
-                    "attrs": dict(object.attrs)
-                }
-                dataset_registry.append(temp)
-            else:
-                pass
-            return None
+    def emit(kind, record):
+        if kind == "group":
+            group_registry.append(record)
         else:
-            return 0
+            dataset_registry.append(record)
 
     # Traverse the file and gather node information
-    with h5py.File(hdf5_filepath, mode="r") as hdf:
-        hdf.visititems(visit)
-
-    # Create the file node
-    session.run(
-        """
-            CREATE (f:File {name: $obj_name, filepath:$path})
-            """,
-        obj_name=hdf5_filepath.name,
-        path=str(hdf5_filepath),
+    stats = _traverse(
+        hdf5_filepath,
+        emit,
+        exclude_datasets,
+        exclude_groups,
+        exclude_paths,
+        transfer_attrs,
+        array_policy,
+        attr_policy,
     )
+    return group_registry, dataset_registry, stats
 
-    # Group query -> Group Nodes
-    group_query = f"""
-    CALL apoc.periodic.iterate(
-        'UNWIND $group_list AS entry RETURN entry',
-        'MATCH (f)
-        WHERE (f:File AND f.name = entry.parent) OR (f:Group AND f.hdf5_path = entry.parent)
-        CREATE (f)-[:holds]->(e:Group {{name: entry.obj_name, hdf5_path: entry.hdf5_path}})
-        FOREACH (ignoreMe IN CASE WHEN $transfer_attrs THEN [1] ELSE [] END |
-            SET e += entry.attrs
-        )',
-        {{batchSize: $batch_size, parallel: $parallel, concurrency: $concurrency, params: {{group_list: $group_list, transfer_attrs: $transfer_attrs}}}}
+
+def read_hdf5_registries(
+    hdf5_filepath: Path,
+    exclude_datasets: list[str] = [],
+    exclude_groups: list[str] = [],
+    exclude_paths: list = [],
+    transfer_attrs: bool = True,
+    array_policy: ArrayPolicy = None,
+    attr_policy: AttrPolicy = None,
+) -> tuple[list[dict], list[dict]]:
+    """Traverse the complete hdf5 file and gather the records of its objects.
+
+    The returned registries only hold plain python objects, so they can be sent between
+    processes.
+
+    Args:
+        hdf5_filepath (Path): Path to hdf5 which should be traversed.
+        exclude_datasets (list[str], optional): List of strings with names of datasets
+            which should not be read in. Defaults to [].
+        exclude_groups (list[str], optional): List of strings with names of groups which
+            should not be read in. Defaults to [].
+        exclude_paths (list[str], optional): List of strings with pathparts of datasets
+            which should not be read in. Defaults to [].
+        transfer_attrs (bool, optional): Whether the attrs of the HDF5-objects should be
+            read. Defaults to True.
+        array_policy (ArrayPolicy, optional): How array datasets are encoded, if None
+            they get no value. Defaults to None.
+        attr_policy (AttrPolicy, optional): Which attrs are read and how they are
+            converted, if None all attrs are read as they are. Defaults to None.
+
+    Returns:
+        tuple[list[dict], list[dict]]: Group registry and dataset registry.
+    """
+    group_registry, dataset_registry, stats = _read_registries(
+        hdf5_filepath,
+        exclude_datasets,
+        exclude_groups,
+        exclude_paths,
+        transfer_attrs,
+        array_policy,
+        attr_policy,
     )
-    YIELD batches, total, timeTaken, committedOperations, failedOperations, failedBatches, retries, errorMessages, batch, operations, wasTerminated, failedParams, updateStatistics
-    RETURN batches, total, timeTaken, committedOperations, failedOperations, failedBatches, retries, errorMessages, batch, operations, wasTerminated, failedParams, updateStatistics
+    log_traversal(hdf5_filepath, stats)
+    return group_registry, dataset_registry
+
+
+def write_hdf5_registries(
+    hdf5_filepath: Path,
+    session: neo4j.Session | GraphWriter,
+    group_registry: list[dict],
+    dataset_registry: list[dict],
+    batch_size: int = 1000,
+    transfer_attrs: bool = True,
+    parallel_group: bool = False,
+    parallel_dataset: bool = False,
+    concurrency: int = 50,
+    engine: str = "apoc",
+    driver: neo4j.Driver = None,
+    dataset_cache: DatasetCache = None,
+) -> None:
+    """Create the File node and put the gathered groups and datasets below it.
+
+    If a ``GraphWriter`` is given instead of a session, the registries are written to it
+    with its own options.
+
+    Args:
+        hdf5_filepath (Path): Path to hdf5 the registries were read from.
+        session (neo4j.Session | GraphWriter): Neo4j session instance with connected
+            DBMS, or another writer.
+        group_registry (list[dict]): Records of the groups, as returned by
+            ``read_hdf5_registries``.
+        dataset_registry (list[dict]): Records of the datasets, as returned by
+            ``read_hdf5_registries``.
+        batch_size (int | AdaptiveBatchSize, optional): Number of transactions stored in
+            heap before commiting, or a controller adapting it to the commit latency.
+            Defaults to 1000.
+        transfer_attrs (bool, optional): Whether the attrs of the HDF5-objects should be
+            put into the database. Defaults to True.
+        parallel_group (bool, optional): Whether parallelization of the batches creating
+            HDF5-groups should be turned on. Defaults to False.
+        parallel_dataset (bool, optional): Whether parallelization of the batches
+            creating HDF5-datasets should be turned on. The datasets are partitioned by
+            their parent and (name, value), so concurrent batches do not lock the same
+            nodes. Defaults to False.
+        concurrency (int, optional): Number of concurrent tasks which are generated when
+            using parallel. Defaults to 50.
+        engine (str, optional): Engine writing the batches, "apoc" for
+            apoc.periodic.iterate or "unwind" for client-side batching. Defaults to
+            "apoc".
+        driver (neo4j.Driver, optional): Driver providing further sessions, so the
+            "unwind" engine can write parallel batches concurrently. Defaults to None.
+        dataset_cache (DatasetCache, optional): Cache of the ids of datasets with value,
+            linking known datasets by id instead of a MERGE. Defaults to None.
+
+    Returns:
+        None
     """
-    # Database query -> Database nodes
-    dataset_query = f"""
-    CALL apoc.periodic.iterate(
-        'UNWIND $registry_list AS entry RETURN entry',
-        'MATCH (e)
-        WHERE (e:Group AND e.hdf5_path = entry.parent) OR (e:File AND e.name = entry.parent)
-        FOREACH (ignoreMe IN CASE WHEN entry.value IS NULL THEN [1] ELSE [] END |
-            CREATE (e)-[:holds]->(dset:Dataset {{name: entry.obj_name, hdf5_path: entry.hdf5_path}})
-            FOREACH (ignoreMe IN CASE WHEN $transfer_attrs THEN [1] ELSE [] END |
-                SET dset += entry.attrs
-            )
-        )
-        FOREACH (ignoreMe IN CASE WHEN entry.value IS NOT NULL THEN [1] ELSE [] END |
-            MERGE (dset:Dataset {{name: entry.obj_name, value: entry.value}})
-                ON CREATE SET dset.hdf5_path = entry.hdf5_path
-            FOREACH (ignoreMe IN CASE WHEN $transfer_attrs THEN [1] ELSE [] END |
-                SET dset += entry.attrs
-            )
-            MERGE (e)-[:holds]->(dset)
-        )',
-        {{batchSize: $batch_size, parallel: $parallel, concurrency: $concurrency, params: {{registry_list: $registry_list, transfer_attrs: $transfer_attrs}}}}
+    writer = as_writer(
+        session,
+        batch_size=batch_size,
+        parallel_group=parallel_group,
+        parallel_dataset=parallel_dataset,
+        concurrency=concurrency,
+        engine=engine,
+        driver=driver,
+        dataset_cache=dataset_cache,
     )
-    YIELD batches, total, timeTaken, committedOperations, failedOperations, failedBatches, retries, errorMessages, batch, operations, wasTerminated, failedParams, updateStatistics
-    RETURN batches, total, timeTaken, committedOperations, failedOperations, failedBatches, retries, errorMessages, batch, operations, wasTerminated, failedParams, updateStatistics
-    """
-    # To create tree structure, sort the groups depending on their depth, to create them in order
-    max_nested = max([i["hdf5_path"].count("/") for i in group_registry])
-    for t in range(1, max_nested + 1):
-        groups_branch_t = [i for i in group_registry if t == i["hdf5_path"].count("/")]
-        result = session.run(
-            group_query, group_list=groups_branch_t, batch_size=batch_size, transfer_attrs=transfer_attrs, parallel=parallel_group, concurrency=concurrency
-        )
-        for record in result:
-            print(
-                f"--- Tree-Group Query Summary of Branch {t} ---\n"
-                f"Batches Processed      : {record['batches']}\n"
-                f"Total Entries          : {record['total']}\n"
-                f"Time Taken (ms)        : {record['timeTaken']}\n"
-                f"Committed Operations   : {record['committedOperations']}\n"
-                f"Failed Operations      : {record['failedOperations']}\n"
-                f"Failed Batches         : {record['failedBatches']}\n"
-                f"Retries                : {record['retries']}\n"
-                f"Error Messages         : {record['errorMessages']}\n"
-                f"Batch Details          : {record['batch']}\n"
-                f"Operations             : {record['operations']}\n"
-                f"Was Terminated         : {record['wasTerminated']}\n"
-                f"Failed Parameters      : {record['failedParams']}\n"
-                f"Update Statistics      : {record['updateStatistics']}\n"
-                f"--------------------------------------------------------"
-            )
+    # Create the file node
+    writer.create_file(hdf5_filepath)
+
+    # Create tree structure
+    writer.write_groups(hdf5_filepath, group_registry, transfer_attrs)
     # Add Datasets to Tree
-    result = session.run(
-        dataset_query, registry_list=dataset_registry, batch_size=batch_size, transfer_attrs=transfer_attrs, parallel=parallel_dataset, concurrency=concurrency
+    writer.write_datasets(hdf5_filepath, dataset_registry, transfer_attrs)
+
+
+def put_hdf5_in_neo4j(
+    hdf5_filepath: Path,
+    session: neo4j.Session | GraphWriter,
+    exclude_datasets: list[str] = [],
+    exclude_groups: list[str] = [],
+    exclude_paths: list = [],
+    connect_to_filepath: list[Path] = None,
+    batch_size: int = 1000,
+    transfer_attrs: bool = True,
+    parallel_group: bool = False,
+    parallel_dataset: bool = False,
+    concurrency: int = 50,
+    bootstrap_schema: bool = True,
+    stream: bool = False,
+    array_policy: ArrayPolicy = None,
+    engine: str = "apoc",
+    driver: neo4j.Driver = None,
+    dataset_cache: DatasetCache = None,
+    attr_policy: AttrPolicy = None,
+) -> None:
+    """Put all of the contents of the hdf5 file into a neo4j graph database, supplied by session.
+
+    This method traverses the complete hdf5-file, putting the datasets and groups
+    between them in a neo4j graph.
+    Datasets will be transformed into valid Cypher datatypes if possible, also checking
+    if there is already a node with the same name and value, and then not duplicating
+    it, but instead creating a relationship.
+    The File node can be connected to other nodes via the connect_to_filepath list,
+    where one supplies a list of filenames to connect to. The File nodes with a fitting
+    filepath-property are looked up by the filepath index.
+    The filepath of File nodes is unique, so putting a file whose File node already
+    exists fails with a ``neo4j.exceptions.ConstraintError`` instead of duplicating it.
+    Use ``update_hdf5_in_neo4j`` to update such a file, or ``remove_file`` to remove it
+    first.
+    Timings of the phases and the summaries of the written batches are logged as
+    structured events on the ``hdf5_graph`` logger, which ``IngestMetrics`` aggregates.
+    Instead of a session, a ``GraphWriter`` such as ``MemoryGraph`` can be given, which
+    then writes the file with its own options, ignoring the options of the neo4j writes.
+
+    Args:
+        hdf5_filepath (Path): Path to hdf5 which should be transformed.
+        session (neo4j.Session | GraphWriter): Neo4j session instance with connected
+            DBMS, or another writer.
+        exclude_datasets (list[str], optional): List of strings with names of datasets
+            which should not be read in. Defaults to [].
+        exclude_groups (list[str], optional): List of strings with names of groups which
+            should not be read in. Defaults to [].
+        exclude_paths (list[str], optional): List of strings with pathparts of datasets
+            which should not be read in. Defaults to [].
+        connect_to_filepath (list[Path], optional): List of Filepaths, which the File
+            node should depend on. Defaults to None.
+        batch_size (int | AdaptiveBatchSize, optional): Number of transactions stored in
+            heap before commiting, or a controller adapting it to the commit latency.
+            Defaults to 1000.
+        transfer_attrs (bool, optional): Whether the attrs of the HDF5-objects should be
+            put into the database. Defaults to True.
+        parallel_group (bool, optional): Whether parallelization of the batches creating
+            HDF5-groups should be turned on. Defaults to False.
+        parallel_dataset (bool, optional): Whether parallelization of the batches
+            creating HDF5-datasets should be turned on. The datasets are partitioned by
+            their parent and (name, value), so concurrent batches do not lock the same
+            nodes. Defaults to False.
+        concurrency (int, optional): Number of concurrent tasks which are generated when
+            using parallel. Defaults to 50.
+        bootstrap_schema (bool, optional): Whether the indexes and constraints used by
+            the queries should be created before the first batch. Defaults to True.
+        stream (bool, optional): Whether the records should be written in chunks of
+            batch_size while the file is traversed, instead of gathering the whole file
+            in memory first. Defaults to False.
+        array_policy (ArrayPolicy, optional): How array datasets are stored, e.g. as
+            list or summary statistics. If None they are stored without value. Defaults
+            to None.
+        engine (str, optional): Engine writing the batches, "apoc" for
+            apoc.periodic.iterate or "unwind" for client-side batching without APOC.
+            Defaults to "apoc".
+        driver (neo4j.Driver, optional): Driver providing further sessions, so the
+            "unwind" engine can write parallel batches concurrently. Defaults to None.
+        dataset_cache (DatasetCache, optional): Cache of the ids of datasets with value,
+            linking known datasets by id instead of a MERGE. Defaults to None.
+        attr_policy (AttrPolicy, optional): Which attrs are put into the database and
+            how they are converted, e.g. with a size limit. If None all attrs are put as
+            they are. Defaults to None.
+
+    Returns:
+        None
+    """
+    writer = as_writer(
+        session,
+        batch_size=batch_size,
+        parallel_group=parallel_group,
+        parallel_dataset=parallel_dataset,
+        concurrency=concurrency,
+        engine=engine,
+        driver=driver,
+        dataset_cache=dataset_cache,
     )
-    for record in result:
-        print(
-            f"--- Dataset Query Summary ---\n"
-            f"Batches Processed      : {record['batches']}\n"
-            f"Total Entries          : {record['total']}\n"
-            f"Time Taken (ms)        : {record['timeTaken']}\n"
-            f"Committed Operations   : {record['committedOperations']}\n"
-            f"Failed Operations      : {record['failedOperations']}\n"
-            f"Failed Batches         : {record['failedBatches']}\n"
-            f"Retries                : {record['retries']}\n"
-            f"Error Messages         : {record['errorMessages']}\n"
-            f"Batch Details          : {record['batch']}\n"
-            f"Operations             : {record['operations']}\n"
-            f"Was Terminated         : {record['wasTerminated']}\n"
-            f"Failed Parameters      : {record['failedParams']}\n"
-            f"Update Statistics      : {record['updateStatistics']}\n"
-            f"--------------------------------------------------------"
+    if bootstrap_schema:
+        writer.create_schema()
+
+    start = time.perf_counter()
+    if stream:
+        # Write the records in chunks of batch_size while the file is still traversed
+        writer.create_file(hdf5_filepath)
+        group_chunk = []
+        dataset_chunk = []
+        for kind, record in iter_hdf5_records(
+            hdf5_filepath,
+            exclude_datasets,
+            exclude_groups,
+            exclude_paths,
+            transfer_attrs,
+            max_pending=int(batch_size),
+            array_policy=array_policy,
+            attr_policy=attr_policy,
+        ):
+            if kind == "group":
+                group_chunk.append(record)
+                if len(group_chunk) >= int(batch_size):
+                    writer.write_groups(hdf5_filepath, group_chunk, transfer_attrs)
+                    group_chunk = []
+            else:
+                dataset_chunk.append(record)
+                if len(dataset_chunk) >= int(batch_size):
+                    # the parents of the datasets may still wait in the group chunk
+                    writer.write_groups(hdf5_filepath, group_chunk, transfer_attrs)
+                    group_chunk = []
+                    writer.write_datasets(hdf5_filepath, dataset_chunk, transfer_attrs)
+                    dataset_chunk = []
+        writer.write_groups(hdf5_filepath, group_chunk, transfer_attrs)
+        if dataset_chunk:
+            writer.write_datasets(hdf5_filepath, dataset_chunk, transfer_attrs)
+    else:
+        group_registry, dataset_registry = read_hdf5_registries(
+            hdf5_filepath,
+            exclude_datasets,
+            exclude_groups,
+            exclude_paths,
+            transfer_attrs,
+            array_policy,
+            attr_policy,
         )
-    if connect_to_filepath:
-        result = session.run(
-            """
-                UNWIND $connect_path AS path
-                MATCH (f:File {filepath: $filepath}), (c{filepath: path})
-                CREATE (f)-[:depends_on]->(c)
-            """,
-            filepath=str(hdf5_filepath),
-            connect_path=[str(i) for i in connect_to_filepath],
+        write_hdf5_registries(
+            hdf5_filepath,
+            writer,
+            group_registry,
+            dataset_registry,
+            transfer_attrs=transfer_attrs,
         )
+
+    if connect_to_filepath:
+        writer.link_file(hdf5_filepath, connect_to_filepath)
+    emit_event("file", hdf5_filepath, seconds=round(time.perf_counter() - start, 6))
@@ -0,0 +1,106 @@
+"""Generator of synthetic hdf5 files and directory trees."""
+
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+
+def generate_hdf5(
+    hdf5_filepath: Path,
+    groups: int = 100,
+    depth: int = 3,
+    datasets_per_group: int = 10,
+    array_ratio: float = 0.2,
+    attrs: int = 2,
+    cardinality: int = 10,
+    array_size: int = 100,
+    seed: int = 0,
+) -> dict:
+    """Generate a synthetic hdf5 file with a configurable shape, e.g. for benchmarks.
+
+    The groups are nested up to ``depth`` levels, every group holding
+    ``datasets_per_group`` datasets.
+    Scalar datasets are named by their position in the group and take one of
+    ``cardinality`` values, which controls how many Dataset nodes are merged.
+    The same seed always generates the same file.
+
+    Args:
+        hdf5_filepath (Path): Path of the generated file.
+        groups (int, optional): Number of groups. Defaults to 100.
+        depth (int, optional): Maximum nesting depth of the groups. Defaults to 3.
+        datasets_per_group (int, optional): Number of datasets in every group. Defaults
+            to 10.
+        array_ratio (float, optional): Share of the datasets which are arrays instead of
+            scalars. Defaults to 0.2.
+        attrs (int, optional): Number of attrs of every group and dataset. Defaults to
+            2.
+        cardinality (int, optional): Number of distinct values of every scalar dataset
+            name. Defaults to 10.
+        array_size (int, optional): Number of elements of the array datasets. Defaults
+            to 100.
+        seed (int, optional): Seed of the random numbers. Defaults to 0.
+
+    Returns:
+        dict: Number of generated groups, scalar datasets and array datasets.
+    """
+    rng = np.random.default_rng(seed)
+    counts = {"groups": 0, "scalars": 0, "arrays": 0}
+    with h5py.File(hdf5_filepath, "w") as hdf:
+        # the latest group of every depth, new groups are put below the latest group of
+        # the depth above
+        latest = [hdf]
+        for i in range(groups):
+            level = i % max(depth, 1) + 1
+            group = latest[level - 1].create_group(f"group_{i}")
+            latest = latest[:level] + [group]
+            counts["groups"] += 1
+            for k in range(attrs):
+                group.attrs[f"attr_{k}"] = int(rng.integers(cardinality))
+            for j in range(datasets_per_group):
+                if rng.random() < array_ratio:
+                    dataset = group.create_dataset(
+                        f"array_{j}", data=rng.random(array_size)
+                    )
+                    counts["arrays"] += 1
+                else:
+                    dataset = group.create_dataset(
+                        f"param_{j}", data=float(rng.integers(cardinality)) / 2
+                    )
+                    counts["scalars"] += 1
+                for k in range(attrs):
+                    dataset.attrs[f"attr_{k}"] = int(rng.integers(cardinality))
+    return counts
+
+
+def generate_dir(
+    dir_path: Path, files: int = 10, levels: int = 2, seed: int = 0, **kwargs
+) -> dict:
+    """Generate synthetic hdf5 files, nested in ``levels`` subdirectories.
+
+    The files of deeper levels depend on those above.
+
+    Keyword arguments are supplied to the ``generate_hdf5`` function.
+
+    Args:
+        dir_path (Path): Directory, in which the files are generated.
+        files (int, optional): Number of files. Defaults to 10.
+        levels (int, optional): Number of nested directory levels the files are
+            distributed over. Defaults to 2.
+        seed (int, optional): Seed of the first file, the following files get the
+            following seeds. Defaults to 0.
+
+    Returns:
+        dict: Number of generated files, groups, scalar datasets and array datasets.
+    """
+    counts = {"files": 0, "groups": 0, "scalars": 0, "arrays": 0}
+    for i in range(files):
+        level = i % max(levels, 1)
+        directory = Path(dir_path, *(f"level_{k}" for k in range(1, level + 1)))
+        directory.mkdir(parents=True, exist_ok=True)
+        for key, value in generate_hdf5(
+            directory / f"file_{i}.h5", seed=seed + i, **kwargs
+        ).items():
+            counts[key] += value
+        counts["files"] += 1
+    return counts
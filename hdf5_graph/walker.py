@@ -0,0 +1,210 @@
+"""Low-level traversal of hdf5 files producing the records of their objects."""
+
+import time
+from pathlib import Path
+
+import h5py
+import numpy as np
+
+from hdf5_graph.arrays import ArrayPolicy, encode_scalar
+from hdf5_graph.attrs import AttrPolicy
+from hdf5_graph.exclusion import PathFilter
+
+_ALL = h5py.h5s.ALL
+
+
+def convert_value_to_cypher(dataset):
+    """Read the value of a dataset, which can be stored as property, otherwise None."""
+    try:
+        if dataset.dtype.str == "|O":  # first strings, because also true in 2nd if
+            return dataset.asstr()[()]
+        elif not dataset.shape and not dataset._is_empty:
+            return dataset[()]
+        else:
+            return None
+    except Exception:
+        # print(f"For dataset with name {dataset.name}, the conversion did not work!")
+        return None
+
+
+class _Object:
+    # Stand-in of a high-level object, which only provides the attrs of a low-level id
+    __slots__ = ("id",)
+
+    def __init__(self, oid):
+        self.id = oid
+
+    @property
+    def attrs(self) -> h5py.AttributeManager:
+        return h5py.AttributeManager(self)
+
+
+def _read_value(dsid: h5py.h5d.DatasetID):
+    # Value of a dataset as ``convert_value_to_cypher`` gives it, scalars of plain
+    # dtypes are read directly into a buffer
+    dtype, shape = dsid.dtype, dsid.shape
+    if shape is None or dtype.str == "|O" or dtype.subdtype is not None:
+        return convert_value_to_cypher(h5py.Dataset(dsid))
+    if shape:
+        return None  # arrays are left to the array policy
+    try:
+        buffer = np.empty((), dtype=dtype)
+        dsid.read(_ALL, _ALL, buffer)
+        return buffer[()]
+    except Exception:
+        return convert_value_to_cypher(h5py.Dataset(dsid))
+
+
+def iter_objects(hdf: h5py.File, path_filter: PathFilter = None, parent: str = None):
+    """Traverse an open hdf5 file with the low-level API of h5py.
+
+    Objects are yielded in the order of ``visititems``, every group before the objects
+    below it. Objects with several hard links are yielded only once, and soft and
+    external links are not followed.
+    Excluded groups are not descended into, so excluded branches cost nothing but their
+    link, and excluded datasets are skipped.
+
+    Args:
+        hdf (h5py.File): Opened hdf5 file.
+        path_filter (PathFilter, optional): Compiled exclusion rules, if None nothing is
+            excluded. Defaults to None.
+        parent (str, optional): Parent of the top-level objects, if None the filename of
+            ``hdf``. Defaults to None.
+
+    Yields:
+        tuple: Kind ("group" or "dataset"), name, path, parent path and low-level id of
+            every object.
+    """
+    if path_filter is None:
+        path_filter = PathFilter()
+    seen = {h5py.h5o.get_info(hdf.id).addr}
+
+    def walk(gid, path, parent):
+        links = gid.links
+        for link in gid:
+            info = links.get_info(link)
+            if info.type != h5py.h5l.TYPE_HARD or info.u in seen:
+                continue
+            seen.add(info.u)
+            obj_name = link.decode("utf-8", errors="surrogateescape")
+            hdf5_path = path + obj_name
+            oid = h5py.h5o.open(gid, link)
+            if isinstance(oid, h5py.h5g.GroupID):
+                if path_filter.excludes_group(hdf5_path):
+                    continue
+                yield "group", obj_name, hdf5_path, parent, oid
+                yield from walk(oid, hdf5_path + "/", hdf5_path)
+            elif isinstance(oid, h5py.h5d.DatasetID):
+                if path_filter.excludes_dataset(hdf5_path):
+                    continue
+                yield "dataset", obj_name, hdf5_path, parent, oid
+
+    yield from walk(hdf.id, "/", hdf.filename if parent is None else parent)
+
+
+def walk_hdf5(
+    hdf5_filepath: Path,
+    emit,
+    exclude_datasets: list[str] = [],
+    exclude_groups: list[str] = [],
+    exclude_paths: list = [],
+    transfer_attrs: bool = True,
+    array_policy: ArrayPolicy = None,
+    attr_policy: AttrPolicy = None,
+    stats: dict = None,
+    path_filter: PathFilter = None,
+):
+    """Traverse an hdf5 file with the low-level API of h5py.
+
+    Every group and dataset is handed to ``emit``. The records of groups hold the
+    obj_name, hdf5_path, parent and attrs, those of datasets additionally the value and
+    array_props. The parent of top-level objects is the path of the file.
+
+    Objects are opened by their low-level ids only, their paths and parents are taken
+    from the traversal of ``iter_objects`` instead of asking the objects, and excluded
+    groups are not descended into.
+    Scalar values are read straight into a buffer, high-level datasets are only created
+    for strings, arrays handled by ``array_policy`` and other special datatypes.
+    Strings and bytes too large for the (name, value) constraint are stored in ``data``
+    instead of ``value``, see ``encode_scalar``.
+    Objects are visited in the order of ``visititems``, objects with several hard links
+    only once, and soft and external links are not followed.
+
+    Args:
+        hdf5_filepath (Path): Path to the hdf5 file, which is traversed.
+        emit (Callable): Called as ``emit(kind, record)`` with ``kind`` either "group"
+            or "dataset". If it returns something else than None, the traversal is
+            stopped.
+        exclude_datasets (list[str], optional): List of strings with names of datasets
+            which should not be read in. Defaults to [].
+        exclude_groups (list[str], optional): List of strings with names of groups which
+            should not be read in. Defaults to [].
+        exclude_paths (list[str], optional): List of strings with pathparts of datasets
+            which should not be read in. Defaults to [].
+        transfer_attrs (bool, optional): Whether the attrs of the HDF5-objects should be
+            read. Defaults to True.
+        array_policy (ArrayPolicy, optional): How array datasets are encoded, if None
+            they get no value. Defaults to None.
+        attr_policy (AttrPolicy, optional): Which attrs are read and how they are
+            converted, if None all attrs are read as they are. Defaults to None.
+        stats (dict, optional): Counters of ``new_traversal_stats``, to which the
+            emitted objects, the read bytes and the time of the value conversion are
+            added. Defaults to None.
+        path_filter (PathFilter, optional): Compiled exclusion rules, if None they are
+            compiled from the exclude lists. Defaults to None.
+
+    Returns:
+        The first value returned by ``emit`` which is not None, otherwise None.
+    """
+    if path_filter is None:
+        path_filter = PathFilter(exclude_datasets, exclude_groups, exclude_paths)
+    filepath = str(hdf5_filepath)
+
+    def read_attrs(oid):
+        if not transfer_attrs:
+            return {}
+        obj = _Object(oid)
+        return attr_policy.read(obj) if attr_policy is not None else dict(obj.attrs)
+
+    with h5py.File(hdf5_filepath, mode="r") as hdf:
+        # top-level objects are held by the File node
+        for kind, obj_name, hdf5_path, parent, oid in iter_objects(
+            hdf, path_filter, filepath
+        ):
+            if stats is not None:
+                stats["objects"] += 1
+            if kind == "group":
+                result = emit(
+                    "group",
+                    {
+                        "obj_name": obj_name,
+                        "hdf5_path": hdf5_path,
+                        "parent": parent,
+                        "attrs": read_attrs(oid),
+                    },
+                )
+            else:
+                start = time.perf_counter()
+                value, array_props = encode_scalar(_read_value(oid))
+                if value is None and array_policy is not None and oid.shape:
+                    value, array_props = array_policy.encode(h5py.Dataset(oid))
+                if stats is not None:
+                    stats["conversion"] += time.perf_counter() - start
+                    if value is not None or array_props:
+                        stats["bytes_read"] += oid.dtype.itemsize * int(
+                            np.prod(oid.shape or (), dtype=np.int64)
+                        )
+                result = emit(
+                    "dataset",
+                    {
+                        "parent": parent,
+                        "obj_name": obj_name,
+                        "hdf5_path": hdf5_path,
+                        "value": value,
+                        "array_props": array_props,
+                        "attrs": read_attrs(oid),
+                    },
+                )
+            if result is not None:
+                return result
+    return None
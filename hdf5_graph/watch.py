@@ -0,0 +1,272 @@
+"""Watching a directory and ingesting its h5-files once they are finished."""
+
+import queue
+import threading
+import time
+from pathlib import Path
+
+import h5py
+import neo4j
+
+from hdf5_graph.handle_structure import (
+    DEFAULT_SUFFIXES,
+    iter_h5_files,
+    link_dependencies,
+)
+from hdf5_graph.incremental import update_hdf5_in_neo4j
+from hdf5_graph.metrics import emit_event, logger
+from hdf5_graph.schema import create_schema
+
+
+def _readable(hdf5_filepath: Path) -> bool:
+    # Opening fails while a writer holds the HDF5 file lock, or while the superblock is
+    # not written yet
+    try:
+        with h5py.File(hdf5_filepath, mode="r"):
+            return True
+    except OSError:
+        return False
+
+
+class FileWatcher:
+    """Find new and changed h5-files by polling, and hand them over once finished.
+
+    A file counts as finished when its size and mtime did not change for ``settle``
+    seconds and it can be opened for reading.
+    The dependencies are those of ``iter_h5_files``: a file depends on the h5-files of
+    the directory directly above it.
+    A handed over file is not handed over again until it changes, and not before
+    ``done`` was called for it, so a file is never ingested twice at the same time.
+    A failed file is handed over again after a delay, which doubles with every failure
+    of the same version of the file, up to ``max_backoff``. After ``retries`` failures
+    it is only handed over again once it changes.
+
+    Args:
+        dir_path (Path): Path to directory, which should be watched.
+        suffixes (tuple[str], optional): Suffixes of the h5-files, e.g.
+            ``HDF5_SUFFIXES``. Defaults to DEFAULT_SUFFIXES.
+        settle (float, optional): Seconds a file must stay unchanged before it is handed
+            over. Defaults to 2.0.
+        retries (int, optional): Number of times a failed file is retried without being
+            changed. Defaults to 3.
+        max_backoff (float, optional): Maximum seconds before a failed file is retried.
+            Defaults to 300.0.
+    """
+
+    def __init__(
+        self,
+        dir_path: Path,
+        suffixes: tuple[str] = DEFAULT_SUFFIXES,
+        settle: float = 2.0,
+        retries: int = 3,
+        max_backoff: float = 300.0,
+    ):
+        """Create a watcher, which has not seen any file yet."""
+        self.dir_path = Path(dir_path)
+        self.suffixes = tuple(suffixes)
+        self.settle = settle
+        self.retries = retries
+        self.max_backoff = max_backoff
+        self._handed = {}  # filepath -> (size, mtime_ns) when it was handed over
+        # filepath -> ((size, mtime_ns), time since when it is unchanged)
+        self._pending = {}
+        self._running = set()  # filepaths handed over, whose ingestion is not done
+        # filepath -> ((size, mtime_ns), failures, time before which it is not retried)
+        self._failed = {}
+        # done is called by the workers, while poll runs in the watching thread
+        self._lock = threading.Lock()
+
+    def poll(self, now: float = None) -> list[tuple[Path, list[Path], list[Path]]]:
+        """List the directory tree and get the files finished since the last poll.
+
+        Args:
+            now (float, optional): Current time of ``time.monotonic``, if None it is
+                taken. Defaults to None.
+
+        Returns:
+            list[tuple[Path, list[Path], list[Path]]]: Path of every finished file, the
+                files it depends on and the files depending on it.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return self._poll(now)
+
+    def _poll(self, now: float) -> list[tuple[Path, list[Path], list[Path]]]:
+        ready = []
+        found = set()
+        # directory -> files of its direct subdirectories,
+        # which depend on the files in it
+        below = {}
+        for hdf5_filepath, parent_files in iter_h5_files(
+            self.dir_path, suffixes=self.suffixes
+        ):
+            found.add(hdf5_filepath)
+            below.setdefault(hdf5_filepath.parent.parent, []).append(hdf5_filepath)
+            try:
+                stat = hdf5_filepath.stat()
+            except FileNotFoundError:
+                continue  # removed since the directory was listed
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if self._handed.get(hdf5_filepath) == signature:
+                continue
+            failed = self._failed.get(hdf5_filepath)
+            if failed is not None and failed[0] == signature and now < failed[2]:
+                continue
+            previous = self._pending.get(hdf5_filepath)
+            if previous is None or previous[0] != signature:
+                self._pending[hdf5_filepath] = (signature, now)
+                continue
+            # a changed file is handed over again only after its running ingestion
+            if (
+                now - previous[1] < self.settle
+                or hdf5_filepath in self._running
+                or not _readable(hdf5_filepath)
+            ):
+                continue
+            del self._pending[hdf5_filepath]
+            self._handed[hdf5_filepath] = signature
+            self._running.add(hdf5_filepath)
+            ready.append((hdf5_filepath, parent_files))
+        # removed files are forgotten, so they are handed over again if they come back
+        for i in set(self._handed) - found:
+            del self._handed[i]
+        for i in set(self._pending) - found:
+            del self._pending[i]
+        for i in set(self._failed) - found:
+            del self._failed[i]
+        return [
+            (hdf5_filepath, parent_files, below.get(hdf5_filepath.parent, []))
+            for hdf5_filepath, parent_files in ready
+        ]
+
+    def done(
+        self, hdf5_filepath: Path, failed: bool = False, now: float = None
+    ) -> None:
+        """Mark the ingestion of a handed over file as finished.
+
+        Args:
+            hdf5_filepath (Path): Path of a file returned by ``poll``.
+            failed (bool, optional): Whether the ingestion failed, so the file is
+                retried. Defaults to False.
+            now (float, optional): Current time of ``time.monotonic``, if None it is
+                taken. Defaults to None.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._running.discard(hdf5_filepath)
+            if not failed:
+                self._failed.pop(hdf5_filepath, None)
+                return
+            signature = self._handed.get(hdf5_filepath)
+            previous = self._failed.get(hdf5_filepath)
+            failures = previous[1] + 1 if previous and previous[0] == signature else 1
+            if failures > self.retries:
+                logger.warning(
+                    "Giving up on %s after %d failures, until it changes",
+                    hdf5_filepath,
+                    failures,
+                )
+                return
+            # forgotten, so it is handed over again after the backoff
+            self._handed.pop(hdf5_filepath, None)
+            delay = min(self.settle * 2**failures, self.max_backoff)
+            self._failed[hdf5_filepath] = (signature, failures, now + delay)
+
+
+def watch_dir(
+    dir_path: Path,
+    driver: neo4j.Driver,
+    interval: float = 1.0,
+    settle: float = 2.0,
+    workers: int = 1,
+    suffixes: tuple[str] = DEFAULT_SUFFIXES,
+    retries: int = 3,
+    stop: threading.Event = None,
+    **kwargs,
+) -> None:
+    """Watch a directory and put every finished h5-file into neo4j.
+
+    Keyword arguments are supplied to the ``update_hdf5_in_neo4j`` function, so
+    unchanged files are skipped and changed files only updated, also after a restart.
+    The directory is polled every ``interval`` seconds by a ``FileWatcher``, finished
+    files are put into a queue, which is worked off by ``workers`` threads with a
+    session each.
+    The driver and the sessions are kept for the whole watch, so no file pays for the
+    start-up or the connections.
+    After a file is written, it is linked to the files it depends on and the files
+    depending on it, with the nesting rules of ``put_dir_in_neo4j``.
+    A "watch" event with the status and the latency since the last modification of the
+    file is emitted per file. A failing file is logged and does not stop the watch, it
+    is retried with a growing delay up to ``retries`` times, and again once it changes.
+    When stopped, the files in the queue are still written.
+
+    Args:
+        dir_path (Path): Path to directory, which should be watched.
+        driver (neo4j.Driver): Driver providing the sessions of the workers.
+        interval (float, optional): Seconds between two polls of the directory. Defaults
+            to 1.0.
+        settle (float, optional): Seconds a file must stay unchanged before it is
+            written. Defaults to 2.0.
+        workers (int, optional): Number of files which are written in parallel. Defaults
+            to 1.
+        suffixes (tuple[str], optional): Suffixes of the h5-files, e.g.
+            ``HDF5_SUFFIXES``. Defaults to DEFAULT_SUFFIXES.
+        retries (int, optional): Number of times a failed file is retried without being
+            changed. Defaults to 3.
+        stop (threading.Event, optional): Event ending the watch, if None it runs until
+            interrupted. Defaults to None.
+    """
+    # handle kwargs, as connected_to_filepath is set by function itself:
+    kwargs = {k: v for k, v in kwargs.items() if k != "connect_to_filepath"}
+    if kwargs.pop("bootstrap_schema", True):
+        with driver.session() as session:
+            create_schema(session)
+    kwargs["bootstrap_schema"] = False
+    batch_size = kwargs.get("batch_size", 1000)
+    if stop is None:
+        stop = threading.Event()
+
+    watcher = FileWatcher(dir_path, suffixes, settle, retries)
+    work = queue.Queue()
+
+    def ingest_files():
+        with driver.session() as session:
+            while (item := work.get()) is not None:
+                hdf5_filepath, parent_files, dependents = item
+                failed = True
+                try:
+                    status = update_hdf5_in_neo4j(
+                        hdf5_filepath, session, driver=driver, **kwargs
+                    )
+                    if status != "unchanged":
+                        link_dependencies(
+                            session,
+                            [(hdf5_filepath, parent_files)]
+                            + [(i, [hdf5_filepath]) for i in dependents],
+                            batch_size,
+                        )
+                    latency = time.time() - hdf5_filepath.stat().st_mtime
+                    emit_event(
+                        "watch", hdf5_filepath, status=status, latency=round(latency, 3)
+                    )
+                    failed = False
+                except Exception:
+                    logger.exception("Ingestion of %s failed", hdf5_filepath)
+                finally:
+                    watcher.done(hdf5_filepath, failed)
+
+    threads = [
+        threading.Thread(target=ingest_files, name=f"watch-{i}") for i in range(workers)
+    ]
+    for i in threads:
+        i.start()
+    try:
+        while not stop.is_set():
+            for item in watcher.poll():
+                work.put(item)
+            stop.wait(interval)
+    finally:
+        for _ in threads:
+            work.put(None)
+        for i in threads:
+            i.join()
@@ -0,0 +1,297 @@
+"""Client-side batching of writes with ``UNWIND``, retrying deadlocks."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import neo4j
+
+from hdf5_graph.helpers import AdaptiveBatchSize, is_memory_error
+
+# Engines writing the registries into the database:
+#   apoc   - server-side batching with apoc.periodic.iterate, needs the APOC plugin
+#   unwind - client-side batching, every batch is an UNWIND in its own managed
+#            transaction
+ENGINES = ("apoc", "unwind")
+
+
+def new_summary(total: int = 0) -> dict:
+    """Create an empty summary with the keys of ``apoc.periodic.iterate``.
+
+    Only the keys which apply to client-side batching are filled.
+
+    Args:
+        total (int, optional): Number of rows which are going to be written. Defaults to
+            0.
+
+    Returns:
+        dict: Summary to be filled by ``count_batch``.
+    """
+    return {
+        "batches": 0,
+        "total": total,
+        "timeTaken": 0,
+        "committedOperations": 0,
+        "failedOperations": 0,
+        "failedBatches": 0,
+        "retries": 0,
+        "deadlocks": 0,
+        "errorMessages": {},
+        "updateStatistics": {},
+    }
+
+
+def count_batch(
+    summary: dict,
+    rows: int,
+    attempts: int,
+    counters=None,
+    error: Exception = None,
+    deadlocks: int = 0,
+) -> None:
+    """Add the outcome of a written batch to a summary.
+
+    Args:
+        summary (dict): Summary created by ``new_summary``.
+        rows (int): Number of rows of the batch.
+        attempts (int): Number of transactions run for the batch, including retries.
+        counters (neo4j.SummaryCounters, optional): Counters of the committed
+            transaction. Defaults to None.
+        error (Exception, optional): Error the batch failed with. Defaults to None.
+        deadlocks (int, optional): Number of attempts which failed with a deadlock.
+            Defaults to 0.
+    """
+    summary["batches"] += 1
+    summary["retries"] += max(attempts - 1, 0)
+    summary["deadlocks"] += deadlocks
+    if error is not None:
+        summary["failedOperations"] += rows
+        summary["failedBatches"] += 1
+        summary["errorMessages"][str(error)] = (
+            summary["errorMessages"].get(str(error), 0) + 1
+        )
+        return
+    summary["committedOperations"] += rows
+    for key, value in vars(counters).items():
+        if isinstance(value, int) and not isinstance(value, bool) and value:
+            summary["updateStatistics"][key] = (
+                summary["updateStatistics"].get(key, 0) + value
+            )
+
+
+class _BatchTooLarge(Exception):
+    # Raised inside the transaction function, so the driver does not retry the batch
+    # with the same size
+    pass
+
+
+def is_deadlock(error: Exception) -> bool:
+    """Check if a neo4j error was caused by a deadlock between concurrent transactions.
+
+    Args:
+        error (Exception): Raised error.
+
+    Returns:
+        bool: Whether the transaction was a deadlock victim.
+    """
+    return "DeadlockDetected" in (getattr(error, "code", None) or "")
+
+
+def _slices(rows: list, batch_size):
+    # the size of every batch is taken just before it is written, to follow an adaptive
+    # batch size
+    position = 0
+    while position < len(rows):
+        batch = rows[position : position + int(batch_size)]
+        yield batch
+        position += len(batch)
+
+
+def write_unwind(
+    session: neo4j.Session,
+    query: str,
+    rows: list,
+    batch_size: int | AdaptiveBatchSize = 1000,
+    driver: neo4j.Driver = None,
+    concurrency: int = 1,
+    **params,
+) -> dict:
+    """Write rows in batches of batch_size, each in its own managed write transaction.
+
+    Every batch is sent as ``$rows`` to query.
+
+    Transactions failing with transient errors (e.g. deadlocks) are retried by the
+    driver.
+    If a driver and a concurrency above 1 are given, several batches are written at the
+    same time, each writing thread with its own session.
+    Like ``apoc.periodic.iterate``, failed batches do not stop the other batches, but
+    are reported in the summary.
+    With an ``AdaptiveBatchSize``, every batch is taken with the current size, its
+    commit latency is recorded and batches running the server out of memory are split
+    and written again.
+
+    Args:
+        session (neo4j.Session): Neo4j session instance with connected DBMS.
+        query (str): Cypher query, starting with ``UNWIND $rows AS entry``.
+        rows (list): Rows which should be written.
+        batch_size (int | AdaptiveBatchSize, optional): Number of rows per transaction.
+            Defaults to 1000.
+        driver (neo4j.Driver, optional): Driver providing the sessions of concurrent
+            batches. Defaults to None.
+        concurrency (int, optional): Number of batches written at the same time, if a
+            driver is given. Defaults to 1.
+        **params: Further parameters of the query.
+
+    Returns:
+        dict: Summary with the same keys as the result of ``apoc.periodic.iterate``, as
+            far as they apply, and the number of deadlocks.
+    """
+    if len(rows) <= int(batch_size):
+        concurrency = 1
+    return write_batches(
+        session,
+        query,
+        _slices(rows, batch_size),
+        batch_size,
+        driver,
+        concurrency,
+        **params,
+    )
+
+
+def write_batches(
+    session: neo4j.Session,
+    query: str,
+    batches,
+    batch_size: int | AdaptiveBatchSize = None,
+    driver: neo4j.Driver = None,
+    concurrency: int = 1,
+    **params,
+) -> dict:
+    """Write prepared batches, each in its own managed write transaction.
+
+    Every batch is sent as ``$rows`` to query.
+
+    Works like ``write_unwind``, but the rows are already split into batches, e.g. by
+    ``partition_rows`` so that concurrent batches do not lock the same nodes.
+
+    Args:
+        session (neo4j.Session): Neo4j session instance with connected DBMS.
+        query (str): Cypher query, starting with ``UNWIND $rows AS entry``.
+        batches (Iterable[list]): Batches of rows which should be written.
+        batch_size (int | AdaptiveBatchSize, optional): Adaptive batch size, which is
+            told the latency of the batches. Defaults to None.
+        driver (neo4j.Driver, optional): Driver providing the sessions of concurrent
+            batches. Defaults to None.
+        concurrency (int, optional): Number of batches written at the same time, if a
+            driver is given. Defaults to 1.
+        **params: Further parameters of the query.
+
+    Returns:
+        dict: Summary with the same keys as the result of ``apoc.periodic.iterate``, as
+            far as they apply, and the number of deadlocks.
+    """
+    adaptive = isinstance(batch_size, AdaptiveBatchSize)
+    summary = new_summary()
+    lock = threading.Lock()
+
+    def work(tx, batch, attempts):
+        attempts.append(None)
+        try:
+            return tx.run(query, rows=batch, **params).consume().counters
+        except neo4j.exceptions.Neo4jError as e:
+            attempts[-1] = e
+            if adaptive and is_memory_error(e) and len(batch) > 1:
+                raise _BatchTooLarge() from e
+            raise
+
+    def write(batch_session, batch):
+        # one entry per attempt, the error if it failed within the transaction function
+        attempts = []
+        start = time.perf_counter()
+        try:
+            counters = batch_session.execute_write(work, batch, attempts)
+        except (_BatchTooLarge, neo4j.exceptions.Neo4jError) as e:
+            # running out of memory when committing is only seen here, after the
+            # transaction function returned
+            if isinstance(e, _BatchTooLarge) or (
+                adaptive and is_memory_error(e) and len(batch) > 1
+            ):
+                # write the batch again in two halves
+                batch_size.back_off()
+                with lock:
+                    summary["retries"] += len(attempts)
+                    summary["deadlocks"] += sum(map(is_deadlock, attempts))
+                half = len(batch) // 2
+                write(batch_session, batch[:half])
+                write(batch_session, batch[half:])
+                return
+            if adaptive:
+                batch_size.back_off()
+            with lock:
+                count_batch(
+                    summary,
+                    len(batch),
+                    len(attempts),
+                    error=e,
+                    deadlocks=sum(map(is_deadlock, attempts)),
+                )
+            return
+        if adaptive:
+            if len(attempts) > 1:
+                batch_size.back_off()
+            else:
+                batch_size.record(len(batch), time.perf_counter() - start)
+        with lock:
+            count_batch(
+                summary,
+                len(batch),
+                len(attempts),
+                counters,
+                deadlocks=sum(map(is_deadlock, attempts)),
+            )
+
+    def write_counted(batch_session, batch):
+        with lock:
+            summary["total"] += len(batch)
+        write(batch_session, batch)
+
+    start = time.perf_counter()
+    if driver is None or concurrency <= 1:
+        for batch in batches:
+            write_counted(session, batch)
+    else:
+        # One session per thread, all taken from the connection pool of the driver
+        local = threading.local()
+        sessions = []
+
+        def write_concurrent(batch):
+            if not hasattr(local, "session"):
+                local.session = driver.session()
+                with lock:
+                    sessions.append(local.session)
+            write_counted(local.session, batch)
+
+        # A batch is only taken from the batches when a thread is free to write it,
+        # so slices of an adaptive batch size are cut after the latency of the previous
+        # batches was recorded
+        slots = threading.Semaphore(concurrency)
+        pending = iter(batches)
+        futures = []
+        try:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                while True:
+                    slots.acquire()
+                    batch = next(pending, None)
+                    if batch is None:
+                        break
+                    future = pool.submit(write_concurrent, batch)
+                    future.add_done_callback(lambda _: slots.release())
+                    futures.append(future)
+                for i in futures:
+                    i.result()
+        finally:
+            for i in sessions:
+                i.close()
+    summary["timeTaken"] = round(time.perf_counter() - start, 3)
+    return summary
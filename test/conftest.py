@@ -26,3 +26,24 @@ def session(driver):
         yield session
         # Optional: Clean the database after each test
         session.run("MATCH (n) DETACH DELETE n")
+
+
+@pytest.fixture(scope="function")
+def h5_file(tmp_path):
+    """Pytest fixture to create a small nested hdf5 file, which needs no database."""
+    import h5py
+    import numpy as np
+
+    filepath = tmp_path / "small.h5"
+    with h5py.File(filepath, "w") as hdf:
+        hdf.attrs["Info"] = "root"
+        exp = hdf.create_group("Experiment")
+        exp.attrs["Date"] = "2024/07/01 16:42:42"
+        exp.create_dataset("dt", data=0.00025)
+        exp.create_dataset("name", data="sample", dtype=h5py.string_dtype())
+        curve = exp.create_group("BF_curves/Curve_0")
+        curve.create_dataset("datapoints", data=np.arange(10.0).reshape(5, 2))
+        spline = curve.create_group("Spline")
+        spline.create_dataset("C", data=np.ones((4, 3)))
+        hdf.create_dataset("ca", data=0.3)
+    return filepath
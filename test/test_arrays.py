@@ -0,0 +1,121 @@
+"""Tests of the array policies and the encoding of datasets."""
+
+import h5py
+import numpy as np
+import pytest
+
+from hdf5_graph.arrays import ArrayPolicy, encode_scalar, parse_array_patterns
+from hdf5_graph.single_hdf5 import read_hdf5_registries
+
+
+def test_array_policy_select():
+    """Patterns override the size based choice of the array policy."""
+    policy = ArrayPolicy("summary", list_size=10, patterns={"*/Spline/*": "reference"})
+    assert policy.select("/Experiment/Curve_0/Spline/C", 4) == "reference"
+    assert policy.select("/Experiment/Curve_0/datapoints", 10) == "list"
+    assert policy.select("/Experiment/Curve_0/datapoints", 11) == "summary"
+
+    with pytest.raises(ValueError):
+        ArrayPolicy("everything")
+
+
+def test_array_policy_encode(tmp_path):
+    """Each array policy encodes a chunked dataset with a NaN."""
+    data = np.arange(12.0).reshape(4, 3)
+    data[1, 1] = np.nan
+    with h5py.File(tmp_path / "arrays.h5", "w") as hdf:
+        dset = hdf.create_dataset("data", data=data, chunks=(2, 3), compression="gzip")
+
+        # arrays of more dimensions are not merged by their flattened values, which
+        # would ignore the shape
+        value, props = ArrayPolicy("list", list_size=100).encode(dset)
+        assert value is None
+        assert props["data"][:4] == [0.0, 1.0, 2.0, 3.0]
+        assert props["shape"] == [4, 3] and props["dtype"] == "<f8"
+
+        value, props = ArrayPolicy("list", list_size=100).encode(
+            hdf.create_dataset("row", data=np.arange(3))
+        )
+        assert value == [0, 1, 2]
+        assert props == {"shape": [3], "dtype": "<i8"}
+
+        value, props = ArrayPolicy("summary").encode(dset)
+        assert value is None
+        assert props["min"] == 0.0 and props["max"] == 11.0
+        assert props["mean"] == pytest.approx(np.nanmean(data))
+
+        value, props = ArrayPolicy("reference").encode(dset)
+        assert props["chunks"] == [2, 3] and props["compression"] == "gzip"
+
+
+def test_array_policy_in_registries(h5_file):
+    """The array policy is applied when reading the registries."""
+    _, dataset_registry = read_hdf5_registries(
+        h5_file, array_policy=ArrayPolicy("summary", patterns={"*/datapoints": "list"})
+    )
+    datasets = {r["obj_name"]: r for r in dataset_registry}
+    assert datasets["datapoints"]["value"] is None
+    assert datasets["datapoints"]["array_props"]["data"] == list(np.arange(10.0))
+    assert datasets["C"]["value"] is None
+    assert datasets["C"]["array_props"]["mean"] == 1.0
+    assert datasets["dt"]["array_props"] == {}
+
+
+def test_array_policy_list_bytes(tmp_path, caplog):
+    """Arrays larger than list_max_bytes are not stored as lists."""
+    policy = ArrayPolicy("list", patterns={"*/big": "list"}, list_max_bytes=80)
+    assert policy.select("/small", 10) == "list"
+    assert policy.select("/big", 11) == "reference"
+    assert (
+        ArrayPolicy("summary", list_size=100, list_max_bytes=80).select("/a", 11)
+        == "summary"
+    )
+
+    with h5py.File(tmp_path / "arrays.h5", "w") as hdf:
+        # strings are measured after reading
+        names = hdf.create_dataset(
+            "names", data=["x" * 50, "y" * 50], dtype=h5py.string_dtype()
+        )
+        value, props = policy.encode(names)
+        assert value is None and props == {"shape": [2], "dtype": names.dtype.str}
+
+    class Broken:
+        name, size, ndim, shape, dtype = "/broken", 3, 1, (3,), np.dtype("<f8")
+
+        def read_direct(self, *args, **kwargs):
+            raise OSError("checksum error")
+
+    # a failing read is logged with the dataset path,
+    # instead of silently storing no value
+    with caplog.at_level("WARNING", logger="hdf5_graph"):
+        assert ArrayPolicy("list", list_size=10).encode(Broken()) == (None, {})
+    assert "/broken" in caplog.text and "checksum error" in caplog.text
+
+
+def test_parse_array_patterns():
+    """Patterns are split at the last equals sign."""
+    assert parse_array_patterns(["*/C=summary", "/a=b/*=list"]) == {
+        "*/C": "summary",
+        "/a=b/*": "list",
+    }
+
+
+def test_large_strings_not_merged(tmp_path):
+    """Strings and bytes above the byte cap are stored unmerged."""
+    text = "x" * 10 * 1024
+    with h5py.File(tmp_path / "strings.h5", "w") as hdf:
+        hdf["text"] = text
+        hdf["raw"] = np.bytes_(text.encode())
+        hdf["short"] = "short"
+    _, dataset_registry = read_hdf5_registries(tmp_path / "strings.h5")
+    datasets = {r["obj_name"]: r for r in dataset_registry}
+    # larger than the index entries of the (name, value) constraint
+    assert datasets["text"]["value"] is None
+    assert datasets["text"]["array_props"] == {"data": text}
+    assert datasets["raw"]["value"] is None
+    assert datasets["raw"]["array_props"] == {"data": text.encode()}
+    assert datasets["short"]["value"] == "short"
+    assert datasets["short"]["array_props"] == {}
+
+    assert encode_scalar("äb", max_bytes=2) == (None, {"data": "äb"})
+    assert encode_scalar(1.5, max_bytes=0) == (1.5, {})
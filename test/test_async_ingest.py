@@ -0,0 +1,128 @@
+"""Tests of the asynchronous ingestion with a fake driver."""
+
+import asyncio
+from types import SimpleNamespace
+
+import neo4j
+import pytest
+
+from hdf5_graph.async_ingest import create_schema_async, put_hdf5_in_neo4j_async
+from hdf5_graph.schema import (
+    CONSTRAINT_QUERY,
+    DROP_LEGACY_INDEX_QUERY,
+    DUPLICATES_QUERY,
+    LEGACY_INDEX_QUERY,
+    SCHEMA_QUERIES,
+)
+from hdf5_graph.single_hdf5 import (
+    DATASET_UNWIND_QUERY,
+    FILE_QUERY,
+    GROUP_LINK_UNWIND_QUERY,
+    GROUP_NODE_UNWIND_QUERY,
+    read_hdf5_registries,
+)
+
+
+class FakeAsyncDriver:
+    """Stand-in for a neo4j.AsyncDriver, recording the queries and rows."""
+
+    def __init__(self, answers=None):
+        """Create a driver answering queries from ``answers``."""
+        self.queries = []
+        self.answers = answers or {}
+
+    def session(self):
+        """Open a session recording into the shared query list."""
+        return FakeAsyncSession(self.queries, self.answers)
+
+
+class FakeAsyncSession:
+    """Stand-in for a neo4j.AsyncSession, recording the queries."""
+
+    def __init__(self, queries, answers):
+        """Create a session, which did not run a query yet."""
+        self.queries = queries
+        self.answers = answers
+        self.records = []
+
+    async def __aenter__(self):
+        """Enter the session."""
+        return self
+
+    async def __aexit__(self, *exc):
+        """Leave the session without suppressing errors."""
+        return False
+
+    async def run(self, query, rows=None, **params):
+        """Record the query and serve as its own result."""
+        await asyncio.sleep(0)  # let other batches in flight run
+        self.queries.append((query, rows))
+        self.records = self.answers.get(query, [])
+        return self
+
+    async def data(self):
+        """Return the answered records of the last query."""
+        return list(self.records)
+
+    async def consume(self):
+        """Return a summary with one created node."""
+        return SimpleNamespace(counters=neo4j.SummaryCounters({"nodes-created": 1}))
+
+    async def execute_write(self, work):
+        """Run the transaction function on the session."""
+        return await work(self)
+
+
+def test_put_hdf5_in_neo4j_async(h5_file):
+    """Every group and dataset is written in batches."""
+    driver = FakeAsyncDriver()
+    asyncio.run(
+        put_hdf5_in_neo4j_async(h5_file, driver, batch_size=2, bootstrap_schema=False)
+    )
+    group_registry, dataset_registry = read_hdf5_registries(h5_file)
+
+    assert driver.queries[0][0] == FILE_QUERY
+    written_groups = [
+        row
+        for query, rows in driver.queries
+        if query == GROUP_NODE_UNWIND_QUERY
+        for row in rows
+    ]
+    written_datasets = [
+        row
+        for query, rows in driver.queries
+        if query == DATASET_UNWIND_QUERY
+        for row in rows
+    ]
+    assert written_groups == group_registry
+    assert sorted(i["hdf5_path"] for i in written_datasets) == sorted(
+        i["hdf5_path"] for i in dataset_registry
+    )
+
+    # groups are linked and datasets attached only after their parent is created
+    created = {str(h5_file)}
+    for query, rows in driver.queries[1:]:
+        if query == GROUP_NODE_UNWIND_QUERY:
+            created.update(row["hdf5_path"] for row in rows)
+        else:
+            assert query in (GROUP_LINK_UNWIND_QUERY, DATASET_UNWIND_QUERY)
+            assert all(row["parent"] in created for row in rows)
+
+
+def test_create_schema_async_replaces_legacy_index():
+    """A legacy index is dropped before the schema is created."""
+    driver = FakeAsyncDriver({LEGACY_INDEX_QUERY: [{"name": "dataset_name_value"}]})
+    asyncio.run(create_schema_async(driver, wait=False))
+    queries = [query for query, rows in driver.queries]
+    assert queries.index(DROP_LEGACY_INDEX_QUERY) < queries.index(SCHEMA_QUERIES[0])
+    assert queries[-len(SCHEMA_QUERIES) :] == SCHEMA_QUERIES
+
+    driver = FakeAsyncDriver(
+        {DUPLICATES_QUERY: [{"name": "dt", "value": 0.5, "nodes": 2}]}
+    )
+    with pytest.raises(ValueError, match="'dt'=0.5 \\(2 nodes\\)"):
+        asyncio.run(create_schema_async(driver, wait=False))
+    assert [query for query, rows in driver.queries] == [
+        CONSTRAINT_QUERY,
+        DUPLICATES_QUERY,
+    ]
@@ -0,0 +1,67 @@
+"""Tests of the conversion and filtering of HDF5 attributes."""
+
+import h5py
+import numpy as np
+import pytest
+
+from hdf5_graph.attrs import AttrPolicy, convert_attr
+from hdf5_graph.single_hdf5 import read_hdf5_registries
+
+
+def test_convert_attr():
+    """Numpy attributes are converted to Cypher types."""
+    assert convert_attr(np.float32(0.5)) == 0.5
+    assert type(convert_attr(np.int64(3))) is int
+    assert convert_attr(b"bytes") == "bytes"
+    assert convert_attr(np.array([1, 2, 3], dtype=np.uint8)) == [1, 2, 3]
+    assert convert_attr(np.array([b"a", b"b"])) == ["a", "b"]
+    assert convert_attr(np.ones((2, 2))) is None
+    assert convert_attr(np.array([1j])) is None
+    assert convert_attr(np.array(2.5)) == 2.5
+
+
+@pytest.fixture
+def attr_file(tmp_path):
+    """Create a file with attributes of a group and a dataset."""
+    filepath = tmp_path / "attrs.h5"
+    with h5py.File(filepath, "w") as hdf:
+        group = hdf.create_group("g")
+        group.attrs["unit"] = b"mm"
+        group.attrs["scale"] = np.float64(2.0)
+        group.attrs["table"] = np.arange(1000.0)
+        group.attrs["_internal"] = 1
+        group.create_dataset("d", data=1.0).attrs["calibration"] = np.arange(3)
+    return filepath
+
+
+def test_attr_policy_read(attr_file):
+    """Attributes are filtered by name and size."""
+    policy = AttrPolicy(exclude=["_*"], max_bytes=100)
+    with h5py.File(attr_file, "r") as hdf:
+        assert policy.read(hdf["g"]) == {
+            "unit": "mm",
+            "scale": 2.0,
+            "table_shape": [1000],
+            "table_dtype": "<f8",
+        }
+        assert AttrPolicy(include=["s*"]).read(hdf["g"]) == {"scale": 2.0}
+        assert "table_shape" not in AttrPolicy(max_bytes=100, oversized="drop").read(
+            hdf["g"]
+        )
+
+    with pytest.raises(ValueError):
+        AttrPolicy(oversized="keep")
+
+
+def test_attr_policy_in_registries(attr_file):
+    """The attribute policy is applied when reading the registries."""
+    group_registry, dataset_registry = read_hdf5_registries(
+        attr_file, attr_policy=AttrPolicy(include=["unit", "calibration"])
+    )
+    assert group_registry[0]["attrs"] == {"unit": "mm"}
+    assert dataset_registry[0]["attrs"] == {"calibration": [0, 1, 2]}
+    # without transfer_attrs no attrs are read at all
+    group_registry, _ = read_hdf5_registries(
+        attr_file, transfer_attrs=False, attr_policy=AttrPolicy()
+    )
+    assert group_registry[0]["attrs"] == {}
@@ -0,0 +1,76 @@
+"""Tests of the checkpoint journal of directory ingestions."""
+
+from types import SimpleNamespace
+
+from hdf5_graph.checkpoint import Checkpoint
+from hdf5_graph.handle_structure import put_dir_in_neo4j
+from hdf5_graph.synthetic import generate_dir
+
+
+class Result(list):
+    """Records of a query, with an empty summary."""
+
+    def consume(self):
+        """Return a summary without deleted nodes."""
+        return SimpleNamespace(counters=SimpleNamespace(nodes_deleted=0))
+
+    def single(self):
+        """Return no single record."""
+        return None
+
+
+class RecordingSession:
+    """Stand-in for a neo4j.Session, recording the queries."""
+
+    def __init__(self):
+        """Create a session, which did not run a query yet."""
+        self.queries = []
+
+    def run(self, query, **params):
+        """Record the query and return an empty result."""
+        self.queries.append((query, params))
+        return Result()
+
+
+def test_checkpoint_journal(tmp_path):
+    """On resume completed files are skipped and unfinished ones removed."""
+    session = RecordingSession()
+    checkpoint = Checkpoint(tmp_path / "journal.jsonl")
+    assert checkpoint.begin(session, tmp_path / "a.h5")
+    checkpoint.finish(tmp_path / "a.h5")
+    assert checkpoint.begin(session, tmp_path / "b.h5")
+    assert session.queries == []
+
+    # a new run with the journal skips the completed file and removes the unfinished one
+    resumed = Checkpoint(tmp_path / "journal.jsonl", resume=True)
+    assert resumed.unfinished() == {str(tmp_path / "b.h5")}
+    assert not resumed.begin(session, tmp_path / "a.h5")
+    assert resumed.begin(session, tmp_path / "b.h5")
+    assert session.queries and all(
+        params["filepath"] == str(tmp_path / "b.h5") for _, params in session.queries
+    )
+    # the removal adopts the nodes of earlier versions first, then deletes in batches
+    assert all(
+        "IN TRANSACTIONS OF 10000 ROWS" in query for query, _ in session.queries[1:-1]
+    )
+
+    # without resume the journal starts anew
+    assert Checkpoint(tmp_path / "journal.jsonl").unfinished() == set()
+
+
+def test_put_dir_resume(tmp_path):
+    """A resumed directory ingestion skips the finished files."""
+    generate_dir(tmp_path / "data", files=3, levels=1, groups=2, datasets_per_group=1)
+    files = sorted(str(i) for i in (tmp_path / "data").rglob("*.h5"))
+    checkpoint = Checkpoint(tmp_path / "journal.jsonl")
+    checkpoint.begin(RecordingSession(), files[0])
+    checkpoint.finish(files[0])
+
+    session = RecordingSession()
+    put_dir_in_neo4j(
+        tmp_path / "data",
+        session,
+        checkpoint=Checkpoint(tmp_path / "journal.jsonl", resume=True),
+    )
+    written = {params["path"] for _, params in session.queries if "path" in params}
+    assert written == set(files[1:])
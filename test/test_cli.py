@@ -79,3 +79,14 @@ def test_cli_handle_structure(session):
                 """)
 
     assert query_result.single()[0] == 296, "The number of nodes is not as expected!"
+
+
+def test_cli_async_rejects_ignored_options():
+    """Options the asynchronous ingestion ignores are rejected."""
+    result = subprocess.run(
+        ["python", command, "file", "data/CompleteData.h5", "--async", "--stream"],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 2
+    assert "not supported together with it" in result.stderr
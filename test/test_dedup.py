@@ -0,0 +1,68 @@
+"""Tests of the cache of merged datasets."""
+
+import numpy as np
+
+from hdf5_graph.dedup import DatasetCache
+
+
+class FakeSession:
+    """Stand-in for a neo4j.Session, answering the id lookup of the cache."""
+
+    def __init__(self):
+        """Create a session, which did not run a query yet."""
+        self.queries = 0
+
+    def run(self, query, rows=None, **params):
+        """Count the query and return a node id per row."""
+        self.queries += 1
+        return [
+            {"i": i, "node_id": f"id-{row['obj_name']}"} for i, row in enumerate(rows)
+        ]
+
+
+def entry(name, value):
+    """Build a dataset entry of the registry."""
+    return {
+        "obj_name": name,
+        "value": value,
+        "hdf5_path": f"/{name}",
+        "parent": "/",
+        "attrs": {},
+        "array_props": {},
+    }
+
+
+def test_dataset_cache_lru():
+    """The least recently used datasets are evicted."""
+    cache = DatasetCache(max_size=2)
+    cache.put("ca", 0.3, "a")
+    cache.put("cb", 0.4, "b")
+    # numpy and python scalars are the same value
+    assert cache.get("ca", np.float64(0.3)) == "a"
+    cache.put("dt", 0.1, "c")  # evicts cb, which was used least recently
+    assert cache.get("cb", 0.4) is None
+    assert cache.get("dt", 0.1) == "c"
+    assert cache.report() == {"size": 2, "hits": 2, "misses": 1, "hit_rate": 2 / 3}
+
+
+def test_dataset_cache_split_and_fill():
+    """Cached datasets are split off and the others are filled."""
+    cache = DatasetCache()
+    session = FakeSession()
+    datasets = [
+        entry("ca", 0.3),
+        entry("ca", 0.3),
+        entry("list", [1, 2]),
+        entry("array", None),
+    ]
+
+    cached, other = cache.split(datasets)
+    assert cached == [] and other == datasets
+    cache.fill(session, other)
+    assert session.queries == 1
+    # duplicate values are looked up once, datasets without value not at all
+    assert len(cache) == 2
+
+    cached, other = cache.split(datasets)
+    assert [i["node_id"] for i in cached] == ["id-ca", "id-ca", "id-list"]
+    assert other == [entry("array", None)]
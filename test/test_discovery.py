@@ -0,0 +1,98 @@
+"""Tests of the discovery and linking of h5-files."""
+
+from concurrent.futures import ProcessPoolExecutor
+
+from hdf5_graph.handle_structure import iter_h5_files, link_dependencies
+from hdf5_graph.single_hdf5 import LINK_QUERY, iter_hdf5_records, read_hdf5_registries
+
+
+def test_iter_h5_files(tmp_path):
+    """Only h5-files are found, with the files they depend on."""
+    (tmp_path / "sim1" / "sub").mkdir(parents=True)
+    (tmp_path / "sim2").mkdir()
+    for i in ["top.h5", "sim1/a.h5", "sim1/sub/b.h5", "sim2/c.h5", "sim2/notes.txt"]:
+        (tmp_path / i).touch()
+
+    files = {
+        i.relative_to(tmp_path).as_posix(): sorted(j.name for j in deps)
+        for i, deps in iter_h5_files(tmp_path)
+    }
+    assert files == {
+        "top.h5": [],
+        "sim1/a.h5": ["top.h5"],
+        "sim1/sub/b.h5": ["a.h5"],
+        "sim2/c.h5": ["top.h5"],
+    }
+
+
+def test_read_hdf5_registries_in_process_pool(h5_file):
+    """The registries can be read in another process."""
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        group_registry, dataset_registry = pool.submit(
+            read_hdf5_registries, h5_file
+        ).result()
+
+    records = list(iter_hdf5_records(h5_file))
+    assert group_registry == [r for kind, r in records if kind == "group"]
+    assert [r["hdf5_path"] for r in dataset_registry] == [
+        r["hdf5_path"] for kind, r in records if kind == "dataset"
+    ]
+
+
+def test_iter_h5_files_suffixes_and_order(tmp_path):
+    """Files are found by suffix, hidden ones too, in a stable order."""
+    (tmp_path / "b" / "sub").mkdir(parents=True)
+    (tmp_path / "a").mkdir()
+    for i in [
+        "z.h5",
+        "y.nxs",
+        ".hidden.h5",
+        "a/x.hdf5",
+        "b/w.h5",
+        "b/sub/v.nxs",
+        "b/notes.txt",
+    ]:
+        (tmp_path / i).touch()
+
+    files = [
+        (i.relative_to(tmp_path).as_posix(), [j.name for j in deps])
+        for i, deps in iter_h5_files(tmp_path, suffixes=(".h5", ".hdf5", ".nxs"))
+    ]
+    # hidden files are ingested like all others, as with the glob of earlier versions
+    top = [".hidden.h5", "y.nxs", "z.h5"]
+    assert files == [
+        (".hidden.h5", []),
+        ("y.nxs", []),
+        ("z.h5", []),
+        ("a/x.hdf5", top),
+        ("b/w.h5", top),
+        ("b/sub/v.nxs", ["w.h5"]),
+    ]
+    assert [i.name for i, _ in iter_h5_files(tmp_path)] == [
+        ".hidden.h5",
+        "z.h5",
+        "w.h5",
+    ]
+
+
+def test_link_dependencies_batched(tmp_path):
+    """Dependencies are linked in batches."""
+
+    class Session:
+        def __init__(self):
+            self.runs = []
+
+        def run(self, query, **params):
+            self.runs.append((query, params))
+            return self
+
+        def consume(self):
+            pass
+
+    dependencies = [
+        (tmp_path / f"{i}.h5", [tmp_path / "top.h5"]) for i in range(25)
+    ] + [(tmp_path / "top.h5", [])]
+    session = Session()
+    link_dependencies(session, dependencies, batch_size=10)
+    assert [len(params["rows"]) for _, params in session.runs] == [10, 10, 5]
+    assert all(query == LINK_QUERY for query, _ in session.runs)
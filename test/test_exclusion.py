@@ -0,0 +1,39 @@
+"""Tests of the exclusion rules of groups, datasets and paths."""
+
+from hdf5_graph.exclusion import PathFilter
+from hdf5_graph.single_hdf5 import read_hdf5_registries
+
+
+def test_path_filter_rules():
+    """Names, globs, regular expressions and paths are excluded."""
+    path_filter = PathFilter(
+        exclude_datasets=["dt", "Curve_*", "re:x[0-9]+"],
+        exclude_groups=["Spline", "re:tmp.*"],
+        exclude_paths=["BF_curves/Curve_1", "/*/raw/*"],
+    )
+    assert path_filter.excludes_dataset("/Experiment/dt")
+    assert path_filter.excludes_dataset("/a/Curve_3")
+    assert path_filter.excludes_dataset("/a/x12")
+    assert not path_filter.excludes_dataset("/a/x12y")
+    assert not path_filter.excludes_dataset("/a/name")
+    # substrings, as before
+    assert path_filter.excludes_dataset("/Experiment/BF_curves/Curve_10/datapoints")
+    assert path_filter.excludes_dataset("/Experiment/raw/data")
+    assert not path_filter.excludes_dataset("/Experiment/b/raw/data")
+    assert path_filter.excludes_group("/Experiment/Spline")
+    assert path_filter.excludes_group("/Experiment/tmp_3")
+    assert not path_filter.excludes_group("/Spline")  # groups below the root are kept
+    assert not PathFilter().excludes_group("/a/b")
+
+
+def test_read_registries_with_patterns(h5_file):
+    """Excluded objects are not read into the registries."""
+    groups, datasets = read_hdf5_registries(
+        h5_file, exclude_datasets=["d*"], exclude_groups=["re:Spl.*"]
+    )
+    assert {i["hdf5_path"] for i in groups} == {
+        "/Experiment",
+        "/Experiment/BF_curves",
+        "/Experiment/BF_curves/Curve_0",
+    }
+    assert {i["obj_name"] for i in datasets} == {"name", "ca"}
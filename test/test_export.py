@@ -0,0 +1,81 @@
+"""Tests of the export to CSV files of neo4j-admin import."""
+
+import csv
+import shutil
+
+import numpy as np
+
+from hdf5_graph.export import (
+    ARRAY_DELIMITER,
+    csv_property,
+    export_dir_to_csv,
+    export_hdf5_to_csv,
+)
+
+
+def read_rows(paths):
+    """Read the rows of CSV files."""
+    rows = []
+    for path in paths:
+        with open(path, newline="", encoding="utf-8") as file:
+            reader = csv.DictReader(file)
+            rows.extend(reader)
+    return rows
+
+
+def test_csv_property():
+    """Values are converted to typed CSV properties."""
+    assert csv_property(np.float64(0.3)) == ("double", "0.3")
+    assert csv_property(np.int32(3)) == ("long", "3")
+    assert csv_property(True) == ("boolean", "true")
+    assert csv_property(np.array([1, 2.5])) == (
+        "double[]",
+        ARRAY_DELIMITER.join(["1.0", "2.5"]),
+    )
+    assert csv_property(b"text") == ("string", "text")
+    assert csv_property(np.ones((2, 2))) is None
+
+
+def test_export_hdf5_to_csv(h5_file, tmp_path):
+    """A file is exported to node and relationship files."""
+    out_dir = tmp_path / "import"
+    args = export_hdf5_to_csv(h5_file, out_dir)
+
+    nodes = read_rows(out_dir.glob("*_nodes_*.csv"))
+    labels = [i[":LABEL"] for i in nodes]
+    assert labels.count("File") == 1
+    assert labels.count("Group") == 4
+    assert labels.count("Dataset") == 5
+    holds = read_rows([out_dir / "holds.csv"])
+    assert len(holds) == 9
+    # every relationship connects written nodes
+    ids = {i[":ID"] for i in nodes}
+    assert all(i[":START_ID"] in ids and i[":END_ID"] in ids for i in holds)
+    # the id is no property of the imported nodes
+    assert not any(key.split(":")[0] == "id" for i in nodes for key in i)
+    assert f"--relationships={out_dir / 'holds.csv'}" in args
+
+
+def test_export_dir_to_csv_deduplicates(h5_file, tmp_path):
+    """Datasets merged by name and value are exported once."""
+    data = tmp_path / "data"
+    (data / "sim").mkdir(parents=True)
+    shutil.copy(h5_file, data / "first.h5")
+    shutil.copy(h5_file, data / "sim" / "second.h5")
+    out_dir = tmp_path / "import"
+    export_dir_to_csv(data, out_dir, array_policy=None)
+
+    nodes = read_rows(out_dir.glob("*_nodes_*.csv"))
+    datasets = [i for i in nodes if i[":LABEL"] == "Dataset"]
+    # dt, name and ca are shared, the arrays without value exist per file
+    assert len(datasets) == 3 + 2 * 2
+    assert len({i[":ID"] for i in nodes}) == len(nodes)
+    assert len(read_rows([out_dir / "holds.csv"])) == 2 * 9
+    depends_on = read_rows([out_dir / "depends_on.csv"])
+    assert len(depends_on) == 1
+
+    # ids are stable between exports
+    export_dir_to_csv(data, tmp_path / "again")
+    assert sorted(
+        i[":ID"] for i in read_rows((tmp_path / "again").glob("*_nodes_*.csv"))
+    ) == sorted(i[":ID"] for i in nodes)
@@ -0,0 +1,34 @@
+"""Tests of the adaptive batch size."""
+
+from hdf5_graph.helpers import AdaptiveBatchSize, record_batches
+
+
+def test_adaptive_batch_size_converges():
+    """The batch size converges to the target latency."""
+    batch_size = AdaptiveBatchSize(initial=100, target_latency=1.0, factor=2.0)
+    # the server commits 1000 rows per second
+    for _ in range(10):
+        batch_size.record(int(batch_size), int(batch_size) / 1000)
+    assert int(batch_size) == 1000
+    assert batch_size.report()["batches"] == 10
+
+
+def test_adaptive_batch_size_limits():
+    """The batch size stays within its limits."""
+    batch_size = AdaptiveBatchSize(initial=100, min_size=10, max_size=150)
+    batch_size.record(100, 0.001)
+    assert int(batch_size) == 150
+    for _ in range(10):
+        batch_size.back_off()
+    assert int(batch_size) == 10
+    assert batch_size.report()["backoffs"] == 10
+
+
+def test_record_batches():
+    """Failed batches shrink the batch size."""
+    batch_size = AdaptiveBatchSize(initial=100)
+    record_batches(batch_size, 400, 4, 2.0, failed=False)
+    assert int(batch_size) == 200
+    record_batches(batch_size, 400, 4, 2.0, failed=True)
+    assert int(batch_size) == 100
+    record_batches(100, 400, 4, 2.0, failed=True)  # fixed batch sizes are ignored
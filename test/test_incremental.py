@@ -0,0 +1,122 @@
+"""Tests of the incremental update of changed files."""
+
+import os
+
+import h5py
+import numpy as np
+
+from hdf5_graph.incremental import (
+    _plain,
+    diff_registries,
+    file_fingerprint,
+    write_hdf5_diff,
+)
+from hdf5_graph.memory_graph import MemoryGraph
+from hdf5_graph.single_hdf5 import put_hdf5_in_neo4j, read_hdf5_registries
+
+
+def _stored_tree(h5_file):
+    """Build the tree as the database returns it after a full ingestion."""
+    group_registry, dataset_registry = read_hdf5_registries(h5_file)
+    stored_groups = {
+        r["hdf5_path"]: {
+            "name": r["obj_name"],
+            "hdf5_path": r["hdf5_path"],
+            "filepath": str(h5_file),
+            **_plain(r["attrs"]),
+        }
+        for r in group_registry
+    }
+    stored_datasets = {}
+    for r in dataset_registry:
+        props = {
+            "name": r["obj_name"],
+            "hdf5_path": r["hdf5_path"],
+            **_plain(r["attrs"]),
+        }
+        if r["value"] is None:
+            props["filepath"] = str(h5_file)
+        else:
+            props["value"] = _plain(r["value"])
+        stored_datasets[r["hdf5_path"]] = props
+    return stored_groups, stored_datasets
+
+
+def test_diff_unchanged(h5_file):
+    """An unchanged file has an empty diff."""
+    stored_groups, stored_datasets = _stored_tree(h5_file)
+    diff = diff_registries(
+        h5_file, stored_groups, stored_datasets, *read_hdf5_registries(h5_file)
+    )
+    assert all(not v for v in diff.values())
+
+
+def test_diff_changed(h5_file):
+    """Removed, added and changed objects are in the diff."""
+    stored_groups, stored_datasets = _stored_tree(h5_file)
+    with h5py.File(h5_file, "a") as hdf:
+        del hdf["Experiment/BF_curves/Curve_0/Spline"]
+        hdf["Experiment/dt"][()] = 0.0005
+        hdf["Experiment"].attrs["Date"] = "2024/07/02"
+        hdf.create_group("Experiment/BF_curves/Curve_1")
+
+    diff = diff_registries(
+        h5_file, stored_groups, stored_datasets, *read_hdf5_registries(h5_file)
+    )
+    assert diff["remove_groups"] == ["/Experiment/BF_curves/Curve_0/Spline"]
+    assert [r["hdf5_path"] for r in diff["add_groups"]] == [
+        "/Experiment/BF_curves/Curve_1"
+    ]
+    assert [r["hdf5_path"] for r in diff["update_groups"]] == ["/Experiment"]
+    assert [r["hdf5_path"] for r in diff["add_datasets"]] == ["/Experiment/dt"]
+    assert {(r["obj_name"], r["value"]) for r in diff["remove_datasets"]} == {
+        ("dt", 0.00025),
+        ("C", None),
+    }
+
+
+def _tree(graph):
+    return sorted(
+        repr(sorted(_plain(props).items()))
+        for label in ("Group", "Dataset")
+        for props in graph.nodes(label)
+    )
+
+
+def test_write_hdf5_diff_in_memory(h5_file):
+    """Writing the diff gives the graph of the changed file."""
+    graph = MemoryGraph()
+    put_hdf5_in_neo4j(h5_file, graph)
+    with h5py.File(h5_file, "a") as hdf:
+        del hdf["Experiment/BF_curves/Curve_0/Spline"]
+        hdf["Experiment/dt"][()] = 0.0005
+        hdf["Experiment"].attrs["Date"] = "2024/07/02"
+        hdf.create_group("Experiment/BF_curves/Curve_1")
+        hdf["Experiment/offset"] = np.nan
+
+    counts = write_hdf5_diff(h5_file, graph, *read_hdf5_registries(h5_file))
+    assert (
+        counts["remove_groups"] == 1
+        and counts["add_groups"] == 1
+        and counts["update_groups"] == 1
+    )
+    fresh = MemoryGraph()
+    put_hdf5_in_neo4j(h5_file, fresh)
+    assert graph.report() == fresh.report()
+    assert _tree(graph) == _tree(fresh)
+    # the stored NaN equals the one in the file, so a second diff finds nothing
+    assert not any(
+        write_hdf5_diff(h5_file, graph, *read_hdf5_registries(h5_file)).values()
+    )
+
+
+def test_file_fingerprint(h5_file):
+    """Touching a file changes its mtime, but not its content hash."""
+    fingerprint = file_fingerprint(h5_file, hash_content=True)
+    assert fingerprint["size"] == h5_file.stat().st_size
+    assert len(fingerprint["content_hash"]) == 64
+
+    os.utime(h5_file, ns=(0, 0))
+    touched = file_fingerprint(h5_file, hash_content=True)
+    assert touched["mtime"] == 0
+    assert touched["content_hash"] == fingerprint["content_hash"]
@@ -2,7 +2,10 @@ import pytest
 from pathlib import Path
 
 from hdf5_graph.handle_structure import put_dir_in_neo4j
-from hdf5_graph.single_hdf5 import put_hdf5_in_neo4j
+from hdf5_graph.incremental import update_hdf5_in_neo4j
+from hdf5_graph.remove import remove_file
+from hdf5_graph.schema import create_schema
+from hdf5_graph.single_hdf5 import PARENT_LOOKUP, put_hdf5_in_neo4j
 
 
 def test_create_database(session):
@@ -35,3 +38,102 @@ def test_handle_structure(session):
                 """)
 
     assert result.single()[0] == 296, "The number of nodes is not as expected!"
+
+
+def test_remove_file_keeps_datasets_of_legacy_holders(session, h5_file):
+    """Datasets held by legacy groups are kept."""
+    put_hdf5_in_neo4j(h5_file, session)
+    # a group written by an earlier version has no filepath,
+    # but still holds the shared dataset
+    session.run("""
+                MATCH (d:Dataset {name: 'dt'})
+                CREATE (:Group {name: 'Legacy', hdf5_path: '/Legacy'})-[:holds]->(d)
+                """).consume()
+
+    removed = remove_file(session, h5_file)
+
+    assert removed["files"] == 1
+    assert (
+        session.run("MATCH (d:Dataset {name: 'dt'}) RETURN count(d)").single()[0] == 1
+    )
+    assert (
+        session.run(
+            "MATCH (n) WHERE n.filepath = $filepath RETURN count(n)",
+            filepath=str(h5_file),
+        ).single()[0]
+        == 0
+    )
+
+
+def test_remove_file_of_legacy_graph(session, h5_file):
+    """Remove a file, whose groups and datasets were written without filepath."""
+    put_hdf5_in_neo4j(h5_file, session)
+    session.run("MATCH (n) WHERE n:Group OR n:Dataset REMOVE n.filepath").consume()
+
+    removed = remove_file(session, h5_file)
+
+    assert removed["files"] == 1 and removed["groups"] == 4
+    # nothing of the file is left orphaned
+    assert session.run("MATCH (n) RETURN count(n)").single()[0] == 0
+
+
+def test_update_adopts_legacy_nodes(session, h5_file):
+    """Updating a legacy graph adopts its nodes."""
+    put_hdf5_in_neo4j(h5_file, session)
+    # strip what earlier versions did not write, the groups and unmerged datasets have
+    # no filepath and the File node no fingerprint
+    session.run("MATCH (n) WHERE n:Group OR n:Dataset REMOVE n.filepath").consume()
+    session.run("MATCH (f:File) REMOVE f.size, f.mtime").consume()
+
+    assert update_hdf5_in_neo4j(h5_file, session) == "changed"
+
+    assert session.run("MATCH (g:Group) RETURN count(g)").single()[0] == 4
+    assert session.run("MATCH (d:Dataset) RETURN count(d)").single()[0] == 5
+    assert (
+        session.run(
+            "MATCH (n:Group) WHERE n.filepath = $filepath RETURN count(n)",
+            filepath=str(h5_file),
+        ).single()[0]
+        == 4
+    )
+
+
+def test_create_schema_is_idempotent(session):
+    """The schema can be created twice."""
+    create_schema(session)
+    create_schema(session)
+
+    names = {record["name"] for record in session.run("SHOW INDEXES YIELD name")}
+    assert {
+        "file_filepath",
+        "group_filepath_hdf5_path",
+        "dataset_filepath_hdf5_path",
+        "dataset_name_value",
+    } <= names
+
+
+def test_parent_lookup_finds_file_and_group_parents(session):
+    """Parents are found among File and Group nodes."""
+    session.run(
+        """
+                CREATE (:File {filepath: $filepath}),
+                    (:Group {filepath: $filepath, hdf5_path: '/Experiment'})
+                """,
+        filepath="small.h5",
+    ).consume()
+
+    result = session.run(
+        f"UNWIND $rows AS entry {PARENT_LOOKUP} RETURN "
+        "labels(p) AS labels, entry.parent AS parent",
+        rows=[
+            {"parent": "small.h5"},
+            {"parent": "/Experiment"},
+            {"parent": "/Missing"},
+        ],
+        filepath="small.h5",
+    )
+
+    assert sorted((record["labels"], record["parent"]) for record in result) == [
+        (["File"], "small.h5"),
+        (["Group"], "/Experiment"),
+    ]
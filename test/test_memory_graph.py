@@ -0,0 +1,125 @@
+"""Tests of the in-memory graph writer."""
+
+import shutil
+
+import numpy as np
+import pytest
+
+from hdf5_graph.graph_writer import GraphWriter
+from hdf5_graph.handle_structure import iter_h5_files, put_dir_in_neo4j
+from hdf5_graph.memory_graph import MemoryGraph
+from hdf5_graph.scan import estimate, scan_files
+from hdf5_graph.single_hdf5 import put_hdf5_in_neo4j
+from hdf5_graph.synthetic import generate_dir
+
+
+def test_put_hdf5_in_memory(h5_file):
+    """A file is written into the memory graph."""
+    graph = MemoryGraph()
+    put_hdf5_in_neo4j(h5_file, graph)
+    assert graph.report() == {
+        "nodes": {"File": 1, "Group": 4, "Dataset": 5},
+        "relationships": {"holds": 9, "depends_on": 0},
+    }
+    assert {i["hdf5_path"] for i in graph.nodes("Group")} == {
+        "/Experiment",
+        "/Experiment/BF_curves",
+        "/Experiment/BF_curves/Curve_0",
+        "/Experiment/BF_curves/Curve_0/Spline",
+    }
+    datasets = {i["name"]: i for i in graph.nodes("Dataset")}
+    assert datasets["dt"]["value"] == 0.00025
+    assert "value" not in datasets["C"] and datasets["C"]["filepath"] == str(h5_file)
+    assert graph.nodes("Group")[0]["Date"] == "2024/07/01 16:42:42"
+    # every node but the File node is held exactly once
+    assert sorted(graph.relationships("holds")[:, 1].tolist()) == list(
+        range(1, len(graph))
+    )
+
+
+def test_put_hdf5_in_memory_stream(h5_file):
+    """Streaming the records gives the same graph."""
+    gathered, streamed = MemoryGraph(), MemoryGraph()
+    put_hdf5_in_neo4j(h5_file, gathered, transfer_attrs=False)
+    put_hdf5_in_neo4j(
+        h5_file, streamed, transfer_attrs=False, stream=True, batch_size=2
+    )
+    assert streamed.report() == gathered.report()
+    assert sorted(map(sorted, map(dict.items, streamed.properties)), key=str) == sorted(
+        map(sorted, map(dict.items, gathered.properties)), key=str
+    )
+
+
+def test_put_dir_in_memory_matches_scan(tmp_path):
+    """The graph of a directory matches its scan."""
+    generate_dir(
+        tmp_path, files=4, levels=2, groups=5, datasets_per_group=4, cardinality=3
+    )
+    graph = MemoryGraph()
+    put_dir_in_neo4j(tmp_path, graph, readers=2)
+    result = estimate(scan_files(iter_h5_files(tmp_path)))
+    assert graph.report() == {
+        "nodes": result["nodes"],
+        "relationships": result["relationships"],
+    }
+    serial = MemoryGraph()
+    put_dir_in_neo4j(tmp_path, serial)
+    assert serial.report() == graph.report()
+    depends_on = graph.relationships("depends_on")
+    assert np.all(np.array(graph.labels)[depends_on] == 0)  # only between File nodes
+
+
+def test_remove_shared_datasets(h5_file):
+    """Check that a merged dataset is only removed with the last file holding it."""
+    other = h5_file.with_name("other.h5")
+    shutil.copy(h5_file, other)
+    graph = MemoryGraph()
+    for i in (h5_file, other):
+        put_hdf5_in_neo4j(i, graph)
+    assert graph.report()["nodes"]["Dataset"] == 7  # dt, name and ca are shared
+
+    dt = {"parent": "/Experiment", "obj_name": "dt", "value": 0.00025}
+    datapoints = {
+        "parent": "/Experiment/BF_curves/Curve_0",
+        "obj_name": "datapoints",
+        "value": None,
+    }
+    graph.remove_datasets(h5_file, [dt, datapoints])
+    assert graph.report() == {
+        "nodes": {"File": 2, "Group": 8, "Dataset": 6},
+        "relationships": {"holds": 16, "depends_on": 0},
+    }
+    # dt is still held by the other file
+    assert [i["name"] for i in graph.nodes("Dataset")].count("datapoints") == 1
+    assert "dt" in {i["name"] for i in graph.nodes("Dataset")}
+
+    graph.remove_datasets(other, [dt])
+    assert "dt" not in {i["name"] for i in graph.nodes("Dataset")}
+    _, stored = graph.stored_tree(h5_file)
+    assert sorted(stored) == [
+        "/Experiment/BF_curves/Curve_0/Spline/C",
+        "/Experiment/name",
+        "/ca",
+    ]
+
+    # the relationships of a removed group are removed with it
+    graph.remove_groups(other, ["/Experiment"])
+    assert graph.count_relationships("holds") == 12
+
+
+def test_memory_graph_empty():
+    """An empty graph has no nodes and relationships."""
+    graph = MemoryGraph()
+    assert graph.count_nodes("File") == 0
+    assert graph.relationships("holds").shape == (0, 2)
+
+
+def test_incomplete_writer_cannot_be_instantiated():
+    """A writer must implement every abstract method."""
+
+    class FilesOnly(GraphWriter):
+        def create_file(self, hdf5_filepath):
+            pass
+
+    with pytest.raises(TypeError):
+        FilesOnly()
@@ -0,0 +1,59 @@
+"""Tests of the ingestion metrics."""
+
+from hdf5_graph.metrics import IngestMetrics, log_write_summary, timed_phase
+from hdf5_graph.single_hdf5 import iter_hdf5_records, read_hdf5_registries
+from hdf5_graph.writers import new_summary
+
+
+def test_traversal_metrics(h5_file):
+    """The traversal phases and counts are recorded."""
+    events = []
+    with IngestMetrics(callback=lambda *event: events.append(event)) as metrics:
+        group_registry, dataset_registry = read_hdf5_registries(h5_file)
+    phases = [fields["phase"] for event, filepath, fields in events if event == "phase"]
+    assert phases == ["traversal", "conversion"]
+    assert all(filepath == str(h5_file) for _, filepath, _ in events)
+    report = metrics.report()
+    assert report["files"] == 1
+    assert report["objects"] == len(group_registry) + len(dataset_registry)
+    assert report["bytes_read"] > 0
+
+
+def test_stream_metrics(h5_file):
+    """Streamed records are counted."""
+    with IngestMetrics() as metrics:
+        records = list(iter_hdf5_records(h5_file, max_pending=1))
+    assert metrics.files[str(h5_file)]["objects"] == len(records)
+
+
+def test_write_metrics(tmp_path, h5_file):
+    """Write summaries are summed up per file and exported."""
+    summary = new_summary(total=10)
+    summary.update(
+        batches=2, committedOperations=8, failedOperations=2, retries=3, deadlocks=1
+    )
+    with (
+        IngestMetrics(prometheus_path=tmp_path / "ingest.prom") as metrics,
+        timed_phase(h5_file, "dataset_write"),
+    ):
+        log_write_summary(h5_file, "Dataset Query", summary)
+        log_write_summary(h5_file, "Dataset Query", summary)
+    file_metrics = metrics.files[str(h5_file)]
+    assert file_metrics["batches"] == 4
+    assert file_metrics["retries"] == 6
+    assert file_metrics["failed_operations"] == 4
+    assert file_metrics["deadlocks"] == 2
+    assert file_metrics["dataset_write"] > 0
+    assert "small.h5" in metrics.profile()
+    prom = (tmp_path / "ingest.prom").read_text()
+    assert f'hdf5_graph_retries_total{{file="{h5_file}"}} 6' in prom
+    assert f'hdf5_graph_phase_seconds{{file="{h5_file}",phase="dataset_write"}}' in prom
+
+
+def test_metrics_detached(h5_file):
+    """Nothing is recorded after the metrics are left."""
+    metrics = IngestMetrics()
+    with metrics:
+        pass
+    read_hdf5_registries(h5_file)
+    assert metrics.files == {}
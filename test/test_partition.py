@@ -0,0 +1,76 @@
+"""Tests of the partition of rows into independent batches."""
+
+from hdf5_graph.partition import (
+    dataset_lock_keys,
+    group_levels,
+    group_lock_keys,
+    partition_rows,
+)
+
+
+def entry(parent, name, value):
+    """Build a dataset entry of the registry."""
+    return {"parent": parent, "obj_name": name, "value": value}
+
+
+def locked_nodes(batch):
+    """Get the nodes locked by the rows of a batch."""
+    return {key for row in batch for key in dataset_lock_keys(row)}
+
+
+def test_partition_rows_disjoint():
+    """Batches of rows without shared nodes are independent."""
+    rows = [entry(f"/g{i}", "dt", 0.1 * (i % 3)) for i in range(12)] + [
+        entry(f"/h{i}", "C", None) for i in range(5)
+    ]
+    independent, serial = partition_rows(rows, 5, dataset_lock_keys)
+    assert serial == []
+    assert sorted(map(id, (row for batch in independent for row in batch))) == sorted(
+        map(id, rows)
+    )
+    assert all(len(batch) <= 5 for batch in independent)
+    # no node is locked by two batches
+    for i, batch in enumerate(independent):
+        for other in independent[i + 1 :]:
+            assert not locked_nodes(batch) & locked_nodes(other)
+
+
+def test_partition_rows_serial():
+    # all rows merge the same dataset, so they can not be written concurrently
+    """Rows merging the same dataset are written serially."""
+    rows = [entry(f"/g{i}", "dt", 0.1) for i in range(7)] + [entry("/other", "ca", 0.3)]
+    independent, serial = partition_rows(rows, 3, dataset_lock_keys)
+    assert independent == [[rows[-1]]]
+    assert [len(batch) for batch in serial] == [3, 3, 1]
+
+
+def group(hdf5_path, parent):
+    """Build a group entry of the registry."""
+    return {"hdf5_path": hdf5_path, "parent": parent}
+
+
+def test_group_links_by_level():
+    """Groups are linked level by level, locking the child too."""
+    rows = [
+        group("/A", "file.h5"),
+        group("/A/B", "/A"),
+        group("/A/B/C", "/A/B"),
+        group("/D", "file.h5"),
+        group("/D/E", "/D"),
+        group("/F", "file.h5"),
+    ]
+    # linking /A/B locks /A, which linking /A locks as well
+    independent, serial = partition_rows(rows, 10, group_lock_keys)
+    assert independent == [rows] and serial == []
+
+    levels = group_levels(rows)
+    assert [[row["hdf5_path"] for row in level] for level in levels] == [
+        ["/A", "/D", "/F"],
+        ["/A/B", "/D/E"],
+        ["/A/B/C"],
+    ]
+    # within a level, the links of different parents lock no common node
+    independent, serial = partition_rows(levels[1], 1, group_lock_keys)
+    assert independent == [[rows[1]], [rows[4]]] and serial == []
+    locked = [set(group_lock_keys(batch[0])) for batch in independent]
+    assert not locked[0] & locked[1]
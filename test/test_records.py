@@ -0,0 +1,64 @@
+"""Tests of the packed records of the registries."""
+
+import numpy as np
+
+from hdf5_graph.arrays import ArrayPolicy
+from hdf5_graph.records import (
+    RECORD_DTYPE,
+    iter_read_files,
+    pack_registries,
+    unpack_registries,
+)
+from hdf5_graph.single_hdf5 import read_hdf5_registries
+from hdf5_graph.synthetic import generate_dir
+
+
+def test_pack_registries_roundtrip(h5_file):
+    """Packed registries are unpacked unchanged."""
+    group_registry, dataset_registry = read_hdf5_registries(
+        h5_file, array_policy=ArrayPolicy("summary", list_size=10)
+    )
+    packed = pack_registries(group_registry, dataset_registry)
+    assert packed["records"].dtype == RECORD_DTYPE
+    assert len(packed["records"]) == len(group_registry) + len(dataset_registry)
+    # only the records with strings, lists, attrs or array properties
+    # need python objects
+    assert len(packed["extras"]) < len(packed["records"])
+    assert unpack_registries(h5_file, packed) == (group_registry, dataset_registry)
+
+
+def test_pack_registries_values(tmp_path):
+    """Values of every type survive the packing."""
+    values = [
+        None,
+        True,
+        np.int32(-3),
+        np.uint64(2**64 - 1),
+        np.float32(0.5),
+        "text",
+        [1.0, 2.0],
+    ]
+    datasets = [
+        {
+            "parent": str(tmp_path),
+            "obj_name": f"d{i}",
+            "hdf5_path": f"/d{i}",
+            "value": value,
+            "array_props": {},
+            "attrs": {},
+        }
+        for i, value in enumerate(values)
+    ]
+    _, unpacked = unpack_registries(tmp_path, pack_registries([], datasets))
+    assert [i["value"] for i in unpacked] == values
+    assert type(unpacked[1]["value"]) is bool
+
+
+def test_iter_read_files(tmp_path):
+    """Files are read in parallel, in their order."""
+    generate_dir(tmp_path, files=5, levels=2, groups=4, datasets_per_group=3)
+    files = sorted(tmp_path.rglob("*.h5"))
+    read = list(iter_read_files(((i, []) for i in files), readers=2, max_pending=1))
+    assert [i[0] for i in read] == files
+    for hdf5_filepath, _, group_registry, dataset_registry in read:
+        assert (group_registry, dataset_registry) == read_hdf5_registries(hdf5_filepath)
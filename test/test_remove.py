@@ -0,0 +1,78 @@
+"""Tests of the removal of files from the graph."""
+
+from types import SimpleNamespace
+
+from hdf5_graph.metrics import IngestMetrics
+from hdf5_graph.remove import PURGE_LABELS, purge, remove_file
+from hdf5_graph.single_hdf5 import ADOPT_LEGACY_QUERY
+
+
+class Session:
+    """Stand-in for a neo4j.Session, deleting and adopting nodes.
+
+    Every run of the purge query deletes up to batch_size of the remaining nodes per
+    label, and the given number of legacy nodes is adopted.
+    """
+
+    def __init__(self, nodes: dict, legacy: int = 0):
+        """Create a session holding ``nodes`` per label."""
+        self.nodes = dict(nodes)
+        self.legacy = legacy
+        self.queries = []
+
+    def run(self, query, **params):
+        """Record the query and delete or adopt nodes."""
+        self.queries.append((query, params))
+        label = next((i for i in PURGE_LABELS if f"(n:{i})" in query), None)
+        deleted = 0
+        if label is not None:
+            deleted = min(self.nodes[label], params["batch_size"])
+            self.nodes[label] -= deleted
+        return SimpleNamespace(
+            consume=lambda: SimpleNamespace(
+                counters=SimpleNamespace(nodes_deleted=deleted)
+            ),
+            single=lambda: {"adopted": self.legacy},
+        )
+
+
+def test_purge_batches():
+    """Nodes are purged in batches per label."""
+    session = Session({"Dataset": 25, "Group": 10, "File": 3})
+    events = []
+    with IngestMetrics(
+        callback=lambda event, filepath, fields: events.append((event, fields))
+    ):
+        removed = purge(session, batch_size=10)
+    assert removed == {"Dataset": 25, "Group": 10, "File": 3}
+    assert session.nodes == {"Dataset": 0, "Group": 0, "File": 0}
+    # a full chunk is followed by another one, until a chunk is not full
+    assert [params["batch_size"] for _, params in session.queries] == [10] * 6
+    assert [fields["deleted"] for event, fields in events if event == "purge"] == [
+        10,
+        20,
+        25,
+        10,
+        10,
+        3,
+    ]
+
+
+def test_remove_file_steps(tmp_path):
+    """Legacy nodes are adopted before the file is removed."""
+    session = Session({}, legacy=3)
+    events = []
+    with IngestMetrics(
+        callback=lambda event, filepath, fields: events.append((event, fields))
+    ):
+        removed = remove_file(session, tmp_path / "a.h5", batch_size=500)
+    assert list(removed) == ["shared_datasets", "datasets", "groups", "files"]
+    assert all(
+        params["filepath"] == str(tmp_path / "a.h5") for _, params in session.queries
+    )
+    # nodes of earlier versions without filepath are adopted before anything is removed
+    assert session.queries[0][0] == ADOPT_LEGACY_QUERY
+    assert events[0] == ("adopt", {"nodes": 3})
+    assert all(
+        "IN TRANSACTIONS OF 500 ROWS" in query for query, _ in session.queries[1:-1]
+    )
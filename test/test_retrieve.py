@@ -0,0 +1,90 @@
+"""Tests of the retrieval of dataset values from h5-files."""
+
+import h5py
+import numpy as np
+
+from hdf5_graph.retrieve import FileCache, fetch_datasets, query_datasets
+
+
+def write_files(tmp_path, files=3):
+    """Write files with a 2D and a 1D dataset."""
+    paths = []
+    for i in range(files):
+        path = tmp_path / f"f{i}.h5"
+        with h5py.File(path, "w") as hdf:
+            hdf.create_dataset("a/x", data=np.arange(20.0).reshape(4, 5) + i)
+            hdf.create_dataset("y", data=np.arange(10) * i)
+        paths.append(path)
+    return paths
+
+
+def test_fetch_datasets_order_and_selection(tmp_path):
+    """Values are returned in the order of the records."""
+    paths = write_files(tmp_path)
+    records = [
+        {"filepath": str(paths[1]), "hdf5_path": "/y"},
+        (paths[0], "/a/x"),
+        {"filepath": str(paths[1]), "hdf5_path": "/a/x"},
+    ]
+    values = fetch_datasets(records)
+    np.testing.assert_array_equal(values[0], np.arange(10))
+    np.testing.assert_array_equal(values[1], np.arange(20.0).reshape(4, 5))
+    np.testing.assert_array_equal(values[2], np.arange(20.0).reshape(4, 5) + 1)
+    sliced = fetch_datasets(records[1:], selection=np.s_[1:3, ::2])
+    np.testing.assert_array_equal(sliced[0], np.arange(20.0).reshape(4, 5)[1:3, ::2])
+
+
+def test_fetch_datasets_parallel(tmp_path):
+    """Fetching in parallel gives the same values."""
+    paths = write_files(tmp_path)
+    records = [(path, hdf5_path) for path in paths for hdf5_path in ("/y", "/a/x")]
+    serial = fetch_datasets(records)
+    parallel = fetch_datasets(records, workers=2)
+    assert len(parallel) == len(records)
+    for a, b in zip(serial, parallel):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_file_cache_lru(tmp_path):
+    """The least recently used files are closed."""
+    paths = write_files(tmp_path)
+    with FileCache(max_open=2) as cache:
+        fetch_datasets(
+            [(paths[0], "/y"), (paths[1], "/y"), (paths[0], "/a/x")], cache=cache
+        )
+        assert cache.opened == 2  # grouped per file
+        first = cache.get(paths[0])
+        cache.get(paths[2])
+        assert len(cache) == 2
+        assert first.id.valid  # most recently used file stays open
+    assert len(cache) == 0
+
+
+class Record(dict):
+    """Record of a query result."""
+
+    def data(self):
+        """Return the record as a dictionary."""
+        return dict(self)
+
+
+class Session:
+    """Stand-in for a neo4j.Session, returning given records."""
+
+    def run(self, query, **params):
+        """Record the parameters and return the records."""
+        self.params = params
+        return [Record(i) for i in self.records]
+
+
+def test_query_datasets(tmp_path):
+    """Queried datasets are returned with their values."""
+    paths = write_files(tmp_path, files=1)
+    session = Session()
+    session.records = [{"filepath": str(paths[0]), "hdf5_path": "/y", "name": "y"}]
+    ((record, value),) = query_datasets(
+        session, "MATCH ...", selection=np.s_[:3], name="y"
+    )
+    assert record["name"] == "y"
+    assert session.params == {"name": "y"}
+    np.testing.assert_array_equal(value, [0, 0, 0])
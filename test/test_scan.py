@@ -0,0 +1,42 @@
+"""Tests of the scan estimating an ingestion."""
+
+from hdf5_graph.dedup import dataset_key
+from hdf5_graph.handle_structure import iter_h5_files
+from hdf5_graph.scan import estimate, scan_files, scan_hdf5
+from hdf5_graph.single_hdf5 import read_hdf5_registries
+from hdf5_graph.synthetic import generate_dir
+
+
+def test_scan_hdf5_matches_registries(h5_file):
+    """The scan counts the objects of the registries."""
+    kwargs = {"exclude_datasets": ["dt"], "exclude_groups": ["Spline"]}
+    scan = scan_hdf5(h5_file, **kwargs)
+    group_registry, dataset_registry = read_hdf5_registries(h5_file, **kwargs)
+    assert scan["groups"] == len(group_registry)
+    assert scan["scalars"] + scan["arrays"] == len(dataset_registry)
+    scalars = [i for i in dataset_registry if i["value"] is not None]
+    assert len(scan["value_keys"]) == len(
+        {dataset_key(i["obj_name"], i["value"]) for i in scalars}
+    )
+
+
+def test_scan_files_parallel(tmp_path):
+    """Scanning in parallel gives the same counts."""
+    generate_dir(
+        tmp_path, files=4, levels=2, groups=3, datasets_per_group=4, cardinality=2
+    )
+    serial = scan_files(iter_h5_files(tmp_path))
+    parallel = scan_files(iter_h5_files(tmp_path), workers=2)
+    assert serial == parallel
+    assert serial["files"] == 4
+    assert serial["depends_on"] == sum(
+        len(parents) for _, parents in iter_h5_files(tmp_path)
+    )
+    result = estimate(serial, throughput=10)
+    assert result["nodes"]["Dataset"] == len(serial["value_keys"]) + serial["arrays"]
+    # few distinct values are merged across files
+    assert result["nodes"]["Dataset"] < serial["scalars"] + serial["arrays"]
+    assert (
+        result["projected_seconds"]
+        == (serial["groups"] + serial["scalars"] + serial["arrays"]) / 10
+    )
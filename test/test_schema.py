@@ -0,0 +1,63 @@
+"""Tests of the schema creation."""
+
+import pytest
+
+from hdf5_graph.schema import (
+    CONSTRAINT_QUERY,
+    DUPLICATES_QUERY,
+    LEGACY_INDEX_QUERY,
+    SCHEMA_QUERIES,
+    create_schema,
+)
+
+
+class Result(list):
+    """Records of a query."""
+
+    def consume(self):
+        """Consume the result."""
+
+
+class Session:
+    """Stand-in for a neo4j.Session, answering the inspection queries of create_schema.
+
+    The answers are taken from the given state of the database.
+    """
+
+    def __init__(self, constraint=0, legacy=0, duplicates=()):
+        """Create a session with the given state of the database."""
+        self.answers = {
+            CONSTRAINT_QUERY: [{"name": "dataset_name_value"}] * constraint,
+            LEGACY_INDEX_QUERY: [{"name": "dataset_name_value"}] * legacy,
+            DUPLICATES_QUERY: list(duplicates),
+        }
+        self.queries = []
+
+    def run(self, query, **params):
+        """Record the query and return its answer."""
+        self.queries.append(query)
+        return Result(self.answers.get(query, []))
+
+
+def test_create_schema_drops_legacy_index():
+    """A legacy index is dropped before the schema is created."""
+    session = Session(legacy=1)
+    create_schema(session, wait=False)
+    drop = session.queries.index("DROP INDEX dataset_name_value IF EXISTS")
+    assert drop < session.queries.index(SCHEMA_QUERIES[0])
+    assert session.queries[-len(SCHEMA_QUERIES) :] == SCHEMA_QUERIES
+
+
+def test_create_schema_keeps_existing_constraint():
+    """An existing constraint is kept."""
+    session = Session(constraint=1, legacy=1)
+    create_schema(session, wait=False)
+    assert session.queries == [CONSTRAINT_QUERY] + SCHEMA_QUERIES
+
+
+def test_create_schema_reports_duplicates():
+    """Duplicated datasets are reported and stop the creation."""
+    session = Session(legacy=1, duplicates=[{"name": "dt", "value": 0.5, "nodes": 2}])
+    with pytest.raises(ValueError, match="'dt'=0.5 \\(2 nodes\\)"):
+        create_schema(session, wait=False)
+    assert not set(SCHEMA_QUERIES) & set(session.queries)
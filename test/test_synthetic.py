@@ -0,0 +1,59 @@
+"""Tests of the generated h5-files."""
+
+import h5py
+
+from hdf5_graph.synthetic import generate_dir, generate_hdf5
+
+
+def test_generate_hdf5(tmp_path):
+    """A generated file has the requested objects."""
+    counts = generate_hdf5(
+        tmp_path / "synthetic.h5",
+        groups=12,
+        depth=3,
+        datasets_per_group=5,
+        array_ratio=0.4,
+        attrs=1,
+    )
+    assert counts["groups"] == 12
+    assert counts["scalars"] + counts["arrays"] == 60
+    groups, datasets = [], []
+    with h5py.File(tmp_path / "synthetic.h5", "r") as hdf:
+        hdf.visititems(
+            lambda name, obj: (
+                groups if isinstance(obj, h5py.Group) else datasets
+            ).append(name)
+        )
+        assert all(len(hdf[i].attrs) == 1 for i in groups + datasets)
+    assert len(groups) == 12
+    assert len(datasets) == 60
+    assert max(i.count("/") for i in groups) == 2
+
+
+def test_generate_hdf5_deterministic(tmp_path):
+    """The same seed generates the same values."""
+    generate_hdf5(tmp_path / "a.h5", groups=5, seed=3)
+    generate_hdf5(tmp_path / "b.h5", groups=5, seed=3)
+    with h5py.File(tmp_path / "a.h5", "r") as a, h5py.File(tmp_path / "b.h5", "r") as b:
+        values_a, values_b = [], []
+        a.visititems(
+            lambda name, obj: values_a.append(
+                (name, obj[()].tolist() if isinstance(obj, h5py.Dataset) else None)
+            )
+        )
+        b.visititems(
+            lambda name, obj: values_b.append(
+                (name, obj[()].tolist() if isinstance(obj, h5py.Dataset) else None)
+            )
+        )
+    assert values_a == values_b
+
+
+def test_generate_dir(tmp_path):
+    """A generated directory has the requested files."""
+    counts = generate_dir(tmp_path, files=5, levels=3, groups=4, datasets_per_group=2)
+    assert counts["files"] == 5
+    assert counts["groups"] == 20
+    assert counts["scalars"] + counts["arrays"] == 40
+    assert len(list(tmp_path.rglob("*.h5"))) == 5
+    assert (tmp_path / "level_1" / "level_2" / "file_2.h5").exists()
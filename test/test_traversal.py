@@ -0,0 +1,58 @@
+"""Tests of the streamed records of h5-files."""
+
+from hdf5_graph.single_hdf5 import iter_hdf5_records
+
+
+def test_iter_hdf5_records(h5_file):
+    """Groups and datasets are streamed in traversal order."""
+    records = list(iter_hdf5_records(h5_file))
+
+    groups = [r["hdf5_path"] for kind, r in records if kind == "group"]
+    datasets = {r["hdf5_path"]: r for kind, r in records if kind == "dataset"}
+    assert groups == [
+        "/Experiment",
+        "/Experiment/BF_curves",
+        "/Experiment/BF_curves/Curve_0",
+        "/Experiment/BF_curves/Curve_0/Spline",
+    ]
+    assert datasets["/ca"]["parent"] == str(h5_file)
+    assert datasets["/ca"]["value"] == 0.3
+    assert datasets["/Experiment/name"]["value"] == "sample"
+    assert datasets["/Experiment/BF_curves/Curve_0/datapoints"]["value"] is None
+
+    # parents are yielded before their children
+    seen = {str(h5_file)}
+    for _, record in records:
+        assert record["parent"] in seen
+        seen.add(record["hdf5_path"])
+
+
+def test_iter_hdf5_records_exclude(h5_file):
+    """Excluded objects are not streamed."""
+    records = list(
+        iter_hdf5_records(
+            h5_file,
+            exclude_datasets=["dt"],
+            exclude_paths=["/Spline/"],
+            transfer_attrs=False,
+        )
+    )
+    paths = [r["hdf5_path"] for _, r in records]
+    assert "/Experiment/dt" not in paths
+    assert "/Experiment/BF_curves/Curve_0/Spline/C" not in paths
+    assert all(r["attrs"] == {} for _, r in records)
+
+
+def test_iter_hdf5_records_early_close(h5_file):
+    """Closing the stream early ends the traversal."""
+    records = iter_hdf5_records(h5_file, max_pending=1)
+    next(records)
+    records.close()  # must not hang on the blocked traversal
+
+
+def test_iter_hdf5_records_exclude_group_subtree(h5_file):
+    """The subtree of an excluded group is skipped."""
+    records = list(iter_hdf5_records(h5_file, exclude_groups=["BF_curves"]))
+    paths = [r["hdf5_path"] for _, r in records]
+    assert "/Experiment/dt" in paths
+    assert not any(path.startswith("/Experiment/BF_curves") for path in paths)
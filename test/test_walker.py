@@ -0,0 +1,168 @@
+"""Tests of the traversal of h5-files."""
+
+import h5py
+import numpy as np
+
+from hdf5_graph.arrays import ArrayPolicy
+from hdf5_graph.attrs import AttrPolicy
+from hdf5_graph.exclusion import PathFilter
+from hdf5_graph.single_hdf5 import new_traversal_stats
+from hdf5_graph.walker import iter_objects, walk_hdf5
+
+
+def walker_records(hdf5_filepath, **kwargs):
+    """Walk a file and collect its records and statistics."""
+    records, stats = [], new_traversal_stats()
+    walk_hdf5(
+        hdf5_filepath,
+        lambda kind, record: records.append((kind, record)),
+        stats=stats,
+        **kwargs,
+    )
+    return records, stats
+
+
+def write_types_file(filepath):
+    """Write a file with datasets of every supported type."""
+    with h5py.File(filepath, "w") as hdf:
+        group = hdf.create_group("g/h")
+        group.attrs["unit"] = "m"
+        group.attrs["big"] = np.arange(100)
+        hdf.create_dataset("float", data=1.5).attrs["a"] = 1
+        hdf.create_dataset("int", data=np.int16(3))
+        hdf.create_dataset("bool", data=True)
+        hdf.create_dataset("str", data="text", dtype=h5py.string_dtype())
+        hdf.create_dataset("bytes", data=np.bytes_("ab"))
+        hdf.create_dataset("strings", data=["a", "b"], dtype=h5py.string_dtype())
+        hdf.create_dataset("empty", data=h5py.Empty("f8"))
+        hdf.create_dataset(
+            "compound", data=np.array((1, 2.0), dtype=[("a", "i4"), ("b", "f8")])
+        )
+        hdf.create_dataset("subarray", shape=(), dtype=np.dtype(("<f8", (3,))))
+        group.create_dataset("array", data=np.arange(12.0).reshape(3, 4))
+        group.create_dataset("skip", data=1)
+        hdf["g/hard"] = hdf["float"]
+        hdf["soft"] = h5py.SoftLink("/g")
+
+
+# kind, hdf5_path, parent (None for the file) and value of the objects of the types
+# file, in the order of visititems
+TYPES_RECORDS = [
+    ("dataset", "/bool", None, np.True_),
+    ("dataset", "/bytes", None, np.bytes_(b"ab")),
+    (
+        "dataset",
+        "/compound",
+        None,
+        np.array((1, 2.0), dtype=[("a", "<i4"), ("b", "<f8")])[()],
+    ),
+    ("dataset", "/empty", None, None),
+    ("dataset", "/float", None, np.float64(1.5)),
+    ("group", "/g", None, None),
+    ("group", "/g/h", "/g", None),
+    ("dataset", "/g/h/array", "/g/h", None),
+    ("dataset", "/g/h/skip", "/g/h", np.int64(1)),
+    ("dataset", "/int", None, np.int16(3)),
+    ("dataset", "/str", None, "text"),
+    ("dataset", "/strings", None, np.array(["a", "b"], dtype=object)),
+    ("dataset", "/subarray", None, np.zeros(3)),
+]
+
+
+def assert_records(records, expected, filepath):
+    """Check the records against the expected records."""
+    assert [(kind, record["hdf5_path"]) for kind, record in records] == [
+        (kind, path) for kind, path, _, _ in expected
+    ]
+    for (kind, record), (_, path, parent, value) in zip(records, expected):
+        assert record["parent"] == (str(filepath) if parent is None else parent)
+        assert record["obj_name"] == path.rpartition("/")[2]
+        if kind == "dataset":
+            # the types are kept, so the values are converted as before
+            assert type(record["value"]) is type(value)
+            assert np.array_equal(record["value"], value) or value is None
+
+
+def test_walk_hdf5_records(tmp_path):
+    """The records of every type are as expected."""
+    filepath = tmp_path / "types.h5"
+    write_types_file(filepath)
+
+    records, stats = walker_records(filepath)
+    assert_records(records, TYPES_RECORDS, filepath)
+    attrs = {record["hdf5_path"]: record["attrs"] for _, record in records}
+    assert attrs["/float"] == {"a": 1}
+    assert attrs["/g/h"]["unit"] == "m"
+    assert np.array_equal(attrs["/g/h"]["big"], np.arange(100))
+    # arrays get no value without array policy
+    assert not any(record.get("array_props") for _, record in records)
+    # 9 plain scalars and the 3 doubles of the subarray, the hard link is read once
+    assert stats["objects"] == 13 and stats["bytes_read"] == 81
+
+    records, stats = walker_records(
+        filepath, transfer_attrs=False, exclude_datasets=["skip"]
+    )
+    assert_records(records, TYPES_RECORDS[:8] + TYPES_RECORDS[9:], filepath)
+    assert not any(record["attrs"] for _, record in records)
+    assert stats["objects"] == 12 and stats["bytes_read"] == 73
+
+    records, stats = walker_records(
+        filepath,
+        array_policy=ArrayPolicy("list", list_size=100),
+        attr_policy=AttrPolicy(exclude=["u*"], max_bytes=64),
+    )
+    assert_records(records, TYPES_RECORDS, filepath)
+    by_path = {record["hdf5_path"]: record for _, record in records}
+    assert by_path["/g/h"]["attrs"] == {"big_shape": [100], "big_dtype": "<i8"}
+    assert by_path["/g/h/array"]["array_props"] == {
+        "shape": [3, 4],
+        "dtype": "<f8",
+        "data": list(np.arange(12.0)),
+    }
+    assert stats["bytes_read"] == 81 + 96
+
+    records, stats = walker_records(filepath, exclude_groups=["h"])
+    assert_records(records, TYPES_RECORDS[:6] + TYPES_RECORDS[9:], filepath)
+    assert stats["objects"] == 10
+
+
+def test_iter_objects(tmp_path):
+    """Soft links are skipped and hard linked objects yielded once."""
+    filepath = tmp_path / "links.h5"
+    with h5py.File(filepath, "w") as hdf:
+        hdf.create_group("b/c").create_dataset("z", data=2)
+        hdf.create_dataset("a", data=1)
+        hdf["b"].create_dataset("10", data=3)
+        hdf["soft"] = h5py.SoftLink("/b")
+        hdf["hard"] = hdf["b/c"]
+    with h5py.File(filepath, "r") as hdf:
+        objects = [
+            (kind, name, path, parent)
+            for kind, name, path, parent, _ in iter_objects(hdf, parent="file")
+        ]
+        # soft links are not followed, the group behind the hard link is yielded once
+        assert objects == [
+            ("dataset", "a", "/a", "file"),
+            ("group", "b", "/b", "file"),
+            ("dataset", "10", "/b/10", "/b"),
+            ("group", "c", "/b/c", "/b"),
+            ("dataset", "z", "/b/c/z", "/b/c"),
+        ]
+        paths = [
+            path
+            for _, _, path, _, _ in iter_objects(hdf, PathFilter(exclude_groups=["c"]))
+        ]
+        assert paths == ["/a", "/b", "/b/10"]
+
+
+def test_walker_stops(h5_file):
+    """The walk stops when the callback returns True."""
+    records = []
+    assert (
+        walk_hdf5(
+            h5_file,
+            lambda kind, record: records.append(record) or (len(records) == 2 or None),
+        )
+        is True
+    )
+    assert len(records) == 2
@@ -0,0 +1,166 @@
+"""Tests of the watch of a directory."""
+
+import subprocess
+import sys
+import threading
+from types import SimpleNamespace
+
+import h5py
+
+from hdf5_graph import watch
+from hdf5_graph.watch import FileWatcher, watch_dir
+
+# Keeps a file open for writing until a line is read from stdin
+WRITER = """
+import sys, h5py
+with h5py.File(sys.argv[1], "w") as hdf:
+    hdf.create_dataset("dt", data=1.0)
+    hdf.flush()
+    print("open", flush=True)
+    sys.stdin.readline()
+"""
+
+
+def _write(filepath, value):
+    with h5py.File(filepath, "w") as hdf:
+        hdf.create_dataset("dt", data=value)
+
+
+def test_watcher_waits_until_settled(tmp_path):
+    """Files are handed over once they settled."""
+    (tmp_path / "sim1").mkdir()
+    _write(tmp_path / "top.h5", 1.0)
+    watcher = FileWatcher(tmp_path, settle=2.0)
+
+    assert watcher.poll(now=0.0) == []
+    assert watcher.poll(now=1.0) == []
+    assert watcher.poll(now=2.0) == [(tmp_path / "top.h5", [], [])]
+    assert watcher.poll(now=10.0) == []
+    watcher.done(tmp_path / "top.h5")
+
+    # a file appearing below is handed over with its dependency, the parent is not
+    # handed over again
+    _write(tmp_path / "sim1" / "a.h5", 2.0)
+    watcher.poll(now=11.0)
+    assert watcher.poll(now=13.0) == [
+        (tmp_path / "sim1" / "a.h5", [tmp_path / "top.h5"], [])
+    ]
+
+    # a rewritten parent is handed over again, together with the files depending on it
+    _write(tmp_path / "top.h5", [1.0, 2.0])
+    watcher.poll(now=20.0)
+    assert watcher.poll(now=22.0) == [
+        (tmp_path / "top.h5", [], [tmp_path / "sim1" / "a.h5"])
+    ]
+
+
+def test_watcher_skips_files_open_for_writing(tmp_path):
+    # the writer is another process, within one process HDF5 shares the open file
+    # instead of locking it
+    """Files open for writing are not handed over."""
+    writer = subprocess.Popen(
+        [sys.executable, "-c", WRITER, str(tmp_path / "running.h5")],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    writer.stdout.readline()
+    watcher = FileWatcher(tmp_path, settle=0.0)
+    watcher.poll(now=0.0)
+    assert watcher.poll(now=1.0) == []
+    writer.communicate("\n")
+    # closing the file changes it, so it has to settle once more
+    watcher.poll(now=2.0)
+    assert watcher.poll(now=3.0) == [(tmp_path / "running.h5", [], [])]
+
+
+def test_watcher_waits_for_running_ingestion(tmp_path):
+    """A file is not handed over again while it is ingested."""
+    top = tmp_path / "top.h5"
+    _write(top, 1.0)
+    watcher = FileWatcher(tmp_path, settle=0.0)
+    watcher.poll(now=0.0)
+    assert watcher.poll(now=1.0) == [(top, [], [])]
+
+    # a file rewritten during its ingestion is handed over after it finished
+    _write(top, 2.0)
+    watcher.poll(now=2.0)
+    assert watcher.poll(now=3.0) == []
+    watcher.done(top)
+    assert watcher.poll(now=4.0) == [(top, [], [])]
+
+
+def test_watcher_retries_failed_files(tmp_path):
+    """Failed files are retried with backoff, until they change."""
+    top = tmp_path / "top.h5"
+    _write(top, 1.0)
+    watcher = FileWatcher(tmp_path, settle=1.0, retries=2, max_backoff=3.0)
+    watcher.poll(now=0.0)
+    assert watcher.poll(now=1.0) == [(top, [], [])]
+    assert watcher.poll(now=2.0) == []
+
+    # retried after 2 seconds, then after at most 3 seconds
+    watcher.done(top, failed=True, now=2.0)
+    assert watcher.poll(now=3.0) == []
+    watcher.poll(now=4.0)
+    assert watcher.poll(now=5.0) == [(top, [], [])]
+    watcher.done(top, failed=True, now=5.0)
+    watcher.poll(now=7.0)
+    assert watcher.poll(now=7.5) == []
+    watcher.poll(now=8.0)
+    assert watcher.poll(now=9.0) == [(top, [], [])]
+
+    # after the retries it is only handed over again once it changes
+    watcher.done(top, failed=True, now=9.0)
+    watcher.poll(now=100.0)
+    assert watcher.poll(now=200.0) == []
+    _write(top, 2.0)
+    watcher.poll(now=201.0)
+    assert watcher.poll(now=202.0) == [(top, [], [])]
+    watcher.done(top, failed=True, now=202.0)
+    watcher.poll(now=204.0)
+    assert watcher.poll(now=205.0) == [(top, [], [])]
+
+
+class Session:
+    """Stand-in for a neo4j.Session, which runs no query."""
+
+    def __enter__(self):
+        """Enter the session."""
+        return self
+
+    def __exit__(self, *args):
+        """Leave the session."""
+
+    def run(self, query, **params):
+        """Return an empty result."""
+        return SimpleNamespace(consume=lambda: None)
+
+
+def test_watch_dir_retries_failed_ingestion(tmp_path, monkeypatch):
+    """A failed ingestion does not stop the watch."""
+    _write(tmp_path / "top.h5", 1.0)
+    stop = threading.Event()
+    calls = []
+
+    def update(hdf5_filepath, session, **kwargs):
+        calls.append(hdf5_filepath)
+        if len(calls) == 1:
+            raise OSError("database unavailable")
+        stop.set()
+        return "unchanged"
+
+    monkeypatch.setattr(watch, "update_hdf5_in_neo4j", update)
+    # ends the watch, if the file is not retried
+    timeout = threading.Timer(5.0, stop.set)
+    timeout.start()
+    watch_dir(
+        tmp_path,
+        SimpleNamespace(session=Session),
+        interval=0.01,
+        settle=0.0,
+        stop=stop,
+        bootstrap_schema=False,
+    )
+    timeout.cancel()
+    assert calls == [tmp_path / "top.h5"] * 2
@@ -0,0 +1,213 @@
+"""Tests of the batched writes to neo4j."""
+
+import time
+from types import SimpleNamespace
+
+import neo4j
+from neo4j.exceptions import ClientError, TransientError
+
+from hdf5_graph.helpers import AdaptiveBatchSize
+from hdf5_graph.writers import write_batches, write_unwind
+
+
+class FakeSession:
+    """Stand-in for a neo4j.Session, failing first attempts with a deadlock."""
+
+    def __init__(self, failures=0):
+        """Create a session, whose first ``failures`` attempts fail."""
+        self.failures = failures
+        self.written = []
+
+    def execute_write(self, work, *args):
+        """Run the failing attempts and then the transaction."""
+        for _ in range(self.failures):
+            try:
+                raise TransientError("deadlock")
+            except TransientError:
+                work(FakeTransaction([]), *args)  # attempt which is rolled back
+        return work(FakeTransaction(self.written), *args)
+
+
+class FakeTransaction:
+    """Stand-in for a neo4j.Transaction, recording the rows."""
+
+    def __init__(self, written):
+        """Create a transaction writing into ``written``."""
+        self.written = written
+
+    def run(self, query, rows, **params):
+        """Record the rows and serve as their result."""
+        self.written.extend(rows)
+        return self
+
+    def consume(self):
+        """Return a summary with one created node."""
+        return SimpleNamespace(counters=neo4j.SummaryCounters({"nodes-created": 1}))
+
+
+def test_write_unwind_batches():
+    """Rows are written in batches."""
+    session = FakeSession()
+    summary = write_unwind(
+        session, "UNWIND $rows AS entry", list(range(25)), batch_size=10
+    )
+    assert session.written == list(range(25))
+    assert summary["batches"] == 3
+    assert summary["committedOperations"] == 25
+    assert summary["updateStatistics"] == {"nodes_created": 3}
+
+
+def test_write_unwind_retries():
+    """Failed attempts are retried and counted."""
+    session = FakeSession(failures=2)
+    summary = write_unwind(
+        session, "UNWIND $rows AS entry", list(range(5)), batch_size=2
+    )
+    assert summary["retries"] == 6
+    assert summary["failedBatches"] == 0
+
+
+class OutOfMemoryError(ClientError):
+    """Error of a transaction running out of memory."""
+
+    code = "Neo.TransientError.General.MemoryPoolOutOfMemoryError"
+
+
+class LimitedTransaction(FakeTransaction):
+    """Transaction running out of memory for more than 4 rows."""
+
+    def run(self, query, rows, **params):
+        """Run out of memory for more than 4 rows."""
+        if len(rows) > 4:
+            raise OutOfMemoryError("out of memory")
+        return super().run(query, rows, **params)
+
+
+class LimitedSession(FakeSession):
+    """Session, whose transactions run out of memory for more than 4 rows."""
+
+    def execute_write(self, work, *args):
+        """Run the transaction with limited memory."""
+        return work(LimitedTransaction(self.written), *args)
+
+
+def test_write_unwind_adaptive_splits_batches():
+    """Batches running out of memory are split."""
+    session = LimitedSession()
+    batch_size = AdaptiveBatchSize(initial=16, min_size=1, target_latency=1000)
+    summary = write_unwind(
+        session, "UNWIND $rows AS entry", list(range(20)), batch_size=batch_size
+    )
+    assert session.written == list(range(20))
+    assert summary["failedBatches"] == 0
+    assert summary["committedOperations"] == 20
+    assert batch_size.report()["backoffs"] > 0
+
+
+class DeadlockError(TransientError):
+    """Error of a transaction chosen as deadlock victim."""
+
+    code = "Neo.TransientError.Transaction.DeadlockDetected"
+
+
+class DeadlockSession(FakeSession):
+    """Session, whose first attempt of every transaction is a deadlock victim."""
+
+    def execute_write(self, work, *args):
+        """Fail the first attempt with a deadlock."""
+
+        class Victim(FakeTransaction):
+            def run(self, query, rows, **params):
+                raise DeadlockError("deadlock")
+
+        try:
+            return work(Victim([]), *args)
+        except DeadlockError:
+            return work(FakeTransaction(self.written), *args)
+
+
+def test_write_batches_counts_deadlocks():
+    """Deadlocks are retried and counted."""
+    session = DeadlockSession()
+    summary = write_batches(session, "UNWIND $rows AS entry", [[1, 2], [3]])
+    assert session.written == [1, 2, 3]
+    assert summary["total"] == 3
+    assert summary["deadlocks"] == 2
+    assert summary["retries"] == 2
+
+
+class CommitLimitedSession(FakeSession):
+    """Session, whose commit runs out of memory for more than 4 rows."""
+
+    def execute_write(self, work, *args):
+        """Run out of memory on commit for more than 4 rows."""
+        pending = []
+        counters = work(FakeTransaction(pending), *args)
+        if len(pending) > 4:
+            raise OutOfMemoryError("out of memory")
+        self.written.extend(pending)
+        return counters
+
+
+def test_write_unwind_adaptive_splits_batches_failing_on_commit():
+    """Batches running out of memory on commit are split."""
+    session = CommitLimitedSession()
+    batch_size = AdaptiveBatchSize(initial=16, min_size=1, target_latency=1000)
+    summary = write_unwind(
+        session, "UNWIND $rows AS entry", list(range(20)), batch_size=batch_size
+    )
+    assert sorted(session.written) == list(range(20))
+    assert summary["failedBatches"] == 0
+    assert summary["committedOperations"] == 20
+
+
+class FakeDriver:
+    """Stand-in for a neo4j.Driver, recording its sessions."""
+
+    def __init__(self):
+        """Create a driver, which did not open a session yet."""
+        self.sessions = []
+
+    def session(self):
+        """Open a recording session."""
+        self.sessions.append(RecordingSession())
+        return self.sessions[-1]
+
+
+class RecordingSession(FakeSession):
+    """Session recording the batch sizes, with commit latency."""
+
+    def __init__(self):
+        """Create a session, which did not write yet."""
+        super().__init__()
+        self.sizes = []
+
+    def execute_write(self, work, *args):
+        """Record the batch size and write it after a delay."""
+        self.sizes.append(len(args[0]))
+        time.sleep(0.001)  # commit latency
+        return super().execute_write(work, *args)
+
+    def close(self):
+        """Close the session."""
+
+
+def test_write_unwind_concurrent_adapts_batch_size():
+    """Concurrent writers share and adapt the batch size."""
+    driver = FakeDriver()
+    batch_size = AdaptiveBatchSize(initial=10, min_size=1, target_latency=1000)
+    summary = write_unwind(
+        None,
+        "UNWIND $rows AS entry",
+        list(range(1000)),
+        batch_size=batch_size,
+        driver=driver,
+        concurrency=2,
+    )
+    sizes = [i for session in driver.sessions for i in session.sizes]
+    assert sorted(i for session in driver.sessions for i in session.written) == list(
+        range(1000)
+    )
+    assert summary["committedOperations"] == 1000
+    # the later batches are cut with the grown size, instead of all with the initial one
+    assert max(sizes) > 10